@@ -0,0 +1,103 @@
+"""筛选和抽取：候选池、等概率、配额、加权、批量抽取和组队规则"""
+import numpy as np
+import pytest
+
+import lottery_engine
+import panel_solver
+from conftest import rounds_for
+
+PANEL_SIZE = 15
+
+
+@pytest.mark.benchmark(group='filter')
+def bench_filter_uncached(benchmark, roster_index, draw_filters):
+    # 每轮清空候选池缓存，测量第一次按新条件筛选的耗时
+    pool = benchmark.pedantic(
+        roster_index.pool, kwargs=draw_filters, setup=roster_index._pool_cache.clear, rounds=50, iterations=1
+    )
+    assert len(pool) > 0
+
+
+@pytest.mark.benchmark(group='filter')
+def bench_filter_cached(benchmark, roster_index, draw_filters):
+    roster_index.pool(**draw_filters)
+    pool = benchmark(roster_index.pool, **draw_filters)
+    assert len(pool) > 0
+
+
+@pytest.mark.benchmark(group='filter')
+def bench_filter_cooldown(benchmark, roster_index, draw_filters):
+    # 冷却期：约 2% 的专家近期已被抽中
+    keys = roster_index.keys()[::50].tolist()
+    excluded = roster_index.key_mask(keys)
+    pool = benchmark(roster_index.pool, exclude=excluded, **draw_filters)
+    assert len(pool) > 0
+
+
+@pytest.mark.benchmark(group='sample')
+def bench_sample_pool(benchmark, roster_index, draw_filters):
+    pool = roster_index.pool(**draw_filters)
+    selected = benchmark(lottery_engine.sample_pool, pool, PANEL_SIZE, random_state=1)
+    assert len(selected) == min(PANEL_SIZE, len(pool))
+
+
+@pytest.mark.benchmark(group='sample')
+def bench_sample_quota(benchmark, roster_index, draw_filters):
+    quotas = {field: 3 for field in draw_filters['fields']}
+    selected = benchmark(
+        lottery_engine.sample_quota, roster_index, quotas, avoid_orgs=draw_filters['avoid_orgs'], random_state=1
+    )
+    assert len(selected) > 0
+
+
+@pytest.mark.benchmark(group='sample')
+def bench_sample_weighted(benchmark, roster_index, draw_filters):
+    pool = roster_index.pool(**draw_filters)
+    weights = 1.0 / (1.0 + np.random.default_rng(0).poisson(1.0, roster_index.size))
+    selected = benchmark(lottery_engine.sample_weighted, pool, PANEL_SIZE, weights, random_state=1)
+    assert len(selected) == min(PANEL_SIZE, len(pool))
+
+
+@pytest.mark.benchmark(group='sample-batch')
+def bench_sample_batch(benchmark, roster_rows, roster_index, draw_filters):
+    pool = roster_index.pool(**draw_filters)
+    panels = benchmark.pedantic(
+        lottery_engine.sample_batch, args=(pool, 5, 1000), kwargs={'random_state': 1},
+        rounds=rounds_for(roster_rows), iterations=1,
+    )
+    assert panels.shape == (1000, min(5, len(pool)))
+
+
+@pytest.mark.benchmark(group='sample-constraints')
+def bench_solve_panel(benchmark, roster_rows, roster_index, draw_filters):
+    pool = roster_index.pool(**draw_filters)
+    constraints = panel_solver.PanelConstraints(
+        max_per_org=1, required_fields=draw_filters['fields'][:2], min_senior=3,
+    )
+    selected = benchmark.pedantic(
+        panel_solver.solve_panel, args=(roster_index, pool, 9, constraints), kwargs={'random_state': 1},
+        rounds=rounds_for(roster_rows), iterations=1,
+    )
+    assert len(selected) == 9
+
+
+@pytest.fixture(scope='module')
+def spelled_index(roster_df):
+    """每个单位约一半的专家写作 "单位0001（材料学院）"，与 "单位0001" 是同一单位的两种写法"""
+    experts_df = roster_df.copy()
+    organizations = experts_df[lottery_engine.ORG_COLUMN].astype(object)
+    odd = np.arange(len(experts_df)) % 2 == 1
+    experts_df[lottery_engine.ORG_COLUMN] = organizations.where(~odd, organizations + "（材料学院）")
+    return lottery_engine.RosterIndex(experts_df)
+
+
+@pytest.mark.benchmark(group='sample-constraints')
+def bench_solve_panel_org_spellings(benchmark, roster_rows, spelled_index):
+    # 单位人数上限按规范单位计数；结果是否正确见 tests/test_panel_solver.py
+    pool = spelled_index.pool()
+    constraints = panel_solver.PanelConstraints(max_per_org=1).with_org_groups(spelled_index)
+    selected = benchmark.pedantic(
+        panel_solver.solve_panel, args=(spelled_index, pool, 9, constraints), kwargs={'random_state': 1},
+        rounds=rounds_for(roster_rows), iterations=1,
+    )
+    assert len(selected) == 9
@@ -0,0 +1,22 @@
+"""结果导出：按格式写入抽取结果（保存结果时在后台线程中执行的部分）"""
+import os
+
+import pytest
+
+import lottery_export
+from conftest import rounds_for
+
+# 导出的行数上限：抽取结果一般远小于名单，批量抽取时可达数万行
+EXPORT_ROWS = 100000
+
+
+@pytest.mark.benchmark(group='export')
+@pytest.mark.parametrize('extension', ['.xlsx', '.csv', '.jsonl'])
+def bench_export(benchmark, tmp_path, roster_rows, roster_df, extension):
+    result_df = roster_df.iloc[:EXPORT_ROWS]
+    output_path = str(tmp_path / f"result{extension}")
+    benchmark.pedantic(
+        lottery_export.export_table, args=(result_df, output_path),
+        rounds=rounds_for(min(roster_rows, EXPORT_ROWS), 3), iterations=1,
+    )
+    assert os.path.getsize(output_path) > 0
@@ -0,0 +1,85 @@
+"""界面：填充筛选下拉框、按界面条件筛选和在表格中显示结果"""
+import os
+
+import pytest
+
+pytest.importorskip('PyQt6')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+from conftest import rounds_for  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def qt_app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def window(qt_app, roster_df, roster_index):
+    """已加载合成名单的主窗口，相当于 on_roster_loaded 之后的状态"""
+    from expert_lottery_gui import ExpertLotteryApp
+
+    window = ExpertLotteryApp()
+    window.experts_data = roster_df
+    window.roster_index = roster_index
+    window.research_fields = list(roster_index.fields)
+    window.organizations = list(roster_index.org_index.canonical)
+    window.show()
+    qt_app.processEvents()
+    yield window
+    window.close()
+    window.deleteLater()
+    qt_app.processEvents()
+
+
+@pytest.mark.benchmark(group='gui-options')
+def bench_fill_options(benchmark, roster_rows, window):
+    def fill():
+        window.update_research_fields()
+        window.update_organizations()
+
+    benchmark.pedantic(fill, rounds=rounds_for(roster_rows), iterations=1)
+    assert window.avoid_combo.option_model.option_count() == len(window.organizations)
+
+
+@pytest.mark.benchmark(group='gui-options')
+def bench_search_options(benchmark, window):
+    # 在单位列表中输入关键字，每次按键都重新筛选；
+    # 取最后一个单位去掉末位数字，在各种规模下都只匹配一部分单位
+    window.update_organizations()
+    model = window.avoid_combo.option_model
+    benchmark(model.set_filter, window.organizations[-1][:-1])
+    assert 0 < model.rowCount() < model.option_count()
+
+
+@pytest.mark.benchmark(group='gui-options')
+def bench_option_counts(benchmark, window, draw_filters):
+    window.update_research_fields()
+    window.update_organizations()
+    window.field_combo.set_checked_items(draw_filters['fields'])
+    benchmark(window.update_option_counts)
+    assert window.avoid_combo.option_model.data(window.avoid_combo.option_model.index(0)).endswith(")")
+
+
+@pytest.mark.benchmark(group='gui-filter')
+def bench_filter_experts_data(benchmark, window, draw_filters):
+    window.update_research_fields()
+    window.update_organizations()
+    window.field_combo.set_checked_items(draw_filters['fields'])
+    window.avoid_combo.set_checked_items(draw_filters['avoid_orgs'])
+    pool = benchmark(window.filter_experts_data)
+    assert len(pool) > 0
+
+
+@pytest.mark.benchmark(group='gui-display')
+def bench_display_experts(benchmark, qt_app, roster_rows, roster_df, window):
+    # 显示整份名单（批量抽取的结果可以很大），包括视图重绘可见单元格
+    def display():
+        window.display_experts(roster_df)
+        window.table.viewport().repaint()
+        qt_app.processEvents()
+
+    benchmark.pedantic(display, setup=window.table_model.clear, rounds=rounds_for(roster_rows), iterations=1)
+    assert window.table_model.rowCount() == roster_rows
@@ -0,0 +1,86 @@
+"""名单加载：解析 xlsx、读取缓存、建立筛选索引和名单变化后增量更新索引"""
+import pandas as pd
+import pytest
+
+import lottery_engine
+import roster_cache
+import roster_reader
+from conftest import make_roster, rounds_for
+
+
+@pytest.mark.benchmark(group='load-xlsx')
+def bench_read_xlsx(benchmark, roster_rows, roster_xlsx):
+    experts_df = benchmark.pedantic(
+        roster_reader.read_roster, args=(roster_xlsx,), rounds=rounds_for(roster_rows, 3), iterations=1
+    )
+    assert len(experts_df) == roster_rows
+
+
+@pytest.mark.benchmark(group='load-xlsx')
+def bench_read_xlsx_draw_columns(benchmark, roster_rows, roster_xlsx):
+    experts_df = benchmark.pedantic(
+        roster_reader.read_roster, args=(roster_xlsx,), kwargs={'columns': roster_reader.DRAW_COLUMNS},
+        rounds=rounds_for(roster_rows, 3), iterations=1,
+    )
+    assert len(experts_df) == roster_rows
+
+
+@pytest.mark.benchmark(group='load-cache')
+def bench_read_cache(benchmark, roster_rows, roster_xlsx):
+    if roster_cache.read_cached_roster(roster_xlsx) is None:
+        roster_cache.load_roster(roster_xlsx)
+    experts_df = benchmark.pedantic(
+        roster_cache.read_cached_roster, args=(roster_xlsx,), rounds=rounds_for(roster_rows), iterations=1
+    )
+    assert len(experts_df) == roster_rows
+
+
+@pytest.mark.benchmark(group='load-index')
+def bench_build_index(benchmark, roster_rows, roster_df):
+    roster_index = benchmark.pedantic(
+        lottery_engine.RosterIndex, args=(roster_df,), rounds=rounds_for(roster_rows), iterations=1
+    )
+    assert roster_index.size == roster_rows
+
+
+@pytest.fixture(scope='module')
+def appended_df(roster_df):
+    """在名单末尾追加 20 位新专家"""
+    extra = make_roster(20, seed=1)
+    extra['专家编号'] = [f"N{row:07d}" for row in range(len(extra))]
+    return roster_reader.to_categorical(pd.concat([roster_df, extra], ignore_index=True))
+
+
+@pytest.fixture(scope='module')
+def edited_df(roster_df):
+    """把一位专家的单位改为新单位"""
+    experts_df = roster_df.copy()
+    organizations = experts_df[lottery_engine.ORG_COLUMN].astype(object)
+    organizations.iloc[len(experts_df) // 2] = "新单位"
+    experts_df[lottery_engine.ORG_COLUMN] = organizations.astype('category')
+    return experts_df
+
+
+def update_index(roster_index, experts_df):
+    """与界面重新加载名单时相同：先比较差异，再增量更新索引"""
+    diff = lottery_engine.diff_rosters(roster_index.experts_df, experts_df, old_keys=roster_index.keys())
+    return roster_index.updated(experts_df, diff)
+
+
+# 与 bench_build_index（重新建立索引）在同一组中比较
+@pytest.mark.benchmark(group='load-index')
+def bench_update_index_append(benchmark, roster_rows, roster_index, appended_df):
+    roster_index.keys()
+    updated = benchmark.pedantic(
+        update_index, args=(roster_index, appended_df), rounds=rounds_for(roster_rows), iterations=1
+    )
+    assert updated.size == roster_rows + 20
+
+
+@pytest.mark.benchmark(group='load-index')
+def bench_update_index_edit(benchmark, roster_rows, roster_index, edited_df):
+    roster_index.keys()
+    updated = benchmark.pedantic(
+        update_index, args=(roster_index, edited_df), rounds=rounds_for(roster_rows), iterations=1
+    )
+    assert updated.size == roster_rows
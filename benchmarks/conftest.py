@@ -0,0 +1,161 @@
+"""
+基准测试的公共夹具。
+
+用合成名单测量加载、筛选、抽取、表格显示和导出的耗时随名单规模的变化：
+
+    pip install pytest-benchmark
+    python -m pytest benchmarks                                  # 默认 1k、10k、100k 行
+    python -m pytest benchmarks --roster-sizes=1k,10k,100k,1M    # 加上 100 万行
+    python -m pytest benchmarks -k "sample or filter"            # 只运行部分基准
+
+每次运行的结果自动保存在 .benchmarks 目录下。修改代码后可以与之前的结果比较，
+中位数变慢超过 25% 时失败：
+
+    python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=median:25%
+
+合成名单按固定种子生成，研究领域和单位的分布接近真实名单：研究领域约 60 个，
+单位数随规模增长（约每 25 人一个单位，最多 5000 个），人数都呈长尾分布。
+生成的 xlsx 文件保存在 benchmarks/.data（可用环境变量 EXPERT_LOTTERY_BENCH_DATA 修改），
+之后的运行直接复用。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import lottery_engine
+import lottery_export
+from lottery_engine import FIELD_COLUMN, NAME_COLUMN, ORG_COLUMN, TITLE_COLUMN
+
+# 修改生成规则时递增，旧的 xlsx 文件会被重新生成
+GENERATOR_VERSION = 1
+
+DATA_DIR_ENV = 'EXPERT_LOTTERY_BENCH_DATA'
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data')
+
+DEFAULT_SIZES = '1k,10k,100k'
+
+FIELD_COUNT = 60
+TITLES = ('教授', '研究员', '正高级工程师', '副教授', '副研究员', '高级工程师', '讲师', '工程师')
+TITLE_SHARES = (0.12, 0.08, 0.05, 0.2, 0.12, 0.18, 0.15, 0.1)
+SURNAMES = tuple('王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢')
+GIVEN = tuple('伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英华建国文辉力鹏宇浩然思远志强晓东')
+
+# 名单缓存写到基准测试的数据目录，不影响平时使用的缓存
+os.environ.setdefault(
+    'EXPERT_LOTTERY_CACHE_DIR',
+    os.path.join(os.environ.get(DATA_DIR_ENV) or DEFAULT_DATA_DIR, 'cache'),
+)
+
+
+def parse_size(text):
+    """把 1k、10k、1M 之类的规模转为行数"""
+    text = text.strip()
+    multiplier = {'k': 1000, 'K': 1000, 'm': 1000000, 'M': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('kKmM')) * multiplier)
+
+
+def size_label(rows):
+    if rows >= 1000000 and rows % 1000000 == 0:
+        return f"{rows // 1000000}M"
+    if rows >= 1000 and rows % 1000 == 0:
+        return f"{rows // 1000}k"
+    return str(rows)
+
+
+def _long_tail(rng, categories, rows, exponent):
+    """按 Zipf 分布为每行选择类别，前几个类别人数最多"""
+    shares = 1.0 / np.arange(1, len(categories) + 1) ** exponent
+    codes = rng.choice(len(categories), size=rows, p=shares / shares.sum())
+    return pd.Categorical.from_codes(codes, categories=list(categories))
+
+
+def make_roster(rows, seed=0):
+    """
+    生成合成专家名单。
+
+    参数:
+        rows (int): 行数。
+        seed (int): 随机种子，同样的参数总是得到同样的名单。
+
+    返回:
+        pandas.DataFrame: 包含 专家编号、姓名、研究领域、单位、职称、简介 列。
+    """
+    rng = np.random.default_rng(seed)
+    fields = [f"领域{code:02d}" for code in range(FIELD_COUNT)]
+    organizations = [f"单位{code:04d}" for code in range(min(max(20, rows // 25), 5000))]
+    names = (np.asarray(SURNAMES)[rng.integers(0, len(SURNAMES), rows)].astype(object)
+             + np.asarray(GIVEN)[rng.integers(0, len(GIVEN), rows)].astype(object)
+             + np.asarray(GIVEN)[rng.integers(0, len(GIVEN), rows)].astype(object))
+    return pd.DataFrame({
+        '专家编号': [f"E{row:07d}" for row in range(rows)],
+        NAME_COLUMN: names,
+        FIELD_COLUMN: _long_tail(rng, fields, rows, 0.8),
+        ORG_COLUMN: _long_tail(rng, organizations, rows, 1.1),
+        TITLE_COLUMN: pd.Categorical.from_codes(
+            rng.choice(len(TITLES), size=rows, p=TITLE_SHARES), categories=list(TITLES)
+        ),
+        '简介': "长期从事相关领域的研究和工程应用工作，主持完成多项国家和省部级项目。",
+    })
+
+
+def rounds_for(rows, small=10):
+    """大规模名单只测量少数几轮，避免一次运行耗时过长"""
+    if rows >= 1000000:
+        return 1
+    if rows >= 100000:
+        return 3
+    return small
+
+
+def pytest_addoption(parser):
+    parser.addoption('--roster-sizes', default=DEFAULT_SIZES,
+                     help="合成名单的行数，逗号分隔，例如 1k,10k,100k,1M")
+
+
+def pytest_generate_tests(metafunc):
+    if 'roster_rows' in metafunc.fixturenames:
+        sizes = [parse_size(text) for text in metafunc.config.getoption('roster_sizes').split(',') if text]
+        metafunc.parametrize('roster_rows', sizes, ids=[size_label(rows) for rows in sizes], scope='session')
+
+
+@pytest.fixture(scope='session')
+def data_dir():
+    path = os.environ.get(DATA_DIR_ENV) or DEFAULT_DATA_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@pytest.fixture(scope='session')
+def roster_df(roster_rows):
+    """内存中的合成名单"""
+    experts_df = make_roster(roster_rows)
+    experts_df.attrs['roster_sha256'] = f"synthetic-{GENERATOR_VERSION}-{roster_rows}"
+    return experts_df
+
+
+@pytest.fixture(scope='session')
+def roster_index(roster_df):
+    return lottery_engine.RosterIndex(roster_df)
+
+
+@pytest.fixture(scope='session')
+def roster_xlsx(roster_rows, roster_df, data_dir):
+    """合成名单的 xlsx 文件，已存在时直接复用"""
+    path = os.path.join(data_dir, f"roster-v{GENERATOR_VERSION}-{size_label(roster_rows)}.xlsx")
+    if not os.path.exists(path):
+        lottery_export.export_table(roster_df, path)
+    return path
+
+
+@pytest.fixture(scope='session')
+def draw_filters(roster_index):
+    """有代表性的筛选条件：人数居中的 3 个研究领域，回避最大的 2 个单位"""
+    field_sizes = sorted(roster_index.field_rows.items(), key=lambda item: -len(item[1]))
+    middle = len(field_sizes) // 2
+    org_sizes = sorted(roster_index.org_rows.items(), key=lambda item: -len(item[1]))
+    return {
+        'fields': [field for field, _ in field_sizes[middle:middle + 3]],
+        'avoid_orgs': [organization for organization, _ in org_sizes[:2]],
+    }
@@ -0,0 +1,284 @@
+"""
+抽取记录（manifest）。
+
+每次抽取都使用 lottery_engine.new_seed 生成的 128 位种子。抽取记录保存
+种子、名单内容哈希、筛选条件（包括冷却期排除的行、权重公式和组队规则）和抽中的行位置，以 JSON 形式写在结果文件旁边，
+之后可以用同一份名单重新执行并核对结果（replay）。
+"""
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+
+import lottery_engine
+import panel_solver
+
+MANIFEST_VERSION = 1
+
+# 抽取方式
+MODE_DRAW = 'draw'
+MODE_QUOTA = 'quota'
+MODE_BATCH = 'batch'
+
+
+def manifest_path_for(output_path):
+    """返回结果文件对应的抽取记录路径，例如 抽奖结果.xlsx -> 抽奖结果.manifest.json"""
+    return f"{os.path.splitext(output_path)[0]}.manifest.json"
+
+
+def selection_digest(selected):
+    """计算批量抽取结果的摘要，避免在记录中保存整个 K×n 矩阵"""
+    selected = np.ascontiguousarray(selected, dtype=np.int64)
+    digest = hashlib.sha256(repr(selected.shape).encode('ascii'))
+    digest.update(selected.tobytes())
+    return digest.hexdigest()
+
+
+def weights_digest(weights):
+    """计算权重数组的摘要，用于核对重新计算的权重是否一致"""
+    return hashlib.sha256(np.ascontiguousarray(weights, dtype=np.float64).tobytes()).hexdigest()
+
+
+def build_manifest(experts_df, selected, seed, mode=MODE_DRAW, fields=None, avoid_orgs=None,
+                   count=None, quotas=None, num_panels=None, roster_path=None,
+                   cooldown_days=None, excluded=None, weight_expression=None, weights=None,
+                   weight_variables=None, constraints=None):
+    """
+    生成抽取记录。
+
+    参数:
+        experts_df (pandas.DataFrame): 抽取所用的名单，attrs['roster_sha256'] 为名单哈希。
+        selected (numpy.ndarray): 抽中的行位置；批量抽取时为 K×n 矩阵。
+        seed (int): 抽取所用的种子。
+        mode (str): 抽取方式，'draw'、'quota' 或 'batch'。
+        fields (list): 研究领域筛选条件。
+        avoid_orgs (list): 回避单位。
+        count (int): 每组抽取人数（draw、batch）。
+        quotas (dict): 研究领域配额（quota）。
+        num_panels (int): 专家组数量（batch）。
+        roster_path (str): 名单文件路径；合并的名单从 attrs['sources'] 记录各个来源。
+        cooldown_days (float): 冷却天数。
+        excluded (numpy.ndarray): 因冷却期被排除的行掩码或行位置。抽中记录之后还会变化，
+            因此记录排除的行本身，重新抽取时不再查询抽中记录。
+        weight_expression (str): 加权抽取的权重列名或公式。
+        weights (numpy.ndarray): 抽取所用的权重。
+        weight_variables (dict): 公式引用的其他变量（例如 抽中次数），只记录非零项。
+        constraints (panel_solver.PanelConstraints): 组队规则；配额抽取时已包含配额。
+
+    返回:
+        dict: 可直接序列化为 JSON 的抽取记录。
+    """
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'created': datetime.now().astimezone().isoformat(timespec='seconds'),
+        'mode': mode,
+        # 128 位整数超出 JSON 数字的安全范围，以字符串保存
+        'seed': str(seed),
+        'roster': {
+            'path': os.path.abspath(roster_path) if roster_path else None,
+            'sha256': experts_df.attrs.get('roster_sha256'),
+            'rows': len(experts_df),
+        },
+        'filters': {
+            'fields': list(fields or []),
+            'avoid_orgs': list(avoid_orgs or []),
+        },
+    }
+    if cooldown_days:
+        excluded = np.asarray(excluded if excluded is not None else [])
+        if excluded.dtype == bool:
+            excluded = np.flatnonzero(excluded)
+        manifest['cooldown'] = {
+            'days': cooldown_days,
+            'excluded': [int(row) for row in np.sort(excluded)],
+        }
+    if constraints:
+        manifest['constraints'] = constraints.to_dict()
+    if weight_expression:
+        manifest['weights'] = {
+            'expression': weight_expression,
+            'sha256': weights_digest(weights),
+            'variables': {
+                name: {str(row): int(values[row]) for row in np.flatnonzero(values)}
+                for name, values in (weight_variables or {}).items()
+            },
+        }
+    sources = experts_df.attrs.get('sources')
+    if sources:
+        manifest['roster']['sources'] = [
+            {'path': source['path'], 'sheet': source['sheet']} for source in sources
+        ]
+    if mode == MODE_QUOTA:
+        manifest['quotas'] = dict(quotas)
+    else:
+        manifest['count'] = int(count)
+    if mode == MODE_BATCH:
+        manifest['panels'] = int(num_panels)
+        manifest['selected_sha256'] = selection_digest(selected)
+    else:
+        manifest['selected'] = [int(row) for row in selected]
+    return manifest
+
+
+def write_manifest(manifest, path):
+    """把抽取记录写入 JSON 文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def read_manifest(path):
+    """读取抽取记录，path 为 "-" 时从标准输入读取；版本不支持时抛出 ValueError"""
+    if path == '-':
+        manifest = json.load(sys.stdin)
+    else:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"不支持的抽取记录版本: {manifest.get('version')}")
+    return manifest
+
+
+def roster_sources(manifest):
+    """
+    返回抽取记录中名单的来源列表。
+
+    返回:
+        list: (文件路径, 工作表名称) 列表；单个文件的名单返回 None。
+    """
+    sources = manifest['roster'].get('sources')
+    if not sources:
+        return None
+    return [(source['path'], source['sheet']) for source in sources]
+
+
+def replay_weights(manifest, roster_index):
+    """
+    按抽取记录重新计算权重；不是加权抽取时返回 None。
+
+    重新计算的权重与记录不一致时抛出 ValueError。
+    """
+    recorded = manifest.get('weights')
+    if not recorded:
+        return None
+    variables = {}
+    for name, sparse in recorded['variables'].items():
+        values = np.zeros(roster_index.size, dtype=np.int64)
+        for row, value in sparse.items():
+            values[int(row)] = value
+        variables[name] = values
+    weights = lottery_engine.evaluate_weights(roster_index.experts_df, recorded['expression'], variables)
+    if weights_digest(weights) != recorded['sha256']:
+        raise ValueError("按抽取记录重新计算的权重与记录不一致，无法核对")
+    return weights
+
+
+def draw_selection(roster_index, seed, mode=MODE_DRAW, count=None, quotas=None, num_panels=None,
+                   fields=None, avoid_orgs=None, exclude=None, weights=None, constraints=None):
+    """
+    按抽取方式执行一次抽取。抽取和重新抽取共用这一入口，保证同样的参数得到同样的结果。
+
+    参数:
+        roster_index (lottery_engine.RosterIndex): 名单索引。
+        seed (int): 随机种子。
+        mode (str): 抽取方式，'draw'、'quota' 或 'batch'。
+        count (int): 每组抽取人数（draw、batch）。
+        quotas (dict): 研究领域配额（quota）。
+        num_panels (int): 专家组数量（batch）。
+        fields (list): 研究领域筛选条件，配额抽取时不使用。
+        avoid_orgs (list): 回避单位。
+        exclude (numpy.ndarray): 需要排除的行掩码或行位置。
+        weights (numpy.ndarray): 权重，None 表示等概率。
+        constraints (panel_solver.PanelConstraints): 组队规则；配额抽取时应已包含配额。
+
+    返回:
+        numpy.ndarray: 抽中的行位置；批量抽取时为 K×n 矩阵。
+    """
+    if mode not in (MODE_DRAW, MODE_QUOTA, MODE_BATCH):
+        raise ValueError(f"未知的抽取方式: '{mode}'")
+
+    if constraints:
+        if mode == MODE_QUOTA:
+            pool = roster_index.pool(fields=list(quotas), avoid_orgs=avoid_orgs, exclude=exclude)
+            return panel_solver.solve_panel(
+                roster_index, pool, sum(quotas.values()), constraints, random_state=seed, weights=weights,
+            )
+        pool = roster_index.pool(fields=fields, avoid_orgs=avoid_orgs, exclude=exclude)
+        if mode == MODE_BATCH:
+            return panel_solver.solve_panels(
+                roster_index, pool, count, num_panels, constraints, random_state=seed, weights=weights,
+            )
+        return panel_solver.solve_panel(roster_index, pool, count, constraints, random_state=seed, weights=weights)
+
+    if mode == MODE_QUOTA:
+        return lottery_engine.sample_quota(
+            roster_index, quotas, avoid_orgs=avoid_orgs, random_state=seed, exclude=exclude, weights=weights,
+        )
+
+    pool = roster_index.pool(fields=fields, avoid_orgs=avoid_orgs, exclude=exclude)
+    if mode == MODE_BATCH:
+        if weights is not None:
+            return lottery_engine.sample_weighted_batch(pool, count, num_panels, weights, random_state=seed)
+        return lottery_engine.sample_batch(pool, count, num_panels, random_state=seed)
+    if weights is not None:
+        return lottery_engine.sample_weighted(pool, count, weights, random_state=seed)
+    return lottery_engine.sample_pool(pool, count, random_state=seed)
+
+
+def replay(manifest, roster_index):
+    """
+    按抽取记录在名单上重新执行抽取。
+
+    参数:
+        manifest (dict): 抽取记录。
+        roster_index (lottery_engine.RosterIndex): 名单索引。
+
+    返回:
+        numpy.ndarray: 重新抽取得到的行位置；批量抽取时为 K×n 矩阵。
+    """
+    filters = manifest['filters']
+    exclude = None
+    if 'cooldown' in manifest:
+        exclude = np.asarray(manifest['cooldown']['excluded'], dtype=np.intp)
+    constraints = None
+    if 'constraints' in manifest:
+        constraints = panel_solver.PanelConstraints.from_dict(manifest['constraints'])
+
+    return draw_selection(
+        roster_index, int(manifest['seed']), mode=manifest['mode'],
+        count=manifest.get('count'), quotas=manifest.get('quotas'), num_panels=manifest.get('panels'),
+        fields=filters['fields'], avoid_orgs=filters['avoid_orgs'], exclude=exclude,
+        weights=replay_weights(manifest, roster_index), constraints=constraints,
+    )
+
+
+def replay_selection(manifest, roster_index):
+    """
+    重新执行抽取并核对结果。
+
+    名单内容与记录不一致时抛出 ValueError。
+
+    返回:
+        numpy.ndarray: 与记录一致时返回重新抽取得到的行位置，否则返回 None。
+    """
+    roster_hash = roster_index.experts_df.attrs.get('roster_sha256')
+    if manifest['roster']['sha256'] != roster_hash:
+        raise ValueError("名单内容与抽取记录不一致，无法核对")
+
+    selected = replay(manifest, roster_index)
+    if manifest['mode'] == MODE_BATCH:
+        matched = selection_digest(selected) == manifest['selected_sha256']
+    else:
+        matched = [int(row) for row in selected] == manifest['selected']
+    return selected if matched else None
+
+
+def verify(manifest, roster_index):
+    """
+    核对抽取记录：名单哈希一致且重新抽取的结果与记录相同时返回 True。
+
+    名单内容与记录不一致时抛出 ValueError。
+    """
+    return replay_selection(manifest, roster_index) is not None
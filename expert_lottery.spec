@@ -1,45 +1,132 @@
 # -*- mode: python ; coding: utf-8 -*-
+#
+# 默认生成单个 exe（one-file）。单文件每次启动都要先解压到临时目录，
+# 设置 EXPERT_LOTTERY_ONEDIR=1 时改为生成目录（one-dir），启动更快：
+#
+#     pyinstaller expert_lottery.spec
+#     set EXPERT_LOTTERY_ONEDIR=1 && pyinstaller expert_lottery.spec
+#
+# 启动时间目标：one-dir 构建从启动到窗口显示不超过 1 秒。
+# 设置 EXPERT_LOTTERY_STARTUP_CHECK=1 运行程序，窗口显示后会输出耗时并退出。
+import os
 
 block_cipher = None
 
+ONEDIR = os.environ.get('EXPERT_LOTTERY_ONEDIR', '') not in ('', '0')
+
+# 界面按需导入这些模块（见 expert_lottery_gui._LazyModule），分析器无法自动发现
+LAZY_MODULES = [
+    'lottery_engine', 'roster_reader', 'roster_cache', 'panel_solver',
+    'draw_manifest', 'selection_history', 'lottery_export', 'openpyxl',
+]
+
+# 程序用不到的 Qt 模块和 pandas 可选依赖
+EXCLUDES = [
+    # Qt：只使用 QtCore、QtGui、QtWidgets
+    'PyQt6.QtBluetooth', 'PyQt6.QtDBus', 'PyQt6.QtDesigner', 'PyQt6.QtHelp',
+    'PyQt6.QtMultimedia', 'PyQt6.QtMultimediaWidgets', 'PyQt6.QtNetwork', 'PyQt6.QtNfc',
+    'PyQt6.QtOpenGL', 'PyQt6.QtOpenGLWidgets', 'PyQt6.QtPdf', 'PyQt6.QtPdfWidgets',
+    'PyQt6.QtPositioning', 'PyQt6.QtPrintSupport', 'PyQt6.QtQml', 'PyQt6.QtQuick',
+    'PyQt6.QtQuick3D', 'PyQt6.QtQuickWidgets', 'PyQt6.QtRemoteObjects', 'PyQt6.QtSensors',
+    'PyQt6.QtSerialPort', 'PyQt6.QtSpatialAudio', 'PyQt6.QtSql', 'PyQt6.QtSvg',
+    'PyQt6.QtSvgWidgets', 'PyQt6.QtTest', 'PyQt6.QtTextToSpeech', 'PyQt6.QtWebChannel',
+    'PyQt6.QtWebEngineCore', 'PyQt6.QtWebEngineWidgets', 'PyQt6.QtWebSockets', 'PyQt6.QtXml',
+    'PyQt6.Qt3DCore', 'PyQt6.QtCharts', 'PyQt6.QtDataVisualization',
+    # pandas 的测试、样式表和其他文件格式的可选依赖
+    'pandas.tests', 'pandas.io.formats.style', 'pandas.io.clipboard',
+    'matplotlib', 'scipy', 'numexpr', 'bottleneck', 'pyarrow', 'fastparquet', 'tables',
+    'sqlalchemy', 'xlsxwriter', 'odf', 'pyxlsb', 'jinja2', 'IPython',
+    # 其他
+    'numpy.tests', 'tkinter', 'unittest', 'pytest', 'PIL', 'pydoc', 'lib2to3',
+]
+
 a = Analysis(
     ['expert_lottery_gui.py'],
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['pandas', 'openpyxl', 'PyQt6'],
+    hiddenimports=LAZY_MODULES,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
     noarchive=False,
 )
 
+# Qt 插件依赖的 PDF、SVG 和软件 OpenGL 库界面用不到；翻译文件只保留中文
+UNUSED_QT_FILES = ('qt6pdf', 'qpdf', 'qt6svg', 'qsvg', 'opengl32sw', 'd3dcompiler')
+
+
+def _keep_qt_file(dest_name):
+    name = dest_name.replace('\\', '/').lower()
+    if 'pyqt6/qt6/' not in name:
+        return True
+    if '/translations/' in name:
+        return '_zh_cn' in name
+    return not any(part in name.rsplit('/', 1)[-1] for part in UNUSED_QT_FILES)
+
+
+a.binaries = [entry for entry in a.binaries if _keep_qt_file(entry[0])]
+a.datas = [entry for entry in a.datas if _keep_qt_file(entry[0])]
+
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
-    name='专家抽奖系统',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon='app_icon.ico',
-    version='file_version_info.txt',
-) 
\ No newline at end of file
+# UPX 压缩的 Qt 和 Python 运行库启动时需要解压，而且压缩后容易被杀毒软件拦截
+UPX_EXCLUDE = ['vcruntime140.dll', 'python3*.dll', 'Qt6*.dll', 'qwindows.dll']
+
+if ONEDIR:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='专家抽奖系统',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon='app_icon.ico',
+        version='file_version_info.txt',
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        strip=False,
+        upx=False,
+        name='专家抽奖系统',
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        [],
+        name='专家抽奖系统',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        upx_exclude=UPX_EXCLUDE,
+        runtime_tmpdir=None,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon='app_icon.ico',
+        version='file_version_info.txt',
+    )
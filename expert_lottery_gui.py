@@ -1,23 +1,626 @@
+"""
+专家抽奖系统图形界面。
+
+启动时只导入 PyQt6 和标准库，窗口先显示出来；pandas、openpyxl 和各个抽取模块
+在窗口显示后于后台线程中预先导入，或在第一次加载名单时导入（见 _LazyModule）。
+启动时间目标：one-dir 构建从启动到窗口显示不超过 1 秒，
+可设置环境变量 EXPERT_LOTTERY_STARTUP_CHECK=1 测量（窗口显示后输出耗时并退出）。
+"""
+import time
+
+_STARTED = time.perf_counter()
+
 import sys
 import os
-import pandas as pd
-import random
+import importlib
+import multiprocessing
+import threading
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QPushButton, QLabel, QFileDialog, 
-                            QSpinBox, QTableWidget, QTableWidgetItem, QHeaderView,
-                            QMessageBox, QLineEdit, QComboBox, QGroupBox)
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QFont, QIcon, QPalette, QColor
+                            QSpinBox, QTableView, QHeaderView,
+                            QMessageBox, QLineEdit, QComboBox, QGroupBox, QProgressBar,
+                            QCheckBox, QFrame, QListView)
+from PyQt6.QtCore import (Qt, QSize, QAbstractListModel, QAbstractTableModel, QModelIndex, QObject,
+                          QPoint, QThread, QFileSystemWatcher, QTimer, pyqtSignal)
+from PyQt6.QtGui import QFont, QIcon, QPalette, QColor, QStandardItem, QStandardItemModel
+
+# 只依赖标准库，不影响启动时间
+import org_alias
+import perf_trace
+
+# 启动时间检查：设置后窗口显示即输出耗时并退出
+STARTUP_CHECK_ENV = 'EXPERT_LOTTERY_STARTUP_CHECK'
+
+
+class _LazyModule:
+    """
+    第一次访问属性时才导入的模块。
+
+    抽取模块会导入 pandas 和 numpy，约占启动时间的一半，
+    推迟到加载名单时导入可以让窗口先显示出来。
+    打包时需要在 expert_lottery.spec 的 hiddenimports 中列出这些模块。
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        # sys.modules 中已有时 import_module 直接返回，开销很小
+        return getattr(importlib.import_module(self._name), attr)
+
+
+LAZY_MODULES = ('lottery_engine', 'roster_reader', 'roster_cache', 'panel_solver',
+                'draw_manifest', 'selection_history', 'lottery_export')
+
+draw_manifest = _LazyModule('draw_manifest')
+lottery_engine = _LazyModule('lottery_engine')
+lottery_export = _LazyModule('lottery_export')
+panel_solver = _LazyModule('panel_solver')
+roster_cache = _LazyModule('roster_cache')
+roster_reader = _LazyModule('roster_reader')
+selection_history = _LazyModule('selection_history')
+
+
+def preload_modules():
+    """在后台线程中导入抽取模块和 openpyxl，减少第一次加载名单时的等待"""
+    def run():
+        try:
+            for name in LAZY_MODULES + ('openpyxl',):
+                importlib.import_module(name)
+        except ImportError:
+            # 缺少依赖时留到加载名单时再报告
+            pass
+    threading.Thread(target=run, name='preload', daemon=True).start()
+
+
+class OptionListModel(QAbstractListModel):
+    """
+    可多选选项的列表模型。
+
+    选项、勾选状态和人数都保存在 Python 列表和集合中：替换全部选项只重置一次模型；
+    搜索时先在预先归一化的搜索文字中找出匹配的选项，再重置一次，
+    上万个选项也能在输入时即时响应。
+    """
+
+    # 勾选状态变化
+    checked_changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._values = []
+        self._search_keys = []
+        self._rows = []
+        self._checked = set()
+        self._counts = None
+        self._terms = []
+
+    @staticmethod
+    def _search_key(value, aliases):
+        # 同一单位的其他写法也参与搜索，归一化后以 | 分隔（归一化结果中不含 |）
+        texts = [value, *aliases]
+        return '|'.join(org_alias.normalize_org(text) for text in texts)
+
+    def set_values(self, values, aliases=None):
+        """替换全部选项，保留仍然存在的已勾选项；aliases 为 选项 -> 其他可搜索的写法"""
+        aliases = aliases or {}
+        self.beginResetModel()
+        self._values = list(values)
+        self._search_keys = [self._search_key(value, aliases.get(value, ())) for value in self._values]
+        checked = self._checked & set(self._values)
+        removed_checked = checked != self._checked
+        self._checked = checked
+        self._rows = self._matching_rows()
+        self.endResetModel()
+        if removed_checked:
+            self.checked_changed.emit()
+
+    def add_values(self, values, aliases=None):
+        """在末尾追加选项"""
+        aliases = aliases or {}
+        existing = set(self._values)
+        # 去掉已有的选项和重复的新选项，保持给定的顺序
+        values = [value for value in dict.fromkeys(values) if value not in existing]
+        if not values:
+            return
+        self.beginResetModel()
+        self._values.extend(values)
+        self._search_keys.extend(self._search_key(value, aliases.get(value, ())) for value in values)
+        self._rows = self._matching_rows()
+        self.endResetModel()
+
+    def remove_values(self, values):
+        """删除指定的选项"""
+        values = set(values)
+        if not values.intersection(self._values):
+            return
+        keep = [position for position, value in enumerate(self._values) if value not in values]
+        self.beginResetModel()
+        self._values = [self._values[position] for position in keep]
+        self._search_keys = [self._search_keys[position] for position in keep]
+        self._rows = self._matching_rows()
+        removed_checked = bool(self._checked & values)
+        self._checked -= values
+        self.endResetModel()
+        if removed_checked:
+            self.checked_changed.emit()
+
+    def set_filter(self, text):
+        """只显示包含搜索文字的选项，空格分隔的多个关键字需要全部包含"""
+        self._terms = [org_alias.normalize_org(term) for term in text.split()]
+        self._terms = [term for term in self._terms if term]
+        self.beginResetModel()
+        self._rows = self._matching_rows()
+        self.endResetModel()
+
+    def _matching_rows(self):
+        if not self._terms:
+            return range(len(self._values))
+        return [position for position, key in enumerate(self._search_keys)
+                if all(term in key for term in self._terms)]
+
+    def set_counts(self, counts):
+        """设置每个选项的人数（选项 -> 人数），None 表示不显示人数"""
+        self._counts = counts
+        if self._rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self._rows) - 1))
+
+    def option_count(self):
+        """全部选项的数量（不受搜索影响）"""
+        return len(self._values)
+
+    def checked_values(self):
+        """按选项顺序返回已勾选的选项"""
+        if not self._checked:
+            return []
+        return [value for value in self._values if value in self._checked]
+
+    def set_checked_values(self, values):
+        """勾选指定的选项，其余选项取消勾选"""
+        self._checked = set(values).intersection(self._values)
+        if self._rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self._rows) - 1))
+        self.checked_changed.emit()
+
+    def toggle(self, row):
+        """切换当前显示的第 row 行的勾选状态"""
+        if not 0 <= row < len(self._rows):
+            return
+        value = self._values[self._rows[row]]
+        if value in self._checked:
+            self._checked.discard(value)
+        else:
+            self._checked.add(value)
+        self.dataChanged.emit(self.index(row), self.index(row))
+        self.checked_changed.emit()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self._values[self._rows[index.row()]]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if self._counts is None:
+                return str(value)
+            return f"{value} ({self._counts.get(value, 0)})"
+        if role == Qt.ItemDataRole.CheckStateRole:
+            return Qt.CheckState.Checked if value in self._checked else Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.ForegroundRole:
+            if self._counts is not None and not self._counts.get(value):
+                return QColor(128, 128, 128)
+            return None
+        if role == Qt.ItemDataRole.UserRole:
+            return value
+        return None
+
+    def flags(self, index):
+        # 勾选由 CheckableComboBox 处理点击和按键，避免点中复选框时切换两次
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+
+class CheckableComboBox(QComboBox):
+    """
+    可搜索、可多选的下拉框，未选中任何项时显示占位文字。
+
+    展开后是带搜索框的选项列表（OptionListModel），输入关键字即时筛选；
+    单击选项或按空格键勾选，在搜索框中按回车勾选第一个匹配项，
+    按下方向键进入列表。选项可以显示人数，见 set_counts。
+    """
+
+    # 勾选的选项变化
+    checked_changed = pyqtSignal()
+
+    def __init__(self, placeholder, parent=None):
+        super().__init__(parent)
+        self.placeholder = placeholder
+        self.option_model = OptionListModel(self)
+        
+        # 使用只读的编辑框显示已选项的摘要
+        self.setEditable(True)
+        self.lineEdit().setReadOnly(True)
+        self.lineEdit().installEventFilter(self)
+        
+        # 弹出的搜索框和选项列表
+        self.popup = QFrame(self, Qt.WindowType.Popup)
+        self.popup.setFrameShape(QFrame.Shape.Box)
+        popup_layout = QVBoxLayout(self.popup)
+        popup_layout.setContentsMargins(3, 3, 3, 3)
+        
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("输入关键字搜索...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.option_model.set_filter)
+        self.search_edit.installEventFilter(self)
+        
+        self.list_view = QListView()
+        self.list_view.setModel(self.option_model)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.clicked.connect(lambda index: self.option_model.toggle(index.row()))
+        self.list_view.installEventFilter(self)
+        
+        popup_footer = QHBoxLayout()
+        self.option_summary = QLabel()
+        clear_button = QPushButton("清除选择")
+        clear_button.clicked.connect(lambda: self.set_checked_items([]))
+        popup_footer.addWidget(self.option_summary, 1)
+        popup_footer.addWidget(clear_button)
+        
+        popup_layout.addWidget(self.search_edit)
+        popup_layout.addWidget(self.list_view)
+        popup_layout.addLayout(popup_footer)
+        
+        self.option_model.checked_changed.connect(self._update_text)
+        self.option_model.checked_changed.connect(self.checked_changed)
+        self.option_model.modelReset.connect(self._update_summary)
+        self._update_text()
+        
+    def eventFilter(self, obj, event):
+        if event.type() == event.Type.MouseButtonRelease and obj is self.lineEdit():
+            # 点击摘要文字时弹出选项列表
+            self.showPopup()
+            return True
+        if event.type() == event.Type.KeyPress:
+            key = event.key()
+            if obj is self.search_edit:
+                if key == Qt.Key.Key_Down and self.option_model.rowCount():
+                    self.list_view.setFocus()
+                    self.list_view.setCurrentIndex(self.option_model.index(0))
+                    return True
+                if key in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+                    self.option_model.toggle(0)
+                    return True
+            elif obj is self.list_view and key in (Qt.Key.Key_Space, Qt.Key.Key_Return, Qt.Key.Key_Enter):
+                current = self.list_view.currentIndex()
+                if current.isValid():
+                    self.option_model.toggle(current.row())
+                return True
+        return super().eventFilter(obj, event)
+        
+    def showPopup(self):
+        """在下拉框下方显示搜索框和选项列表"""
+        self.search_edit.clear()
+        self.popup.resize(max(self.width(), 300), 360)
+        self.popup.move(self.mapToGlobal(QPoint(0, self.height())))
+        self.popup.show()
+        self.search_edit.setFocus()
+        
+    def hidePopup(self):
+        self.popup.hide()
+        
+    def _update_text(self):
+        checked = self.checked_items()
+        self.lineEdit().setText(", ".join(str(value) for value in checked) if checked else self.placeholder)
+        self.lineEdit().setCursorPosition(0)
+        self._update_summary()
+        
+    def _update_summary(self):
+        shown = self.option_model.rowCount()
+        total = self.option_model.option_count()
+        text = f"共 {total} 项" if shown == total else f"匹配 {shown}/{total} 项"
+        self.option_summary.setText(f"{text}，已选 {len(self.checked_items())} 项")
+        
+    def set_items(self, values, aliases=None):
+        """
+        替换全部选项，并保留仍然存在的已选项。
+
+        参数:
+            values (list): 选项。
+            aliases (dict): 选项 -> 其他写法，搜索这些写法时也能找到该选项。
+        """
+        self.option_model.set_values(values, aliases)
+        
+    def add_items(self, values, aliases=None):
+        """在末尾追加选项"""
+        self.option_model.add_values(values, aliases)
+            
+    def remove_items(self, values):
+        """删除指定的选项"""
+        self.option_model.remove_values(values)
+        self._update_text()
+        
+    def set_counts(self, counts):
+        """在选项后显示人数（选项 -> 人数），人数为 0 的选项显示为灰色；None 表示不显示"""
+        self.option_model.set_counts(counts)
+        
+    def checked_items(self):
+        """返回所有已勾选的选项"""
+        return self.option_model.checked_values()
+        
+    def set_checked_items(self, values):
+        """勾选指定的选项，其余选项取消勾选"""
+        self.option_model.set_checked_values(values)
+
+
+class ExpertTableModel(QAbstractTableModel):
+    """
+    专家表格的数据模型。
+
+    直接引用 DataFrame 各列的数组，只在视图请求可见单元格时才转换为文字，
+    显示开销与结果行数无关。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._headers = []
+        self._columns = []
+        self._row_count = 0
+        
+    def set_frame(self, experts_df):
+        """替换显示的数据"""
+        self.beginResetModel()
+        if experts_df is None:
+            self._headers, self._columns, self._row_count = [], [], 0
+        else:
+            self._headers = [str(column) for column in experts_df.columns]
+            self._columns = [experts_df[column].to_numpy() for column in experts_df.columns]
+            self._row_count = len(experts_df)
+        self.endResetModel()
+        
+    def clear(self):
+        """清空表格"""
+        self.set_frame(None)
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+        
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+        
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(self._columns[index.column()][index.row()])
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+        
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._headers[section]
+        return str(section + 1)
+
+
+class LoadedRoster:
+    """后台加载完成的名单及其索引和筛选选项；增量更新时 diff 为与上一版本的差异"""
+
+    def __init__(self, file_paths, experts_df, roster_index, research_fields, organizations, diff=None,
+                 all_sheets=False):
+        self.file_paths = file_paths
+        self.all_sheets = all_sheets
+        self.experts_df = experts_df
+        self.roster_index = roster_index
+        self.research_fields = research_fields
+        self.organizations = organizations
+        self.diff = diff
+
+
+def _merge_options(previous_options, present, candidates):
+    """保留仍然存在的旧选项顺序，并在末尾追加新出现的选项"""
+    options = [value for value in previous_options if value in present]
+    known = set(options)
+    options.extend(value for value in candidates if value in present and value not in known)
+    return options
+
+
+class RosterLoadWorker(QObject):
+    """
+    在后台线程中加载名单、建立索引并整理筛选选项。
+
+    选择多个文件或读取所有工作表时合并为一份名单并去重。
+    给出 previous（当前的 LoadedRoster）时按专家标识与旧名单比较，
+    增量更新索引和筛选选项。
+    """
+
+    progress = pyqtSignal(int, str)
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+
+    def __init__(self, file_paths, previous=None, all_sheets=False, perf=None):
+        super().__init__()
+        self.file_paths = list(file_paths)
+        self.all_sheets = all_sheets
+        self.previous = previous
+        self.perf = perf or perf_trace.PerfRecorder(enabled=False)
+        self._cancel_requested = False
+        
+    def cancel(self):
+        """请求取消加载，在下一个检查点生效"""
+        self._cancel_requested = True
+        
+    def is_cancelled(self):
+        return self._cancel_requested
+        
+    def run(self):
+        try:
+            with self.perf.stage('load.read', files=len(self.file_paths), all_sheets=self.all_sheets) as span:
+                experts_df = self.load_roster()
+                span.details['rows'] = len(experts_df)
+            
+            if self.previous is not None:
+                self.progress.emit(85, "正在比较名单变化...")
+                with self.perf.stage('load.index', rows=len(experts_df), incremental=True):
+                    loaded = self.update_previous(experts_df)
+                self.progress.emit(100, "名单更新完成")
+                self.loaded.emit(loaded)
+                return
+                
+            self.progress.emit(85, "正在建立筛选索引...")
+            with self.perf.stage('load.index', rows=len(experts_df), incremental=False):
+                roster_index = lottery_engine.RosterIndex(experts_df)
+                if self._cancel_requested:
+                    raise roster_cache.LoadCancelled()
+                    
+                research_fields = []
+                if lottery_engine.FIELD_COLUMN in experts_df.columns:
+                    research_fields = experts_df[lottery_engine.FIELD_COLUMN].dropna().unique().tolist()
+                # 回避单位下拉框列出规范单位，同一单位的不同写法只出现一次
+                organizations = list(roster_index.org_index.canonical)
+            if self._cancel_requested:
+                raise roster_cache.LoadCancelled()
+                
+            self.progress.emit(100, "名单加载完成")
+            self.loaded.emit(LoadedRoster(
+                self.file_paths, experts_df, roster_index, research_fields, organizations,
+                all_sheets=self.all_sheets,
+            ))
+        except roster_cache.LoadCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(e)
+            
+    def load_roster(self):
+        """加载单个文件的第一个工作表，或合并多个文件、工作表"""
+        progress = lambda percent, message: self.progress.emit(int(percent * 0.8), message)
+        if len(self.file_paths) == 1 and not self.all_sheets:
+            return roster_cache.load_roster(
+                self.file_paths[0], progress=progress, should_cancel=self.is_cancelled
+            )
+        sources = roster_reader.expand_sources(self.file_paths, all_sheets=self.all_sheets)
+        return roster_cache.load_roster_set(sources, progress=progress, should_cancel=self.is_cancelled)
+        
+    def update_previous(self, experts_df):
+        """与上一版本名单比较，只更新受影响的索引项和筛选选项"""
+        previous = self.previous
+        diff = lottery_engine.diff_rosters(
+            previous.experts_df, experts_df, old_keys=previous.roster_index.keys()
+        )
+        roster_index = previous.roster_index.updated(experts_df, diff)
+        if self._cancel_requested:
+            raise roster_cache.LoadCancelled()
+            
+        research_fields = _merge_options(
+            previous.research_fields, roster_index.field_rows, roster_index.fields
+        )
+        organizations = _merge_options(
+            previous.organizations, set(roster_index.org_index.canonical), roster_index.org_index.canonical
+        )
+        return LoadedRoster(
+            self.file_paths, experts_df, roster_index, research_fields, organizations, diff=diff,
+            all_sheets=self.all_sheets,
+        )
+
+
+# 性能面板的列和保留的行数
+PERF_PANEL_HEADERS = ["时间", "阶段", "耗时 (ms)", "内存峰值 (MB)", "说明"]
+PERF_PANEL_ROWS = 100
+
+
+def summarize_values(values, limit=3):
+    """把多个筛选值压缩为简短的说明文字"""
+    if len(values) <= limit:
+        return ",".join(str(value) for value in values)
+    return f"{','.join(str(value) for value in values[:limit])}等{len(values)}项"
+
+
+def summarize_quotas(quotas, limit=3):
+    """把领域配额压缩为简短的说明文字"""
+    return summarize_values([f"{field}{count}" for field, count in quotas.items()], limit)
+
+
+class ExportWorker(QObject):
+    """
+    在后台线程中导出抽取结果，导出期间界面不会停止响应。
+
+    只负责写入结果文件；抽取记录和抽中记录由主线程在导出完成后写入。
+    """
+
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+
+    def __init__(self, result_df, file_path, manifest, perf=None):
+        super().__init__()
+        self.result_df = result_df
+        self.file_path = file_path
+        self.manifest = manifest
+        self.perf = perf or perf_trace.PerfRecorder(enabled=False)
+        self._cancel_requested = False
+        # run 结束时置位，关闭窗口时主线程据此等待，不依赖排队到主线程的完成信号
+        self.done = threading.Event()
+        self.written = False
+
+    def cancel(self):
+        """请求取消导出，在下一块写入前生效"""
+        self._cancel_requested = True
+
+    def is_cancelled(self):
+        return self._cancel_requested
+
+    def run(self):
+        try:
+            extension = os.path.splitext(self.file_path)[1].lower()
+            with self.perf.stage('save.write', rows=len(self.result_df), format=extension):
+                lottery_export.export_table(
+                    self.result_df, self.file_path,
+                    progress=self.progress.emit, should_cancel=self.is_cancelled,
+                )
+            self.written = True
+            self.finished.emit(self.file_path)
+        except lottery_export.ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(e)
+        finally:
+            self.done.set()
+
 
 class ExpertLotteryApp(QMainWindow):
+    # 各阶段的性能记录，可能来自后台线程，经信号转到主线程显示
+    perf_recorded = pyqtSignal(object)
+    
     def __init__(self):
         super().__init__()
+        self.perf = perf_trace.PerfRecorder()
+        self.load_span = None
+        self.export_span = None
         self.experts_data = None
+        self.roster_index = None
         self.extracted_experts = None
+        self.extraction_quotas = None
+        self.extraction_manifest = None
+        self.extraction_excluded = None
+        self.extraction_recorded = False
+        self.selection_history = None
+        self.weight_variables = None
+        self.roster_paths = []
+        self.all_sheets = False
+        self.load_thread = None
+        self.load_worker = None
+        self.active_loads = []
+        self.export_worker = None
+        self.active_exports = []
         self.research_fields = []
         self.organizations = []
         self.apply_win98_style()
         self.init_ui()
+        self.perf_recorded.connect(self.on_perf_record)
+        self.perf.listeners.append(self.perf_recorded.emit)
         
     def apply_win98_style(self):
         """应用Windows 98风格的样式"""
@@ -77,7 +680,7 @@ class ExpertLotteryApp(QMainWindow):
             border-right-color: #404040;
             border-bottom-color: #404040;
         }
-        QTableWidget {
+        QTableView {
             background-color: #ffffff;
             alternate-background-color: #f0f0f0;
             gridline-color: #808080;
@@ -166,9 +769,39 @@ class ExpertLotteryApp(QMainWindow):
         browse_button = QPushButton("浏览...")
         browse_button.clicked.connect(self.browse_file)
         
+        # 名单按部门分在多个工作表中时，读取全部工作表并合并
+        self.all_sheets_checkbox = QCheckBox("读取所有工作表")
+        
+        # 后台加载进度和取消按钮，只在加载时显示
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, 100)
+        self.load_progress.setMaximumWidth(160)
+        self.load_progress.hide()
+        
+        self.cancel_load_button = QPushButton("取消加载")
+        self.cancel_load_button.clicked.connect(self.cancel_loading)
+        self.cancel_load_button.hide()
+        
+        # 名单文件变化时自动增量更新
+        self.watch_checkbox = QCheckBox("文件变化时自动更新")
+        self.watch_checkbox.toggled.connect(self.update_file_watch)
+        
+        self.file_watcher = QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self.on_roster_file_changed)
+        
+        # 编辑器保存文件时可能连续触发多次变化，稍作等待后再更新
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(500)
+        self.reload_timer.timeout.connect(self.reload_changed_roster)
+        
         file_layout.addWidget(file_label)
         file_layout.addWidget(self.file_path_display, 1)
         file_layout.addWidget(browse_button)
+        file_layout.addWidget(self.all_sheets_checkbox)
+        file_layout.addWidget(self.load_progress)
+        file_layout.addWidget(self.cancel_load_button)
+        file_layout.addWidget(self.watch_checkbox)
         
         main_layout.addWidget(file_section)
         
@@ -180,9 +813,10 @@ class ExpertLotteryApp(QMainWindow):
         field_group = QGroupBox("研究领域筛选")
         field_group_layout = QVBoxLayout(field_group)
         
-        self.field_combo = QComboBox()
-        self.field_combo.addItem("全部领域")
+        self.field_combo = CheckableComboBox("全部领域")
         self.field_combo.setMinimumWidth(150)
+        self.field_combo.setToolTip("括号中为回避所选单位后该领域可抽取的专家人数（不含冷却期）")
+        self.field_combo.checked_changed.connect(self.update_option_counts)
         
         field_group_layout.addWidget(self.field_combo)
         filter_layout.addWidget(field_group)
@@ -191,15 +825,59 @@ class ExpertLotteryApp(QMainWindow):
         avoid_group = QGroupBox("回避单位")
         avoid_group_layout = QVBoxLayout(avoid_group)
         
-        self.avoid_combo = QComboBox()
-        self.avoid_combo.addItem("不回避任何单位")
+        self.avoid_combo = CheckableComboBox("不回避任何单位")
         self.avoid_combo.setMinimumWidth(150)
+        self.avoid_combo.setToolTip("括号中为所选研究领域中该单位的专家人数；可按单位的其他写法搜索")
+        self.avoid_combo.checked_changed.connect(self.update_option_counts)
         
         avoid_group_layout.addWidget(self.avoid_combo)
         filter_layout.addWidget(avoid_group)
         
+        # 加权抽取：权重取自名单中的一列或公式，留空为等概率抽取
+        weight_group = QGroupBox("抽取权重")
+        weight_group_layout = QVBoxLayout(weight_group)
+        
+        self.weight_edit = QLineEdit()
+        self.weight_edit.setMinimumWidth(200)
+        self.weight_edit.setPlaceholderText("列名或公式，如 1/(1+抽中次数)（留空则等概率）")
+        self.weight_edit.setToolTip(
+            "可填写名单中的数值列，或引用列名的公式，例如 (职称 == '正高') * 2 + 1；\n"
+            "抽中次数 为该专家在抽中记录中的次数"
+        )
+        
+        weight_group_layout.addWidget(self.weight_edit)
+        filter_layout.addWidget(weight_group)
+        
         main_layout.addWidget(filter_section)
         
+        # 组队规则：直接抽出满足规则的专家组，不需要反复重抽
+        constraint_section = QWidget()
+        constraint_layout = QHBoxLayout(constraint_section)
+        
+        max_per_org_label = QLabel("每单位最多:")
+        self.max_per_org_spinbox = QSpinBox()
+        self.max_per_org_spinbox.setRange(0, 99)
+        self.max_per_org_spinbox.setSpecialValueText("不限")
+        
+        required_label = QLabel("必须覆盖领域:")
+        self.required_edit = QLineEdit()
+        self.required_edit.setPlaceholderText("如 材料, 化工:2（留空则不要求）")
+        
+        senior_label = QLabel("高级职称至少:")
+        self.min_senior_spinbox = QSpinBox()
+        self.min_senior_spinbox.setRange(0, 999)
+        self.min_senior_spinbox.setSpecialValueText("不限")
+        self.min_senior_spinbox.setToolTip("职称列为 正高、教授、研究员 等高级职称的专家")
+        
+        constraint_layout.addWidget(max_per_org_label)
+        constraint_layout.addWidget(self.max_per_org_spinbox)
+        constraint_layout.addWidget(required_label)
+        constraint_layout.addWidget(self.required_edit, 1)
+        constraint_layout.addWidget(senior_label)
+        constraint_layout.addWidget(self.min_senior_spinbox)
+        
+        main_layout.addWidget(constraint_section)
+        
         # 抽取设置区域
         extraction_section = QWidget()
         extraction_layout = QHBoxLayout(extraction_section)
@@ -210,17 +888,44 @@ class ExpertLotteryApp(QMainWindow):
         self.count_spinbox.setMaximum(9999)
         self.count_spinbox.setValue(5)
         
+        # 按领域配额抽取，填写后忽略抽取数量和研究领域筛选
+        quota_label = QLabel("领域配额:")
+        self.quota_edit = QLineEdit()
+        self.quota_edit.setPlaceholderText("如 材料:3, 化工:2（留空则按抽取数量抽取）")
+        
+        # 冷却期：排除最近若干天内已被抽中（并保存了结果）的专家
+        cooldown_label = QLabel("冷却天数:")
+        self.cooldown_spinbox = QSpinBox()
+        self.cooldown_spinbox.setRange(0, 3650)
+        self.cooldown_spinbox.setValue(0)
+        self.cooldown_spinbox.setSpecialValueText("不限制")
+        self.cooldown_spinbox.setToolTip("排除最近若干天内已被抽中的专家，保存结果时记录抽中的专家")
+        
         extract_button = QPushButton("开始抽奖")
         extract_button.clicked.connect(self.extract_experts)
         
-        save_button = QPushButton("保存结果")
-        save_button.clicked.connect(self.save_results)
+        self.save_button = QPushButton("保存结果")
+        self.save_button.clicked.connect(self.save_results)
+        
+        self.export_progress = QProgressBar()
+        self.export_progress.setRange(0, 100)
+        self.export_progress.setMaximumWidth(120)
+        self.export_progress.hide()
+        
+        self.cancel_export_button = QPushButton("取消导出")
+        self.cancel_export_button.clicked.connect(self.cancel_export)
+        self.cancel_export_button.hide()
         
         extraction_layout.addWidget(count_label)
         extraction_layout.addWidget(self.count_spinbox)
-        extraction_layout.addStretch(1)
+        extraction_layout.addWidget(quota_label)
+        extraction_layout.addWidget(self.quota_edit, 1)
+        extraction_layout.addWidget(cooldown_label)
+        extraction_layout.addWidget(self.cooldown_spinbox)
         extraction_layout.addWidget(extract_button)
-        extraction_layout.addWidget(save_button)
+        extraction_layout.addWidget(self.save_button)
+        extraction_layout.addWidget(self.export_progress)
+        extraction_layout.addWidget(self.cancel_export_button)
         
         main_layout.addWidget(extraction_section)
         
@@ -228,99 +933,305 @@ class ExpertLotteryApp(QMainWindow):
         self.create_table()
         main_layout.addWidget(self.table)
         
-        # 状态标签
+        # 状态标签和性能记录开关
+        status_section = QWidget()
+        status_layout = QHBoxLayout(status_section)
+        status_layout.setContentsMargins(0, 0, 0, 0)
+        
         self.status_label = QLabel("请选择专家名单Excel文件开始抽奖")
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        main_layout.addWidget(self.status_label)
+        
+        self.perf_checkbox = QCheckBox("性能记录")
+        self.perf_checkbox.setChecked(self.perf.enabled)
+        self.perf_checkbox.setToolTip(
+            "记录加载、筛选、抽样、显示和保存各阶段的耗时和内存峰值，"
+            f"同时写入 {self.perf.log_path or '（不写入文件）'}\n统计内存会使处理变慢，排查问题时再开启"
+        )
+        self.perf_checkbox.toggled.connect(self.toggle_perf)
+        
+        status_layout.addWidget(self.status_label, 1)
+        status_layout.addWidget(self.perf_checkbox)
+        main_layout.addWidget(status_section)
+        
+        # 性能面板：最近各阶段的记录，最新的在最上面，只在开启性能记录时显示
+        self.perf_model = QStandardItemModel(0, len(PERF_PANEL_HEADERS), self)
+        self.perf_model.setHorizontalHeaderLabels(PERF_PANEL_HEADERS)
+        self.perf_table = QTableView()
+        self.perf_table.setModel(self.perf_model)
+        self.perf_table.setMaximumHeight(160)
+        self.perf_table.verticalHeader().hide()
+        self.perf_table.horizontalHeader().setStretchLastSection(True)
+        self.perf_table.setVisible(self.perf.enabled)
+        main_layout.addWidget(self.perf_table)
         
     def create_table(self):
         """创建表格以显示专家信息"""
-        self.table = QTableWidget()
-        self.table.setColumnCount(0)
-        self.table.setRowCount(0)
+        self.table_model = ExpertTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.table.setAlternatingRowColors(True)
         
     def browse_file(self):
-        """打开文件对话框选择Excel文件"""
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, "选择专家名单Excel文件", "", "Excel Files (*.xlsx *.xls)"
+        """打开文件对话框选择一个或多个Excel文件"""
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "选择专家名单Excel文件（可多选）", "", "Excel Files (*.xlsx *.xls)"
         )
         
-        if file_path:
-            self.file_path_display.setText(file_path)
-            self.load_experts_file(file_path)
+        if file_paths:
+            self.file_path_display.setText("; ".join(file_paths))
+            self.load_experts_file(file_paths, all_sheets=self.all_sheets_checkbox.isChecked())
     
-    def load_experts_file(self, file_path):
-        """从Excel文件加载专家名单"""
-        try:
-            self.experts_data = pd.read_excel(file_path)
-            self.status_label.setText(f"成功加载了 {len(self.experts_data)} 位专家信息")
-            
-            # 更新最大可抽取数量
-            self.count_spinbox.setMaximum(len(self.experts_data))
+    def load_experts_file(self, file_paths, incremental=False, all_sheets=False):
+        """
+        在后台线程中加载专家名单（优先读取名单缓存），加载期间仍可使用当前名单。
+        
+        file_paths 可以是一个文件路径或文件路径列表，多个文件（或 all_sheets 为 True 时的
+        所有工作表）合并为一份名单。incremental 为 True 时与当前名单比较，
+        只更新有变化的部分并保留筛选选择。
+        """
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        file_paths = list(file_paths)
+        
+        # 同一时间只保留一个加载任务
+        self.cancel_loading()
+        
+        previous = None
+        if (incremental and self.experts_data is not None
+                and file_paths == self.roster_paths and all_sheets == self.all_sheets):
+            previous = LoadedRoster(
+                self.roster_paths, self.experts_data, self.roster_index,
+                self.research_fields, self.organizations, all_sheets=self.all_sheets,
+            )
+        
+        # 从开始加载到筛选选项更新完成
+        self.load_span = self.perf.begin('load', files=len(file_paths), incremental=previous is not None)
+        worker = RosterLoadWorker(file_paths, previous, all_sheets, perf=self.perf)
+        thread = QThread(self)
+        worker.moveToThread(thread)
+        
+        thread.started.connect(worker.run)
+        worker.progress.connect(self.on_load_progress)
+        worker.loaded.connect(self.on_roster_loaded)
+        worker.failed.connect(self.on_load_failed)
+        worker.cancelled.connect(self.on_load_cancelled)
+        for signal in (worker.loaded, worker.failed, worker.cancelled):
+            signal.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        
+        # 被取消的任务在线程结束前仍需保留引用
+        load = (thread, worker)
+        self.active_loads.append(load)
+        thread.finished.connect(lambda: self.active_loads.remove(load))
+        
+        self.load_worker = worker
+        self.load_thread = thread
+        self.load_progress.setValue(0)
+        self.load_progress.show()
+        self.cancel_load_button.show()
+        self.status_label.setText(f"正在加载 '{'; '.join(file_paths)}'...")
+        thread.start()
+        
+    def cancel_loading(self):
+        """取消正在进行的名单加载"""
+        if self.load_worker is not None:
+            self.load_worker.cancel()
+            self.finish_loading()
+            self.end_load_span(perf_trace.STATUS_CANCELLED)
+            self.status_label.setText("已取消加载名单")
             
-            # 清空表格
-            self.table.setRowCount(0)
-            self.table.setColumnCount(0)
+    def end_load_span(self, status=perf_trace.STATUS_OK, **details):
+        """结束当前加载任务的性能记录"""
+        self.perf.end(self.load_span, status, **details)
+        self.load_span = None
             
-            # 更新研究领域和单位下拉框
+    def finish_loading(self):
+        """加载结束后隐藏进度条，不再接收当前任务的信号"""
+        self.load_worker = None
+        self.load_thread = None
+        self.load_progress.hide()
+        self.cancel_load_button.hide()
+        
+    def on_load_progress(self, percent, message):
+        if self.sender() is not self.load_worker:
+            return
+        self.load_progress.setValue(percent)
+        self.status_label.setText(message)
+        
+    def on_roster_loaded(self, loaded):
+        """加载完成后一次性替换名单、索引和筛选选项"""
+        if self.sender() is not self.load_worker:
+            return
+        self.finish_loading()
+        
+        if loaded.diff is not None:
+            self.apply_roster_update(loaded)
+            self.end_load_span(rows=len(self.experts_data))
+            return
+        
+        self.experts_data = loaded.experts_df
+        self.roster_index = loaded.roster_index
+        self.roster_paths = loaded.file_paths
+        self.all_sheets = loaded.all_sheets
+        self.research_fields = loaded.research_fields
+        self.organizations = loaded.organizations
+        self.file_path_display.setText("; ".join(loaded.file_paths))
+        
+        sources = self.experts_data.attrs.get('sources')
+        if sources:
+            duplicates = self.experts_data.attrs.get('duplicates', 0)
+            self.status_label.setText(
+                f"成功合并 {len(sources)} 个工作表，共 {len(self.experts_data)} 位专家信息"
+                + (f"（去掉重复记录 {duplicates} 条）" if duplicates else "")
+            )
+        else:
+            self.status_label.setText(f"成功加载了 {len(self.experts_data)} 位专家信息")
+        
+        # 更新最大可抽取数量
+        self.count_spinbox.setMaximum(max(1, len(self.experts_data)))
+        
+        # 清空表格
+        self.table_model.clear()
+        
+        # 更新研究领域和单位下拉框
+        with self.perf.stage('load.options', fields=len(self.research_fields),
+                             organizations=len(self.organizations)):
             self.update_research_fields()
             self.update_organizations()
+            self.update_option_counts()
+        
+        self.update_file_watch()
+        self.end_load_span(rows=len(self.experts_data))
+        
+    def apply_roster_update(self, loaded):
+        """应用增量更新：只增删有变化的筛选选项，保留已选条件"""
+        removed_fields = set(self.research_fields).difference(loaded.research_fields)
+        added_fields = loaded.research_fields[len(self.research_fields) - len(removed_fields):]
+        removed_orgs = set(self.organizations).difference(loaded.organizations)
+        added_orgs = loaded.organizations[len(self.organizations) - len(removed_orgs):]
+        
+        self.experts_data = loaded.experts_df
+        self.roster_index = loaded.roster_index
+        self.research_fields = loaded.research_fields
+        self.organizations = loaded.organizations
+        self.count_spinbox.setMaximum(max(1, len(self.experts_data)))
+        
+        with self.perf.stage('load.options', fields=len(self.research_fields),
+                             organizations=len(self.organizations), incremental=True):
+            self.field_combo.remove_items(removed_fields)
+            self.field_combo.add_items(added_fields)
+            self.avoid_combo.remove_items(removed_orgs)
+            self.avoid_combo.add_items(added_orgs, aliases=self.roster_index.org_index.members)
+            self.update_option_counts()
+        
+        if loaded.diff:
+            self.status_label.setText(
+                f"名单已更新：{loaded.diff.summary()}，当前共 {len(self.experts_data)} 位专家"
+            )
+        else:
+            self.status_label.setText(
+                f"名单文件已保存，专家及其研究领域、单位没有变化，共 {len(self.experts_data)} 位专家"
+            )
             
-        except FileNotFoundError:
-            QMessageBox.critical(self, "错误", f"文件 '{file_path}' 未找到。请检查文件路径是否正确。")
-            self.status_label.setText("文件加载失败")
-            self.experts_data = None
+    def update_file_watch(self):
+        """根据复选框状态监视当前名单的所有文件"""
+        watched = self.file_watcher.files()
+        if watched:
+            self.file_watcher.removePaths(watched)
+        if self.watch_checkbox.isChecked():
+            existing = [path for path in self.roster_paths if os.path.exists(path)]
+            if existing:
+                self.file_watcher.addPaths(existing)
             
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"读取文件时发生错误: {e}")
-            self.status_label.setText("文件加载失败")
-            self.experts_data = None
+    def on_roster_file_changed(self, path):
+        if path in self.roster_paths:
+            self.reload_timer.start()
+            
+    def reload_changed_roster(self):
+        """名单文件变化后增量更新"""
+        if not self.watch_checkbox.isChecked() or not self.roster_paths:
+            return
+        # 部分编辑器以替换文件的方式保存，需要重新加入监视
+        self.update_file_watch()
+        if all(os.path.exists(path) for path in self.roster_paths):
+            self.load_experts_file(self.roster_paths, incremental=True, all_sheets=self.all_sheets)
+        
+    def on_load_failed(self, error):
+        """加载失败时保留当前名单"""
+        if self.sender() is not self.load_worker:
+            return
+        file_path = "; ".join(self.load_worker.file_paths)
+        automatic = self.load_worker.previous is not None
+        self.finish_loading()
+        self.end_load_span(perf_trace.STATUS_ERROR, error=str(error))
+        self.file_path_display.setText("; ".join(self.roster_paths))
+        self.status_label.setText("文件加载失败")
+        
+        # 自动更新失败时（例如文件仍在写入）只提示，不弹出对话框
+        if automatic:
+            self.status_label.setText(f"名单更新失败，仍使用之前的名单: {error}")
+            return
+        
+        if isinstance(error, FileNotFoundError):
+            QMessageBox.critical(self, "错误", f"文件 '{error.filename or file_path}' 未找到。请检查文件路径是否正确。")
+        else:
+            QMessageBox.critical(self, "错误", f"读取文件时发生错误: {error}")
+            
+    def on_load_cancelled(self):
+        if self.sender() is not self.load_worker:
+            return
+        self.finish_loading()
+        self.status_label.setText("已取消加载名单")
+        
+    def closeEvent(self, event):
+        # 关闭窗口前结束所有后台加载线程
+        self.cancel_loading()
+        for thread, worker in list(self.active_loads):
+            thread.quit()
+            thread.wait()
+        # 正在导出的结果文件写完再关闭，避免留下不完整的文件。
+        # 完成信号排队到主线程，主线程等待期间不会处理，因此等待 run 结束后直接结束线程
+        for thread, worker in list(self.active_exports):
+            worker.done.wait()
+            thread.quit()
+            thread.wait()
+            if worker.written and worker is self.export_worker:
+                # 排队的完成信号在窗口关闭后被忽略，这里直接保存抽取记录，不再弹出提示
+                try:
+                    self.save_export_records(worker, worker.file_path)
+                    self.finish_export()
+                except Exception as e:
+                    self.finish_export(perf_trace.STATUS_ERROR, error=str(e))
+        if self.selection_history is not None:
+            self.selection_history.close()
+            self.selection_history = None
+        super().closeEvent(event)
     
     def update_research_fields(self):
-        """更新研究领域下拉框"""
+        """更新研究领域下拉框，保留仍然存在的已选领域"""
         if self.experts_data is not None and '研究领域' in self.experts_data.columns:
-            # 保存当前选中项
-            current_text = self.field_combo.currentText()
-            
-            # 清空下拉框
-            self.field_combo.clear()
-            self.field_combo.addItem("全部领域")
-            
-            # 获取所有唯一的研究领域
-            self.research_fields = self.experts_data['研究领域'].unique().tolist()
-            
-            # 添加到下拉框
-            for field in self.research_fields:
-                self.field_combo.addItem(field)
-                
-            # 尝试恢复之前的选择
-            index = self.field_combo.findText(current_text)
-            if index >= 0:
-                self.field_combo.setCurrentIndex(index)
+            self.field_combo.set_items(self.research_fields)
                 
     def update_organizations(self):
-        """更新单位下拉框"""
+        """更新单位下拉框，保留仍然存在的已选单位"""
         if self.experts_data is not None and '单位' in self.experts_data.columns:
-            # 保存当前选中项
-            current_text = self.avoid_combo.currentText()
+            self.avoid_combo.set_items(self.organizations, aliases=self.roster_index.org_index.members)
             
-            # 清空下拉框
-            self.avoid_combo.clear()
-            self.avoid_combo.addItem("不回避任何单位")
-            
-            # 获取所有唯一的单位
-            self.organizations = self.experts_data['单位'].unique().tolist()
-            
-            # 添加到下拉框
-            for org in self.organizations:
-                self.avoid_combo.addItem(org)
-                
-            # 尝试恢复之前的选择
-            index = self.avoid_combo.findText(current_text)
-            if index >= 0:
-                self.avoid_combo.setCurrentIndex(index)
+    def update_option_counts(self):
+        """
+        更新各选项后显示的人数：研究领域按回避单位后的名单统计，
+        单位按所选研究领域统计，显示选择该选项会影响多少位专家。
+        """
+        if self.roster_index is None:
+            return
+        if self.roster_index.field_codes is not None:
+            pool = self.roster_index.pool(avoid_orgs=self.avoided_organizations())
+            self.field_combo.set_counts(self.roster_index.count_by_field(pool))
+        if self.roster_index.org_codes is not None:
+            pool = self.roster_index.pool(fields=self.field_combo.checked_items())
+            self.avoid_combo.set_counts(self.roster_index.count_by_org_group(pool))
     
     def extract_experts(self):
         """随机抽取专家"""
@@ -328,6 +1239,10 @@ class ExpertLotteryApp(QMainWindow):
             QMessageBox.warning(self, "警告", "请先选择并加载专家名单文件")
             return
         
+        if self.quota_edit.text().strip():
+            self.extract_experts_by_quota()
+            return
+        
         num_to_extract = self.count_spinbox.value()
         
         if num_to_extract <= 0:
@@ -335,27 +1250,61 @@ class ExpertLotteryApp(QMainWindow):
             return
             
         # 筛选数据
-        filtered_data = self.filter_experts_data()
+        excluded = self.cooldown_exclusion()
+        if excluded is False:
+            return
+        weights = self.draw_weights()
+        if weights is False:
+            return
+        constraints = self.panel_constraints()
+        if constraints is False:
+            return
+        pool = self.filter_experts_data(excluded)
         
-        if filtered_data.empty:
+        num_available_experts = len(pool) if weights is None else lottery_engine.count_weighted(pool, weights)
+        if num_available_experts == 0:
             QMessageBox.warning(self, "警告", "根据当前筛选条件，没有找到符合条件的专家")
             return
-            
-        num_available_experts = len(filtered_data)
         
-        if num_to_extract > num_available_experts:
+        # 有组队规则时人数不足由规则检查说明
+        if num_to_extract > num_available_experts and not constraints:
             QMessageBox.warning(
                 self, 
                 "警告", 
                 f"要抽取的专家数量 ({num_to_extract}) 大于可用专家总数 ({num_available_experts})。\n将返回所有可用专家。"
             )
-            self.extracted_experts = filtered_data.copy()
-        else:
-            # 使用pandas的sample方法进行随机抽样
-            self.extracted_experts = filtered_data.sample(
-                n=num_to_extract, 
-                random_state=random.randint(1, 1000)
-            )
+            
+        # 随机抽样，记录种子以便复现
+        seed = lottery_engine.new_seed()
+        mode = 'constraints' if constraints else 'weighted' if weights is not None else 'count'
+        try:
+            with self.perf.stage('sample', mode=mode, candidates=len(pool), count=num_to_extract):
+                if constraints:
+                    selected = panel_solver.solve_panel(
+                        self.roster_index, pool, num_to_extract, constraints, random_state=seed, weights=weights
+                    )
+                elif weights is not None:
+                    selected = lottery_engine.sample_weighted(pool, num_to_extract, weights, random_state=seed)
+                else:
+                    selected = lottery_engine.sample_pool(pool, num_to_extract, random_state=seed)
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        self.extracted_experts = self.experts_data.iloc[selected]
+        self.extraction_quotas = None
+        self.extraction_excluded = excluded
+        self.extraction_recorded = False
+        self.extraction_manifest = draw_manifest.build_manifest(
+            self.experts_data, selected, seed,
+            fields=self.field_combo.checked_items(),
+            avoid_orgs=self.avoided_organizations(),
+            count=num_to_extract,
+            roster_path=self.roster_paths[0],
+            cooldown_days=self.cooldown_spinbox.value(),
+            excluded=excluded,
+            constraints=constraints,
+            **self.weight_manifest_arguments(weights),
+        )
         
         # 显示抽取结果
         self.display_experts(self.extracted_experts)
@@ -363,25 +1312,177 @@ class ExpertLotteryApp(QMainWindow):
         # 更新状态栏信息
         self.update_status_info()
         
-    def filter_experts_data(self):
-        """根据筛选条件过滤专家数据"""
-        if self.experts_data is None or self.experts_data.empty:
-            return pd.DataFrame()
+    def extract_experts_by_quota(self):
+        """按研究领域配额一次性抽取整个专家组"""
+        try:
+            quotas = lottery_engine.parse_quotas(self.quota_edit.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
             
-        # 复制数据
-        filtered_data = self.experts_data.copy()
+        if not quotas:
+            QMessageBox.warning(self, "警告", "请填写领域配额，例如 材料:3, 化工:2")
+            return
+            
+        avoided_orgs = self.avoided_organizations()
+        excluded = self.cooldown_exclusion()
+        if excluded is False:
+            return
+        weights = self.draw_weights()
+        if weights is False:
+            return
+        constraints = self.panel_constraints()
+        if constraints is False:
+            return
         
-        # 检查是否需要按研究领域筛选
-        selected_field = self.field_combo.currentText()
-        if selected_field != "全部领域" and '研究领域' in self.experts_data.columns:
-            filtered_data = filtered_data[filtered_data['研究领域'] == selected_field]
+        # 检查每个领域的可用人数（权重为 0 的专家不会被抽中）
+        pool = self.roster_index.pool(fields=list(quotas), avoid_orgs=avoided_orgs, exclude=excluded)
+        if weights is not None:
+            pool = pool[weights[pool] > 0]
+        available = self.roster_index.count_by_field(pool)
+        shortages = [
+            f"{field}: 需要 {count}，可用 {available.get(field, 0)}"
+            for field, count in quotas.items()
+            if available.get(field, 0) < count
+        ]
         
-        # 检查是否需要回避某个单位
-        avoided_org = self.avoid_combo.currentText()
-        if avoided_org != "不回避任何单位" and '单位' in self.experts_data.columns:
-            filtered_data = filtered_data[filtered_data['单位'] != avoided_org]
+        if len(pool) == 0:
+            QMessageBox.warning(self, "警告", "根据当前配额和回避条件，没有找到符合条件的专家")
+            return
             
-        return filtered_data
+        if shortages and not constraints:
+            QMessageBox.warning(
+                self,
+                "警告",
+                "以下领域的可用专家不足，将返回该领域的所有可用专家:\n" + "\n".join(shortages)
+            )
+            
+        seed = lottery_engine.new_seed()
+        if constraints:
+            # 配额作为各领域的最少人数，候选只来自配额中的领域，人数合计即为配额
+            constraints = constraints.with_required(quotas)
+        try:
+            with self.perf.stage('sample', mode='quota', candidates=len(pool), count=sum(quotas.values()),
+                                 constraints=bool(constraints), weighted=weights is not None):
+                if constraints:
+                    selected = panel_solver.solve_panel(
+                        self.roster_index, pool, sum(quotas.values()), constraints,
+                        random_state=seed, weights=weights,
+                    )
+                else:
+                    selected = lottery_engine.sample_quota(
+                        self.roster_index, quotas, avoid_orgs=avoided_orgs, random_state=seed, exclude=excluded,
+                        weights=weights,
+                    )
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        self.extracted_experts = self.experts_data.iloc[selected]
+        self.extraction_quotas = quotas
+        self.extraction_excluded = excluded
+        self.extraction_recorded = False
+        self.extraction_manifest = draw_manifest.build_manifest(
+            self.experts_data, selected, seed,
+            mode=draw_manifest.MODE_QUOTA,
+            avoid_orgs=avoided_orgs,
+            quotas=quotas,
+            roster_path=self.roster_paths[0],
+            cooldown_days=self.cooldown_spinbox.value(),
+            excluded=excluded,
+            constraints=constraints,
+            **self.weight_manifest_arguments(weights),
+        )
+        
+        self.display_experts(self.extracted_experts)
+        self.update_status_info()
+        
+    def filter_experts_data(self, excluded=None):
+        """根据筛选条件过滤专家数据，返回符合条件的行位置"""
+        if self.roster_index is None:
+            return []
+        with self.perf.stage('filter', rows=self.roster_index.size) as span:
+            pool = self.roster_index.pool(
+                fields=self.field_combo.checked_items(),
+                avoid_orgs=self.avoided_organizations(),
+                exclude=excluded,
+            )
+            span.details['candidates'] = len(pool)
+        return pool
+        
+    def avoided_organizations(self):
+        """把选择的规范单位展开为名单中的所有写法，用于筛选和抽取记录"""
+        if self.roster_index is None:
+            return []
+        return self.roster_index.expand_orgs(self.avoid_combo.checked_items())
+        
+    def open_selection_history(self):
+        """首次使用时打开抽中记录数据库"""
+        if self.selection_history is None:
+            self.selection_history = selection_history.SelectionHistory()
+        return self.selection_history
+        
+    def panel_constraints(self):
+        """
+        按界面设置生成组队规则。
+        
+        未设置任何规则时返回的规则为假值；格式有误时提示并返回 False。
+        """
+        try:
+            return panel_solver.PanelConstraints(
+                max_per_org=self.max_per_org_spinbox.value(),
+                required_fields=panel_solver.parse_required_fields(self.required_edit.text()),
+                min_senior=self.min_senior_spinbox.value(),
+            ).with_org_groups(self.roster_index)
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return False
+            
+    def draw_weights(self):
+        """
+        按权重输入框计算每位专家的抽取权重。
+        
+        未填写时返回 None（等概率）；公式有误时提示并返回 False。
+        """
+        expression = self.weight_edit.text().strip()
+        self.weight_variables = None
+        if not expression:
+            return None
+        try:
+            # 公式不引用抽中次数时不需要打开抽中记录数据库
+            self.weight_variables = {}
+            if selection_history.HISTORY_COUNT_VARIABLE in expression:
+                self.weight_variables = self.open_selection_history().weight_variables(
+                    self.roster_index, expression
+                )
+            return lottery_engine.evaluate_weights(self.experts_data, expression, self.weight_variables)
+        except Exception as e:
+            QMessageBox.warning(self, "警告", f"权重设置有误: {e}")
+            return False
+            
+    def weight_manifest_arguments(self, weights):
+        """返回写入抽取记录的权重信息"""
+        if weights is None:
+            return {}
+        return {
+            'weight_expression': self.weight_edit.text().strip(),
+            'weights': weights,
+            'weight_variables': self.weight_variables,
+        }
+        
+    def cooldown_exclusion(self):
+        """
+        返回冷却期内需要排除的行掩码。
+        
+        未设置冷却天数时返回 None；读取抽中记录失败时提示并返回 False。
+        """
+        days = self.cooldown_spinbox.value()
+        if days <= 0:
+            return None
+        try:
+            return self.open_selection_history().exclusion_mask(self.roster_index, days)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"读取抽中记录时发生错误: {e}")
+            return False
         
     def update_status_info(self):
         """更新状态栏信息"""
@@ -393,78 +1494,218 @@ class ExpertLotteryApp(QMainWindow):
         field_info = ""
         avoid_info = ""
         
-        selected_field = self.field_combo.currentText()
-        if selected_field != "全部领域":
-            field_info = f"[{selected_field}] "
+        selected_fields = self.field_combo.checked_items()
+        if self.extraction_quotas:
+            field_info = f"[配额:{summarize_quotas(self.extraction_quotas)}] "
+        elif selected_fields:
+            field_info = f"[{summarize_values(selected_fields)}] "
             
-        avoided_org = self.avoid_combo.currentText()
-        if avoided_org != "不回避任何单位":
-            avoid_info = f"[回避:{avoided_org}] "
+        avoided_orgs = self.avoid_combo.checked_items()
+        if avoided_orgs:
+            avoid_info = f"[回避:{summarize_values(avoided_orgs)}] "
             
-        self.status_label.setText(f"已随机抽取 {field_info}{avoid_info}{len(self.extracted_experts)} 位专家")
+        cooldown_info = ""
+        if self.extraction_excluded is not None:
+            cooldown_info = (f"[冷却{self.cooldown_spinbox.value()}天:"
+                             f"排除{int(self.extraction_excluded.sum())}人] ")
+            
+        constraint_info = ""
+        if self.extraction_manifest and 'constraints' in self.extraction_manifest:
+            constraints = panel_solver.PanelConstraints.from_dict(self.extraction_manifest['constraints'])
+            constraint_info = f"[规则:{constraints.describe()}] "
+            
+        weight_info = ""
+        if self.extraction_manifest and 'weights' in self.extraction_manifest:
+            weight_info = f"[加权:{self.extraction_manifest['weights']['expression']}] "
+            
+        self.status_label.setText(
+            f"已随机抽取 {field_info}{avoid_info}{cooldown_info}{constraint_info}{weight_info}{len(self.extracted_experts)} 位专家"
+        )
     
     def display_experts(self, experts_df):
         """在表格中显示专家信息"""
         if experts_df is None or experts_df.empty:
             return
             
-        # 设置表格列数
-        columns = experts_df.columns
-        self.table.setColumnCount(len(columns))
-        self.table.setHorizontalHeaderLabels(columns)
-        
-        # 设置表格行数
-        rows = len(experts_df)
-        self.table.setRowCount(rows)
-        
-        # 填充表格数据
-        for row in range(rows):
-            for col in range(len(columns)):
-                value = str(experts_df.iloc[row, col])
-                item = QTableWidgetItem(value)
-                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                self.table.setItem(row, col, item)
+        span = self.perf.begin('display', rows=len(experts_df))
+        self.table_model.set_frame(experts_df)
+        # 表格在回到事件循环后才绘制，绘制完成后再结束计时
+        QTimer.singleShot(0, lambda: self.perf.end(span))
     
     def save_results(self):
-        """保存抽取结果到新的Excel文件"""
+        """保存抽取结果，格式由文件扩展名决定（xlsx、csv、parquet 或 jsonl）"""
         if self.extracted_experts is None or self.extracted_experts.empty:
             QMessageBox.warning(self, "警告", "没有可以保存的抽奖结果，请先进行抽奖")
             return
             
         # 生成默认文件名
-        selected_field = self.field_combo.currentText()
-        avoided_org = self.avoid_combo.currentText()
+        selected_fields = self.field_combo.checked_items()
+        avoided_orgs = self.avoid_combo.checked_items()
         
         default_filename = "抽奖结果.xlsx"
         
         filename_parts = []
-        if selected_field != "全部领域":
-            filename_parts.append(selected_field)
+        if self.extraction_quotas:
+            filename_parts.append(summarize_quotas(self.extraction_quotas))
+        elif selected_fields:
+            filename_parts.append(summarize_values(selected_fields))
             
-        if avoided_org != "不回避任何单位":
-            filename_parts.append(f"回避{avoided_org}")
+        if avoided_orgs:
+            filename_parts.append(f"回避{summarize_values(avoided_orgs)}")
             
         if filename_parts:
             default_filename = f"{'_'.join(filename_parts)}-抽奖结果.xlsx"
             
         file_path, _ = QFileDialog.getSaveFileName(
-            self, "保存抽奖结果", default_filename, "Excel Files (*.xlsx)"
+            self, "保存抽奖结果", default_filename, lottery_export.file_dialog_filter()
         )
         
         if file_path:
-            try:
-                self.extracted_experts.to_excel(file_path, index=False)
-                QMessageBox.information(self, "成功", f"抽奖结果已成功保存到 '{file_path}'")
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"保存文件时发生错误: {e}")
-
+            self.start_export(file_path)
+            
+    def start_export(self, file_path):
+        """在后台线程中写入结果文件，导出的是开始导出时的抽取结果"""
+        # 从开始写入到抽取记录保存完成，不包括选择文件的时间
+        self.export_span = self.perf.begin(
+            'save', rows=len(self.extracted_experts), format=os.path.splitext(file_path)[1].lower()
+        )
+        worker = ExportWorker(self.extracted_experts, file_path, self.extraction_manifest, perf=self.perf)
+        thread = QThread(self)
+        worker.moveToThread(thread)
+        
+        thread.started.connect(worker.run)
+        worker.progress.connect(self.on_export_progress)
+        worker.finished.connect(self.on_export_finished)
+        worker.failed.connect(self.on_export_failed)
+        worker.cancelled.connect(self.on_export_cancelled)
+        for signal in (worker.finished, worker.failed, worker.cancelled):
+            signal.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        
+        export = (thread, worker)
+        self.active_exports.append(export)
+        thread.finished.connect(lambda: self.active_exports.remove(export))
+        
+        self.export_worker = worker
+        self.save_button.setEnabled(False)
+        self.export_progress.setValue(0)
+        self.export_progress.show()
+        self.cancel_export_button.show()
+        self.status_label.setText(f"正在导出到 '{file_path}'...")
+        thread.start()
+        
+    def cancel_export(self):
+        """取消正在进行的导出，已写入的临时文件会被删除"""
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            
+    def finish_export(self, status=perf_trace.STATUS_OK, **details):
+        self.perf.end(self.export_span, status, **details)
+        self.export_span = None
+        self.export_worker = None
+        self.save_button.setEnabled(True)
+        self.export_progress.hide()
+        self.cancel_export_button.hide()
+        
+    def on_export_progress(self, written, total):
+        if self.sender() is not self.export_worker:
+            return
+        self.export_progress.setValue(100 * written // max(total, 1))
+        self.status_label.setText(f"正在导出... 已写入 {written}/{total} 行")
+        
+    def on_export_finished(self, file_path):
+        """结果文件写入完成后，在主线程中保存抽取记录和抽中记录"""
+        worker = self.sender()
+        if worker is not self.export_worker:
+            return
+        try:
+            manifest_path = self.save_export_records(worker, file_path)
+            self.finish_export()
+        except Exception as e:
+            self.finish_export(perf_trace.STATUS_ERROR, error=str(e))
+            self.status_label.setText("保存抽取记录失败")
+            QMessageBox.critical(self, "错误", f"保存抽取记录时发生错误: {e}")
+            return
+        
+        self.status_label.setText(f"抽奖结果已保存到 '{file_path}'")
+        QMessageBox.information(
+            self, "成功",
+            f"抽奖结果已成功保存到 '{file_path}'\n抽取记录已保存到 '{manifest_path}'"
+        )
+        
+    def save_export_records(self, worker, file_path):
+        """
+        在结果文件旁保存抽取记录，并把导出的结果计入抽中记录。
+        
+        返回:
+            str: 抽取记录文件路径。
+        """
+        manifest_path = draw_manifest.manifest_path_for(file_path)
+        draw_manifest.write_manifest(worker.manifest, manifest_path)
+        
+        # 保存的结果才计入抽中记录，同一次抽取只记录一次
+        if worker.result_df is self.extracted_experts and not self.extraction_recorded:
+            self.open_selection_history().record(
+                worker.result_df,
+                seed=worker.manifest['seed'],
+                roster_sha256=worker.manifest['roster']['sha256'],
+                source=os.path.abspath(file_path),
+            )
+            self.extraction_recorded = True
+        return manifest_path
+        
+    def on_export_failed(self, error):
+        if self.sender() is not self.export_worker:
+            return
+        self.finish_export(perf_trace.STATUS_ERROR, error=str(error))
+        self.status_label.setText("保存文件失败")
+        QMessageBox.critical(self, "错误", f"保存文件时发生错误: {error}")
+        
+    def on_export_cancelled(self):
+        if self.sender() is not self.export_worker:
+            return
+        self.finish_export(perf_trace.STATUS_CANCELLED)
+        self.status_label.setText("已取消导出")
+        
+    def toggle_perf(self, enabled):
+        """开启或关闭性能记录，开启时显示性能面板"""
+        self.perf.set_enabled(enabled)
+        self.perf_table.setVisible(enabled)
+        
+    def on_perf_record(self, record):
+        """在性能面板最上面加入一条记录"""
+        peak = record['peak_memory_bytes']
+        details = ", ".join(f"{key}={value}" for key, value in record['details'].items())
+        if record['status'] != perf_trace.STATUS_OK:
+            details = f"[{record['status']}] {details}"
+        self.perf_model.insertRow(0, [
+            QStandardItem(record['time'][11:]),
+            QStandardItem(perf_trace.stage_label(record['stage'])),
+            QStandardItem(f"{record['elapsed_ms']:.1f}"),
+            QStandardItem("-" if peak is None else f"{peak / (1 << 20):.2f}"),
+            QStandardItem(details),
+        ])
+        if self.perf_model.rowCount() > PERF_PANEL_ROWS:
+            self.perf_model.removeRows(PERF_PANEL_ROWS, self.perf_model.rowCount() - PERF_PANEL_ROWS)
 
 def main():
     app = QApplication(sys.argv)
     window = ExpertLotteryApp()
     window.show()
+    
+    if os.environ.get(STARTUP_CHECK_ENV):
+        # 事件循环处理完第一次绘制后再计时
+        def report_startup():
+            print(f"窗口显示耗时 {time.perf_counter() - _STARTED:.3f} 秒（自导入界面模块起）", file=sys.stderr)
+            app.quit()
+        QTimer.singleShot(0, report_startup)
+    else:
+        QTimer.singleShot(0, preload_modules)
     sys.exit(app.exec())
 
 
 if __name__ == "__main__":
+    # 合并多个名单时在子进程中解析，打包后的程序需要支持子进程启动
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -0,0 +1,590 @@
+"""
+专家抽取系统命令行工具。
+
+不依赖 PyQt6，可在批处理任务和脚本中直接运行，例如:
+
+    python lottery_cli.py inspect experts_list.xlsx
+    python lottery_cli.py draw experts_list.xlsx -n 5 --field 材料 --avoid 甲大学 -o 抽奖结果.xlsx
+    python lottery_cli.py draw experts_list.xlsx --quota "材料:3, 化工:2" --json
+    python lottery_cli.py batch experts_list.xlsx -n 5 -k 1000 -o panels.xlsx
+    python lottery_cli.py batch experts_list.xlsx -n 5 -k 10 -o panels.xlsx --weight "1 / (1 + 抽中次数)"
+    python lottery_cli.py batch experts_list.xlsx -n 5 -k 10 -o panels.xlsx --max-per-org 1 --require 材料 --min-senior 2
+    python lottery_cli.py simulate experts_list.xlsx -n 5 --draws 1000000 -o fairness.csv
+    python lottery_cli.py replay panels.manifest.json
+    python lottery_cli.py export 抽奖结果.manifest.json -o 抽奖结果.jsonl
+    python lottery_cli.py history 抽奖结果.xlsx --date 2024-05-01
+
+可以指定多个名单文件（或用 --all-sheets 读取所有工作表），合并后按专家标识去重；
+"文件路径#工作表名称" 只读取指定的工作表。
+
+加上 --json 时标准输出只有一个 JSON 对象（抽取结果、抽取记录、核对结果等），
+提示信息改为写到标准错误；抽取记录路径为 "-" 时从标准输入读取。
+
+启动时只导入标准库，pandas、numpy 等在执行需要它们的子命令时才导入，
+查看帮助或参数错误时可以立即返回。
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+
+def message(args, text):
+    """输出提示信息；--json 时写到标准错误，保持标准输出只有 JSON"""
+    print(text, file=sys.stderr if args.json else sys.stdout)
+
+
+def emit_json(payload):
+    """把结果以一个 JSON 对象写到标准输出"""
+    json.dump(payload, sys.stdout, ensure_ascii=False)
+    sys.stdout.write('\n')
+
+
+def frame_records(result_df):
+    """把结果表转为可序列化为 JSON 的记录列表，缺失值为 None"""
+    return json.loads(result_df.to_json(orient='records', force_ascii=False, date_format='iso'))
+
+
+def write_table(result_df, output_path):
+    """按扩展名把结果写入 xlsx、csv、parquet 或 jsonl 文件"""
+    import lottery_export
+    lottery_export.export_table(result_df, output_path)
+
+
+def add_json_argument(parser):
+    """添加 --json 参数"""
+    parser.add_argument('--json', action='store_true', help="以 JSON 格式把结果写到标准输出")
+
+
+def add_filter_arguments(parser):
+    """添加研究领域和回避单位筛选参数"""
+    parser.add_argument('--field', action='append', default=[], metavar='领域',
+                        help="只抽取该研究领域的专家，可重复指定多个")
+    parser.add_argument('--avoid', action='append', default=[], metavar='单位',
+                        help="回避该单位的专家，可重复指定多个；同一单位的其他写法和别名一并回避")
+
+
+def add_history_arguments(parser):
+    """添加冷却期参数"""
+    parser.add_argument('--cooldown', type=float, default=0, metavar='天数',
+                        help="排除最近若干天内已被抽中的专家")
+    parser.add_argument('--history', default=None, metavar='路径',
+                        help="抽中记录数据库路径，默认 ~/.expert_lottery/history.sqlite3")
+
+
+def cooldown_mask(args, roster_index):
+    """按 --cooldown 查询抽中记录，返回需要排除的行掩码；未指定冷却期时返回 None"""
+    if args.cooldown <= 0:
+        return None
+    import selection_history
+    with selection_history.SelectionHistory(args.history) as history:
+        excluded = history.exclusion_mask(roster_index, args.cooldown)
+    print(f"冷却期 {args.cooldown:g} 天内已抽中 {int(excluded.sum())} 位专家，不参与本次抽取", file=sys.stderr)
+    return excluded
+
+
+def add_weight_arguments(parser):
+    """添加加权抽取和抽中记录参数"""
+    parser.add_argument('--record', action='store_true', help="把被抽中的专家写入抽中记录")
+    parser.add_argument('--weight', default=None, metavar='列名或公式',
+                        help="按权重抽取，例如 权重 或 \"1 / (1 + 抽中次数)\"")
+
+
+def weight_arguments(args, experts_df, roster_index):
+    """按 --weight 计算权重，返回 (权重, 公式引用的历史变量)；未指定时均为 None"""
+    if not args.weight:
+        return None, None
+    import lottery_engine
+    import selection_history
+    weight_variables = {}
+    # 公式不引用抽中次数时不需要打开抽中记录数据库
+    if selection_history.HISTORY_COUNT_VARIABLE in args.weight:
+        with selection_history.SelectionHistory(args.history) as history:
+            weight_variables = history.weight_variables(roster_index, args.weight)
+    return lottery_engine.evaluate_weights(experts_df, args.weight, weight_variables), weight_variables
+
+
+def add_constraint_arguments(parser):
+    """添加组队规则参数"""
+    parser.add_argument('--max-per-org', type=int, default=None, metavar='人数',
+                        help="每个单位最多抽取的人数")
+    parser.add_argument('--require', action='append', default=[], metavar='领域[:人数]',
+                        help="专家组必须覆盖的研究领域，可重复指定多个")
+    parser.add_argument('--min-senior', type=int, default=0, metavar='人数', help="高级职称最少人数")
+    parser.add_argument('--senior-title', action='append', default=None, metavar='职称',
+                        help="视为高级职称的职称，可重复指定；默认包括 正高、教授、研究员 等")
+
+
+def constraint_arguments(args, roster_index):
+    """按命令行参数生成组队规则，单位分组按名单索引固定下来"""
+    import panel_solver
+    return panel_solver.PanelConstraints(
+        max_per_org=args.max_per_org,
+        required_fields=panel_solver.parse_required_fields(",".join(args.require)),
+        min_senior=args.min_senior,
+        senior_titles=args.senior_title or panel_solver.SENIOR_TITLES,
+    ).with_org_groups(roster_index)
+
+
+def add_roster_arguments(parser):
+    """添加名单文件参数"""
+    parser.add_argument('roster', nargs='+', help="专家名单 Excel 文件路径，可指定多个")
+    parser.add_argument('--all-sheets', action='store_true', help="读取每个文件的所有工作表")
+    parser.add_argument('--keep-duplicates', action='store_true', help="合并多份名单时不去重")
+    parser.add_argument('--no-cache', action='store_true', help="不读写名单缓存")
+
+
+def load_roster_arguments(args, all_columns=False):
+    """
+    按命令行参数加载名单；多个文件或工作表时合并为一份名单。
+
+    all_columns 为 False 时只加载抽取需要的列（roster_reader.DRAW_COLUMNS），
+    被抽中专家的其他列用 roster_reader.expand_rows 补读。
+    """
+    import roster_cache
+    import roster_reader
+    columns = None if all_columns else roster_reader.DRAW_COLUMNS
+    sources = roster_reader.expand_sources(args.roster, all_sheets=args.all_sheets)
+    if sources == [(args.roster[0], None)]:
+        return roster_cache.load_roster(args.roster[0], use_cache=not args.no_cache, columns=columns)
+    experts_df = roster_cache.load_roster_set(
+        sources, use_cache=not args.no_cache, columns=columns, dedupe=not args.keep_duplicates,
+    )
+    duplicates = experts_df.attrs.get('duplicates', 0)
+    print(f"已合并 {len(sources)} 个工作表，共 {len(experts_df)} 位专家"
+          + (f"，去掉重复记录 {duplicates} 条" if duplicates else ""), file=sys.stderr)
+    return experts_df
+
+
+def load_manifest_roster(args, manifest):
+    """加载抽取记录所用的名单：优先使用 --roster，否则使用记录中的路径或各个来源"""
+    import draw_manifest
+    import roster_cache
+    import roster_reader
+    sources = draw_manifest.roster_sources(manifest)
+    roster_path = args.roster or manifest['roster']['path']
+    # 权重公式可能引用任意列，加权抽取的记录需要读取全部列
+    columns = None if manifest.get('weights') else roster_reader.DRAW_COLUMNS
+    if sources and not args.roster:
+        return roster_cache.load_roster_set(sources, use_cache=not args.no_cache, columns=columns)
+    if not roster_path:
+        raise ValueError("抽取记录中没有名单路径，请用 --roster 指定")
+    return roster_cache.load_roster(roster_path, use_cache=not args.no_cache, columns=columns)
+
+
+def selection_frame(experts_df, selected):
+    """
+    把抽中的行位置整理为结果表。
+
+    selected 为一维数组时按抽中顺序排列；为 K×n 矩阵（批量抽取）时
+    每行一位专家，并加上专家组编号列。
+    """
+    import numpy as np
+    import lottery_engine
+    import roster_reader
+    selected = np.asarray(selected, dtype=np.intp)
+    if selected.ndim == 1:
+        return roster_reader.expand_rows(experts_df, selected).reset_index(drop=True)
+    # 只为被抽中的专家补读其他列
+    selected_rows = np.unique(selected)
+    details_df = roster_reader.expand_rows(experts_df, selected_rows).reset_index(drop=True)
+    return lottery_engine.panels_to_frame(details_df, np.searchsorted(selected_rows, selected))
+
+
+def record_selection(args, details_df, seed, experts_df, output_path):
+    """--record 时把被抽中的专家写入抽中记录"""
+    if not args.record:
+        return
+    import selection_history
+    with selection_history.SelectionHistory(args.history) as history:
+        recorded = history.record(
+            details_df, seed=seed, roster_sha256=experts_df.attrs.get('roster_sha256'),
+            source=os.path.abspath(output_path) if output_path else None,
+        )
+    message(args, f"已把 {recorded} 位被抽中的专家写入抽中记录")
+
+
+def save_selection(args, result_df, manifest):
+    """
+    保存抽取结果和抽取记录。
+
+    指定 -o 时写入结果文件并在旁边保存抽取记录；--json 时把结果和记录
+    写到标准输出；都未指定时在控制台显示结果表。
+    """
+    import draw_manifest
+    manifest_path = None
+    if args.output:
+        write_table(result_df, args.output)
+        manifest_path = draw_manifest.manifest_path_for(args.output)
+        draw_manifest.write_manifest(manifest, manifest_path)
+        message(args, f"结果已保存到 '{args.output}'")
+        message(args, f"抽取记录已保存到 '{manifest_path}'")
+    if args.json:
+        emit_json({
+            'output': args.output,
+            'manifest_path': manifest_path,
+            'manifest': manifest,
+            'experts': frame_records(result_df),
+        })
+    elif not args.output:
+        print(result_df.to_string(index=False))
+
+
+def roster_summary(roster_index):
+    """
+    返回名单概况：行数、列名、名单哈希、各研究领域人数和单位数，合并的名单还包括来源。
+
+    返回:
+        dict: 可直接序列化为 JSON 的概况。
+    """
+    experts_df = roster_index.experts_df
+    summary = {
+        'rows': len(experts_df),
+        'columns': [str(column) for column in experts_df.columns],
+        'sha256': experts_df.attrs.get('roster_sha256'),
+        'fields': {},
+        'organizations': 0,
+        'organization_groups': 0,
+    }
+    if roster_index.field_codes is not None:
+        counts = roster_index.count_by_field(range(roster_index.size))
+        summary['fields'] = dict(sorted(counts.items(), key=lambda item: -item[1]))
+    if roster_index.org_codes is not None:
+        summary['organizations'] = len(roster_index.org_rows)
+        summary['organization_groups'] = len(roster_index.org_index.canonical)
+    sources = experts_df.attrs.get('sources')
+    if sources:
+        summary['sources'] = [{'path': source['path'], 'sheet': source['sheet']} for source in sources]
+        summary['duplicates'] = experts_df.attrs.get('duplicates', 0)
+    return summary
+
+
+def command_inspect(args):
+    """加载名单并显示行数、列名、研究领域和单位等概况"""
+    import lottery_engine
+    roster_index = lottery_engine.RosterIndex(load_roster_arguments(args, all_columns=True))
+    summary = roster_summary(roster_index)
+
+    if args.json:
+        emit_json(summary)
+        return 0
+    print(f"共 {summary['rows']} 位专家，名单哈希 {summary['sha256']}")
+    print(f"列名: {', '.join(summary['columns'])}")
+    if 'sources' in summary:
+        print(f"合并了 {len(summary['sources'])} 个工作表，去掉重复记录 {summary['duplicates']} 条")
+    if summary['fields']:
+        print(f"研究领域 ({len(summary['fields'])} 个): "
+              + ", ".join(f"{field} {count}" for field, count in summary['fields'].items()))
+    if roster_index.org_codes is not None:
+        print(f"单位: {summary['organizations']} 种写法，归并为 {summary['organization_groups']} 个单位")
+    return 0
+
+
+def command_draw(args):
+    """抽取一个专家组：按人数和筛选条件，或按研究领域配额"""
+    import draw_manifest
+    import lottery_engine
+
+    if args.count is None and not args.quota:
+        raise ValueError("请用 -n 指定抽取人数，或用 --quota 指定领域配额")
+    quotas = lottery_engine.parse_quotas(args.quota) if args.quota else None
+    if args.quota and not quotas:
+        raise ValueError("请填写领域配额，例如 材料:3, 化工:2")
+
+    experts_df = load_roster_arguments(args, all_columns=bool(args.weight))
+    roster_index = lottery_engine.RosterIndex(experts_df)
+    args.avoid = roster_index.expand_orgs(args.avoid)
+    excluded = cooldown_mask(args, roster_index)
+    weights, weight_variables = weight_arguments(args, experts_df, roster_index)
+    constraints = constraint_arguments(args, roster_index)
+
+    if quotas:
+        pool = roster_index.pool(fields=list(quotas), avoid_orgs=args.avoid, exclude=excluded)
+    else:
+        pool = roster_index.pool(fields=args.field, avoid_orgs=args.avoid, exclude=excluded)
+    if weights is not None:
+        pool = pool[weights[pool] > 0]
+    if len(pool) == 0:
+        message(args, "错误：根据当前筛选条件，没有找到符合条件的专家。")
+        return 1
+
+    # 有组队规则时人数不足由规则检查说明
+    if quotas and not constraints:
+        available = roster_index.count_by_field(pool)
+        shortages = [
+            f"{field}: 需要 {count}，可用 {available.get(field, 0)}"
+            for field, count in quotas.items()
+            if available.get(field, 0) < count
+        ]
+        if shortages:
+            print("警告：以下领域的可用专家不足，将返回该领域的所有可用专家: " + "；".join(shortages),
+                  file=sys.stderr)
+    elif not quotas and args.count > len(pool) and not constraints:
+        print(f"警告：要抽取的专家数量 ({args.count}) 大于可用专家总数 ({len(pool)})，"
+              f"将返回所有可用专家。", file=sys.stderr)
+
+    seed = args.seed if args.seed is not None else lottery_engine.new_seed()
+    if quotas and constraints:
+        # 配额作为各领域的最少人数，候选只来自配额中的领域，人数合计即为配额
+        constraints = constraints.with_required(quotas)
+    selected = draw_manifest.draw_selection(
+        roster_index, seed, mode=draw_manifest.MODE_QUOTA if quotas else draw_manifest.MODE_DRAW,
+        count=args.count, quotas=quotas, fields=args.field, avoid_orgs=args.avoid, exclude=excluded,
+        weights=weights, constraints=constraints,
+    )
+
+    result_df = selection_frame(experts_df, selected)
+    manifest = draw_manifest.build_manifest(
+        experts_df, selected, seed,
+        mode=draw_manifest.MODE_QUOTA if quotas else draw_manifest.MODE_DRAW,
+        fields=None if quotas else args.field, avoid_orgs=args.avoid, count=args.count, quotas=quotas,
+        roster_path=args.roster[0], cooldown_days=args.cooldown, excluded=excluded,
+        weight_expression=args.weight, weights=weights, weight_variables=weight_variables,
+        constraints=constraints,
+    )
+    message(args, f"已抽取 {len(result_df)} 位专家（种子 {seed}）")
+    save_selection(args, result_df, manifest)
+    record_selection(args, result_df, seed, experts_df, args.output)
+    return 0
+
+
+def command_batch(args):
+    """在同一份名单上批量抽取多个专家组，写入一个文件"""
+    import numpy as np
+    import draw_manifest
+    import lottery_engine
+
+    # 权重公式可能引用任意列，加权抽取时读取全部列
+    experts_df = load_roster_arguments(args, all_columns=bool(args.weight))
+    roster_index = lottery_engine.RosterIndex(experts_df)
+    args.avoid = roster_index.expand_orgs(args.avoid)
+    excluded = cooldown_mask(args, roster_index)
+    pool = roster_index.pool(fields=args.field, avoid_orgs=args.avoid, exclude=excluded)
+
+    weights, weight_variables = weight_arguments(args, experts_df, roster_index)
+    available = len(pool) if weights is None else lottery_engine.count_weighted(pool, weights)
+
+    constraints = constraint_arguments(args, roster_index)
+    if available == 0:
+        message(args, "错误：根据当前筛选条件，没有找到符合条件的专家。")
+        return 1
+    if args.count > available and not constraints:
+        print(f"警告：每组抽取数量 ({args.count}) 大于可用专家总数 ({available})，"
+              f"每组将包含所有可用专家。", file=sys.stderr)
+
+    seed = args.seed if args.seed is not None else lottery_engine.new_seed()
+    panels = draw_manifest.draw_selection(
+        roster_index, seed, mode=draw_manifest.MODE_BATCH, count=args.count, num_panels=args.panels,
+        fields=args.field, avoid_orgs=args.avoid, exclude=excluded, weights=weights, constraints=constraints,
+    )
+    result_df = selection_frame(experts_df, panels)
+    write_table(result_df, args.output)
+
+    manifest = draw_manifest.build_manifest(
+        experts_df, panels, seed, mode=draw_manifest.MODE_BATCH, fields=args.field,
+        avoid_orgs=args.avoid, count=args.count, num_panels=args.panels, roster_path=args.roster[0],
+        cooldown_days=args.cooldown, excluded=excluded,
+        weight_expression=args.weight, weights=weights, weight_variables=weight_variables,
+        constraints=constraints,
+    )
+    manifest_path = draw_manifest.manifest_path_for(args.output)
+    draw_manifest.write_manifest(manifest, manifest_path)
+
+    message(args, f"已抽取 {len(panels)} 个专家组（每组 {panels.shape[1]} 位专家），结果已保存到 '{args.output}'")
+    message(args, f"抽取记录已保存到 '{manifest_path}'")
+    if args.json:
+        emit_json({'output': args.output, 'manifest_path': manifest_path, 'manifest': manifest})
+
+    # 同一位专家出现在多个专家组中时只记录一次
+    first_rows = np.unique(panels.ravel(), return_index=True)[1]
+    details_df = result_df.iloc[np.sort(first_rows)].drop(columns=lottery_engine.PANEL_COLUMN)
+    record_selection(args, details_df, seed, experts_df, args.output)
+    return 0
+
+
+def command_simulate(args):
+    """并行模拟大量次抽取，统计每位专家的抽中频率"""
+    import lottery_engine
+    import lottery_parallel
+
+    experts_df = load_roster_arguments(args)
+    roster_index = lottery_engine.RosterIndex(experts_df)
+    args.avoid = roster_index.expand_orgs(args.avoid)
+    pool = roster_index.pool(
+        fields=args.field, avoid_orgs=args.avoid, exclude=cooldown_mask(args, roster_index)
+    )
+
+    if len(pool) == 0:
+        print("错误：根据当前筛选条件，没有找到符合条件的专家。", file=sys.stderr)
+        return 1
+
+    counts = lottery_parallel.simulate_selection_counts(
+        pool, args.count, args.draws, len(experts_df), seed=args.seed, workers=args.workers
+    )
+
+    expected = min(args.count, len(pool)) / len(pool)
+    frequencies = counts[pool] / args.draws
+    print(f"模拟 {args.draws} 次抽取，候选专家 {len(pool)} 位，每位专家的理论抽中概率为 {expected:.6f}")
+    print(f"实际抽中频率: 最小 {frequencies.min():.6f}，最大 {frequencies.max():.6f}，"
+          f"最大偏差 {abs(frequencies - expected).max():.6f}")
+
+    if args.output:
+        result_df = experts_df.iloc[pool].reset_index(drop=True)
+        result_df['抽中次数'] = counts[pool]
+        result_df['抽中频率'] = frequencies
+        result_df['理论概率'] = expected
+        write_table(result_df, args.output)
+        print(f"统计结果已保存到 '{args.output}'")
+    return 0
+
+
+def command_replay(args):
+    """按抽取记录重新执行抽取并核对结果"""
+    import draw_manifest
+    import lottery_engine
+
+    manifest = draw_manifest.read_manifest(args.manifest)
+    roster_index = lottery_engine.RosterIndex(load_manifest_roster(args, manifest))
+    verified = draw_manifest.verify(manifest, roster_index)
+    if args.json:
+        emit_json({'verified': verified, 'seed': manifest['seed'], 'mode': manifest['mode']})
+    if verified:
+        message(args, f"核对通过：按种子 {manifest['seed']} 重新抽取的结果与记录一致。")
+        return 0
+    print("核对失败：重新抽取的结果与记录不一致。", file=sys.stderr)
+    return 2
+
+
+def command_export(args):
+    """按抽取记录重新生成结果表，写入指定格式的文件或以 JSON 输出"""
+    import draw_manifest
+    import lottery_engine
+
+    manifest = draw_manifest.read_manifest(args.manifest)
+    experts_df = load_manifest_roster(args, manifest)
+    selected = draw_manifest.replay_selection(manifest, lottery_engine.RosterIndex(experts_df))
+    if selected is None:
+        print("核对失败：重新抽取的结果与记录不一致，未导出。", file=sys.stderr)
+        return 2
+
+    result_df = selection_frame(experts_df, selected)
+    if args.output:
+        write_table(result_df, args.output)
+        message(args, f"已导出 {len(result_df)} 行到 '{args.output}'")
+    if args.json:
+        emit_json({'output': args.output, 'manifest': manifest, 'experts': frame_records(result_df)})
+    elif not args.output:
+        print(result_df.to_string(index=False))
+    return 0
+
+
+def command_history(args):
+    """把以往的抽取结果文件导入抽中记录"""
+    import roster_reader
+    import selection_history
+
+    drawn_at = datetime.fromisoformat(args.date) if args.date else None
+    with selection_history.SelectionHistory(args.history) as history:
+        for result_path in args.results:
+            if not os.path.exists(result_path):
+                raise FileNotFoundError(result_path)
+            if os.path.splitext(result_path)[1].lower() == '.csv':
+                import pandas as pd
+                result_df = pd.read_csv(result_path, encoding='utf-8-sig')
+            else:
+                result_df = roster_reader.read_roster(result_path)
+            moment = drawn_at or datetime.fromtimestamp(os.path.getmtime(result_path))
+            recorded = history.record(result_df, drawn_at=moment, source=os.path.abspath(result_path))
+            print(f"已导入 '{result_path}' 中的 {recorded} 条抽中记录（抽中时间 {moment:%Y-%m-%d}）")
+        print(f"抽中记录共 {history.count()} 条，保存在 '{history.path}'")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='lottery_cli', description="专家抽取系统命令行工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    output_help = "输出文件路径 (.xlsx、.csv、.parquet 或 .jsonl)"
+
+    inspect = subparsers.add_parser('inspect', help="加载名单并显示概况")
+    add_roster_arguments(inspect)
+    add_json_argument(inspect)
+    inspect.set_defaults(handler=command_inspect)
+
+    draw = subparsers.add_parser('draw', help="抽取一个专家组")
+    add_roster_arguments(draw)
+    draw.add_argument('-n', '--count', type=int, default=None, help="抽取的专家数量")
+    draw.add_argument('--quota', default=None, metavar='配额',
+                      help="按研究领域配额抽取，例如 \"材料:3, 化工:2\"")
+    draw.add_argument('-o', '--output', default=None, help=output_help + "，默认显示在控制台")
+    draw.add_argument('--seed', type=int, default=None, help="随机种子，默认生成 128 位随机种子")
+    add_weight_arguments(draw)
+    add_history_arguments(draw)
+    add_constraint_arguments(draw)
+    add_filter_arguments(draw)
+    add_json_argument(draw)
+    draw.set_defaults(handler=command_draw)
+
+    batch = subparsers.add_parser('batch', help="批量抽取多个专家组")
+    add_roster_arguments(batch)
+    batch.add_argument('-n', '--count', type=int, required=True, help="每组抽取的专家数量")
+    batch.add_argument('-k', '--panels', type=int, required=True, help="专家组数量")
+    batch.add_argument('-o', '--output', required=True, help=output_help)
+    batch.add_argument('--seed', type=int, default=None, help="随机种子，默认生成 128 位随机种子")
+    add_weight_arguments(batch)
+    add_history_arguments(batch)
+    add_constraint_arguments(batch)
+    add_filter_arguments(batch)
+    add_json_argument(batch)
+    batch.set_defaults(handler=command_batch)
+
+    simulate = subparsers.add_parser('simulate', help="多进程模拟抽取，检查每位专家的抽中概率")
+    add_roster_arguments(simulate)
+    simulate.add_argument('-n', '--count', type=int, required=True, help="每次抽取的专家数量")
+    simulate.add_argument('--draws', type=int, required=True, help="模拟抽取的总次数")
+    simulate.add_argument('--workers', type=int, default=None, help="进程数，默认使用全部 CPU 核")
+    simulate.add_argument('-o', '--output', default=None, help="统计结果" + output_help)
+    simulate.add_argument('--seed', type=int, default=None, help="随机种子")
+    add_history_arguments(simulate)
+    add_filter_arguments(simulate)
+    simulate.set_defaults(handler=command_simulate)
+
+    replay = subparsers.add_parser('replay', help="按抽取记录重新执行抽取并核对结果")
+    replay.add_argument('manifest', help="抽取记录文件 (*.manifest.json)，\"-\" 表示从标准输入读取")
+    replay.add_argument('--roster', default=None, help="名单文件路径，默认使用记录中的路径")
+    replay.add_argument('--no-cache', action='store_true', help="不读写名单缓存")
+    add_json_argument(replay)
+    replay.set_defaults(handler=command_replay)
+
+    export = subparsers.add_parser('export', help="按抽取记录重新生成结果并导出")
+    export.add_argument('manifest', help="抽取记录文件 (*.manifest.json)，\"-\" 表示从标准输入读取")
+    export.add_argument('-o', '--output', default=None, help=output_help + "，默认显示在控制台")
+    export.add_argument('--roster', default=None, help="名单文件路径，默认使用记录中的路径")
+    export.add_argument('--no-cache', action='store_true', help="不读写名单缓存")
+    add_json_argument(export)
+    export.set_defaults(handler=command_export)
+
+    history = subparsers.add_parser('history', help="把以往的抽取结果文件导入抽中记录")
+    history.add_argument('results', nargs='+', help="抽取结果文件 (.xlsx 或 .csv)")
+    history.add_argument('--date', default=None, help="抽中日期，如 2024-05-01，默认使用文件修改时间")
+    history.add_argument('--history', default=None, metavar='路径', help="抽中记录数据库路径")
+    history.set_defaults(handler=command_history)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except FileNotFoundError as e:
+        print(f"错误：文件 '{e.filename or e}' 未找到。请检查文件路径是否正确。", file=sys.stderr)
+        return 1
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,926 @@
+"""
+专家抽取引擎。
+
+GUI (expert_lottery_gui.py) 与命令行 (test.py) 共用的筛选与抽样逻辑。
+本模块不依赖 PyQt6，批处理任务可以直接导入而无需创建任何窗口。
+所有函数都返回被选中专家在名单中的行位置（可用于 DataFrame.iloc）。
+
+重复抽取时应先为名单建立 RosterIndex：索引在加载时把研究领域和单位
+编码为分类代码，并记录每个取值对应的行位置，之后任意筛选组合的候选池
+都通过集合运算得到并被缓存，不再复制 DataFrame 或逐行比较字符串。
+
+筛选条件可以是单个取值，也可以是多个取值的列表：选中多个研究领域时取并集，
+回避多个单位时一次性排除。多个取值通过分类代码查找表一次完成判断，
+回避 50 个单位与回避 1 个单位的开销相同。
+
+同一单位的不同写法（"清华大学"、"清华大学 材料学院"、"Tsinghua University"）
+在建立索引时归入规范单位（org_alias.OrgIndex）。回避前用 RosterIndex.expand_orgs
+把选择的单位展开为名单中的所有写法，筛选本身仍按写法精确匹配。
+
+配额抽取 (sample_quota) 按 研究领域 -> 人数 一次性抽出整个专家组：
+对候选池分配随机键后按领域分组排序，每组取前若干名，结果天然不重复。
+
+批量抽取 (sample_batch) 在同一候选池上一次生成 K 个相互独立的专家组，
+结果为 K×n 的行位置矩阵，可用 panels_to_frame 合并为一张带专家组编号的表。
+
+近期已被抽中的专家可以通过 exclude 参数（行掩码或行位置）从候选池中排除，
+掩码通常由 selection_history.SelectionHistory.exclusion_mask 一次生成。
+
+加权抽取 (sample_weighted, sample_weighted_batch) 使用 Efraimidis–Spirakis
+方法：为每位候选生成键 log(u)/w，取键最大的 n 个即为按权重不放回抽样的结果。
+只需一次 O(N) 的键生成和部分排序，10 万人以上的名单同样可以即时抽取。
+权重可以是名单中的一列，也可以是公式（evaluate_weights）。
+
+所有抽样函数都使用 NumPy PCG64 生成器。需要留档复现时，先用 new_seed 生成
+128 位种子再传入；同一份名单、同样的筛选条件和种子总会得到同样的结果。
+"""
+import secrets
+
+import numpy as np
+import pandas as pd
+
+import org_alias
+
+# 名单中的列名
+NAME_COLUMN = '姓名'
+FIELD_COLUMN = '研究领域'
+ORG_COLUMN = '单位'
+TITLE_COLUMN = '职称'
+
+# 可作为专家唯一标识的列，按优先级排列；都不存在时使用 姓名+单位
+ID_COLUMNS = ('专家编号', '编号', 'ID')
+
+# 增量更新时受影响的取值超过该数量则直接重建倒排索引
+INCREMENTAL_GROUP_LIMIT = 64
+
+# 批量抽取结果中的专家组编号列
+PANEL_COLUMN = '专家组编号'
+
+# 批量抽取时每块随机键矩阵的元素上限，用于限制内存占用
+BATCH_CHUNK_ELEMENTS = 1 << 22
+
+# 加权抽取时每块键矩阵的元素上限
+WEIGHTED_CHUNK_ELEMENTS = BATCH_CHUNK_ELEMENTS
+
+# 候选池缓存的条目上限；长期运行的抽取服务会收到各种筛选组合
+POOL_CACHE_LIMIT = 256
+
+# 界面上表示"不筛选"的选项
+ALL_FIELDS = "全部领域"
+NO_AVOID = "不回避任何单位"
+
+
+def _encode_column(experts_df, column):
+    """把一列编码为分类代码，返回 (代码数组, 取值列表)，缺失值的代码为 -1"""
+    if column not in experts_df.columns:
+        return None, []
+    categorical = pd.Categorical(experts_df[column])
+    return np.asarray(categorical.codes, dtype=np.int32), list(categorical.categories)
+
+
+def _as_value_set(values, sentinel):
+    """把单个取值、取值列表或 None 统一为 frozenset，并去掉表示"不筛选"的选项"""
+    if values is None:
+        return frozenset()
+    if isinstance(values, str):
+        values = (values,)
+    return frozenset(value for value in values if value != sentinel)
+
+
+def _group_rows(codes, categories):
+    """根据分类代码建立 取值 -> 行位置数组 的倒排索引，不包含没有专家的取值"""
+    if codes is None:
+        return {}
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+    rows = {}
+    for code, value in enumerate(categories):
+        if bounds[code] == bounds[code + 1]:
+            continue
+        group = order[bounds[code]:bounds[code + 1]]
+        group.flags.writeable = False
+        rows[value] = group
+    return rows
+
+
+def _extend_codes(experts_df, column, categories):
+    """
+    按已有的取值列表为新名单编码，新出现的取值追加到列表末尾，
+    已有取值的代码保持不变。
+
+    返回:
+        tuple: (代码数组, 扩展后的取值列表)
+    """
+    if column not in experts_df.columns:
+        return None, list(categories)
+    categorical = pd.Categorical(experts_df[column])
+    lookup = {value: code for code, value in enumerate(categories)}
+    extended = list(categories)
+    remap = np.empty(len(categorical.categories) + 1, dtype=np.int32)
+    # 先转为列表再遍历，逐个访问 pandas 的 Index 要慢得多
+    for own_code, value in enumerate(categorical.categories.tolist()):
+        if value not in lookup:
+            lookup[value] = len(extended)
+            extended.append(value)
+        remap[own_code] = lookup[value]
+    remap[-1] = -1
+    return remap[np.asarray(categorical.codes, dtype=np.intp)], extended
+
+
+def _update_groups(old_rows, old_codes, new_codes, categories, diff):
+    """
+    按名单差异更新倒排索引，只重算受影响的取值对应的行位置数组。
+
+    受影响的取值是首尾相同的行中有变化的取值，以及中间增删的行的取值；
+    其他取值的行位置数组直接复用，位于中间部分之后的行位置整体平移。
+
+    返回:
+        dict: 取值 -> 行位置数组；受影响的取值过多时返回 None，由调用方重建。
+    """
+    if old_codes is None or new_codes is None:
+        return None
+    old_size, new_size = len(old_codes), len(new_codes)
+    head, tail = diff.same_head, diff.same_tail
+    old_end, new_end = old_size - tail, new_size - tail
+
+    changed_head = np.flatnonzero(old_codes[:head] != new_codes[:head])
+    changed_tail = np.flatnonzero(old_codes[old_end:] != new_codes[new_end:])
+    affected = np.unique(np.concatenate([
+        old_codes[changed_head], new_codes[changed_head],
+        old_codes[old_end:][changed_tail], new_codes[new_end:][changed_tail],
+        old_codes[head:old_end], new_codes[head:new_end],
+    ]))
+    affected = affected[affected >= 0]
+    if len(affected) > INCREMENTAL_GROUP_LIMIT:
+        return None
+
+    affected_values = {categories[code] for code in affected}
+    shift = new_size - old_size
+    rows = {}
+    for value, group in old_rows.items():
+        if value in affected_values:
+            continue
+        if shift and group[-1] >= old_end:
+            # 未受影响的取值不包含中间部分的行，尾部的行整体平移
+            group = group.copy()
+            group[np.searchsorted(group, old_end):] += shift
+            group.flags.writeable = False
+        rows[value] = group
+    for code in affected:
+        group = np.flatnonzero(new_codes == code)
+        if len(group):
+            group.flags.writeable = False
+            rows[categories[code]] = group
+    return rows
+
+
+def expert_keys(experts_df):
+    """
+    返回每位专家的稳定标识，用于比较名单的两个版本。
+
+    名单中有 专家编号/编号/ID 列时使用该列，否则使用 姓名+单位。
+
+    返回:
+        numpy.ndarray: 每行的标识字符串。
+    """
+    for column in ID_COLUMNS:
+        if column in experts_df.columns:
+            return experts_df[column].astype(str).to_numpy(dtype=object)
+    parts = [
+        experts_df[column].astype(str).to_numpy(dtype=object)
+        for column in (NAME_COLUMN, ORG_COLUMN) if column in experts_df.columns
+    ]
+    if not parts:
+        return np.arange(len(experts_df)).astype(str).astype(object)
+    keys = parts[0]
+    for part in parts[1:]:
+        keys = keys + '|' + part
+    return keys
+
+
+class RosterDiff:
+    """
+    名单两个版本之间的差异。
+
+    属性:
+        added (list): 新增专家的标识。
+        removed (list): 删除专家的标识。
+        changed (list): 研究领域或单位有变化的专家标识。
+        same_layout (bool): 两个版本的专家及其顺序是否完全相同。
+        same_columns (bool): 两个版本的列是否相同；列有增减时两个版本的所有专家都视为有变化。
+        same_head (int): 开头有多少行在两个版本中是同一位专家。
+        same_tail (int): 末尾有多少行在两个版本中是同一位专家（不与 same_head 重叠）。
+        keys (numpy.ndarray): 新版本每行的专家标识，可供新索引复用。
+    """
+
+    def __init__(self, added, removed, changed, same_layout, same_columns=True, same_head=0, same_tail=0,
+                 keys=None):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.same_layout = same_layout
+        self.same_columns = same_columns
+        self.same_head = same_head
+        self.same_tail = same_tail
+        self.keys = keys
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed) or not self.same_columns
+
+    def summary(self):
+        """返回适合显示给用户的简短说明"""
+        text = f"新增 {len(self.added)} 位，删除 {len(self.removed)} 位，修改 {len(self.changed)} 位"
+        return text if self.same_columns else text + "，列有变化"
+
+
+def _common_ends(old_keys, new_keys):
+    """返回两个版本开头和末尾专家标识逐行相同的行数，两者不重叠"""
+    length = min(len(old_keys), len(new_keys))
+    mismatch = np.flatnonzero(old_keys[:length] != new_keys[:length])
+    head = int(mismatch[0]) if len(mismatch) else length
+    rest = length - head
+    if rest == 0:
+        return head, 0
+    mismatch = np.flatnonzero(old_keys[len(old_keys) - rest:][::-1] != new_keys[len(new_keys) - rest:][::-1])
+    return head, int(mismatch[0]) if len(mismatch) else rest
+
+
+def diff_rosters(old_df, new_df, old_keys=None):
+    """
+    按专家标识比较名单的两个版本。
+
+    只比较索引用到的列：专家标识、研究领域和单位。先逐行比较两个版本开头和末尾
+    相同的专家（追加、删除或修改少数行时几乎是整份名单），只有中间不同的部分按
+    专家标识查找对应关系，开销与名单行数成线性关系，且远小于重新建立索引。
+
+    参数:
+        old_df (pandas.DataFrame): 旧名单。
+        new_df (pandas.DataFrame): 新名单。
+        old_keys (numpy.ndarray): 旧名单的专家标识，通常为 RosterIndex.keys()；None 时重新计算。
+
+    返回:
+        RosterDiff: 两个版本之间的差异。
+    """
+    old_keys = expert_keys(old_df) if old_keys is None else old_keys
+    new_keys = expert_keys(new_df)
+    old_size, new_size = len(old_keys), len(new_keys)
+    head, tail = _common_ends(old_keys, new_keys)
+    old_end, new_end = old_size - tail, new_size - tail
+
+    # 中间部分按专家标识对应，同一标识出现多次时取第一次；只是追加或删除时没有对应关系
+    old_middle = old_keys[head:old_end]
+    new_middle = new_keys[head:new_end]
+    if len(old_middle) and len(new_middle):
+        old_index = pd.Index(old_middle)
+        first = ~old_index.duplicated()
+        old_positions = old_index[first].get_indexer(new_middle)
+        matched_new = np.flatnonzero(old_positions >= 0)
+        matched_old = np.flatnonzero(first)[old_positions[matched_new]] + head
+        matched_new += head
+        added = new_middle[old_positions < 0]
+        removed = old_middle[~old_index.isin(new_middle)]
+    else:
+        matched_new = matched_old = np.zeros(0, dtype=np.intp)
+        added, removed = new_middle, old_middle
+
+    # 增加或删除了列时，所有专家都视为有变化
+    same_columns = set(old_df.columns) == set(new_df.columns)
+    changed = np.zeros(new_size, dtype=bool)
+    changed_middle = np.zeros(len(matched_new), dtype=bool)
+    if same_columns:
+        for column in (FIELD_COLUMN, ORG_COLUMN):
+            old_codes, categories = _encode_column(old_df, column)
+            if old_codes is None:
+                continue
+            new_codes, _ = _extend_codes(new_df, column, categories)
+            changed[:head] |= old_codes[:head] != new_codes[:head]
+            changed[new_end:] |= old_codes[old_end:] != new_codes[new_end:]
+            changed_middle |= old_codes[matched_old] != new_codes[matched_new]
+    else:
+        changed[:head] = True
+        changed[new_end:] = True
+        changed_middle[:] = True
+    changed[matched_new[changed_middle]] = True
+
+    return RosterDiff(
+        added=list(dict.fromkeys(added.tolist())),
+        removed=list(dict.fromkeys(removed.tolist())),
+        changed=list(dict.fromkeys(new_keys[changed].tolist())),
+        same_layout=head == old_size == new_size,
+        same_columns=same_columns,
+        same_head=head,
+        same_tail=tail,
+        keys=new_keys,
+    )
+
+
+class RosterIndex:
+    """
+    专家名单的筛选索引。
+
+    每次加载名单时建立一次；名单文件变化后可用 updated 增量更新。
+
+    属性:
+        experts_df (pandas.DataFrame): 建立索引的名单。
+        fields (list): 研究领域代码表，代码即列表下标。
+        organizations (list): 单位代码表，代码即列表下标。
+        field_rows (dict): 研究领域 -> 行位置数组（升序）。
+        org_rows (dict): 单位 -> 行位置数组（升序）。
+        org_index (org_alias.OrgIndex): 单位写法 -> 规范单位的索引。
+
+    参数:
+        experts_df (pandas.DataFrame): 专家名单。
+        org_aliases (dict): 单位别名表，None 时读取默认的别名表（见 org_alias.load_aliases）。
+    """
+
+    def __init__(self, experts_df, org_aliases=None):
+        self.experts_df = experts_df
+        self.org_aliases = org_alias.load_aliases() if org_aliases is None else org_aliases
+        self.size = len(experts_df)
+        self.field_codes, self.fields = _encode_column(experts_df, FIELD_COLUMN)
+        self.org_codes, self.organizations = _encode_column(experts_df, ORG_COLUMN)
+        self.field_rows = _group_rows(self.field_codes, self.fields)
+        self.org_rows = _group_rows(self.org_codes, self.organizations)
+        self._build_lookups()
+
+    def updated(self, experts_df, diff=None):
+        """
+        为名单的新版本建立索引，尽量复用当前索引。
+
+        已有研究领域和单位的代码保持不变，新出现的取值追加到代码表末尾。
+        只重算有变化或增删的行涉及的取值对应的行位置数组，其他取值的数组直接复用
+        （位于增删部分之后的整体平移）；规范单位索引只为新出现的单位写法增量更新。
+        列有增减时（例如删除了单位列）旧的代码表不再适用，按新名单重新建立索引。
+
+        参数:
+            experts_df (pandas.DataFrame): 新版本的名单。
+            diff (RosterDiff): 新旧名单的差异，None 时自动计算。
+
+        返回:
+            RosterIndex: 新名单的索引。
+        """
+        if diff is None:
+            diff = diff_rosters(self.experts_df, experts_df, old_keys=self.keys())
+        if not diff.same_columns:
+            return RosterIndex(experts_df, self.org_aliases)
+
+        index = RosterIndex.__new__(RosterIndex)
+        index.experts_df = experts_df
+        index.org_aliases = self.org_aliases
+        index.size = len(experts_df)
+        index.field_codes, index.fields = _extend_codes(experts_df, FIELD_COLUMN, self.fields)
+        index.org_codes, index.organizations = _extend_codes(experts_df, ORG_COLUMN, self.organizations)
+
+        field_rows = _update_groups(self.field_rows, self.field_codes, index.field_codes, index.fields, diff)
+        org_rows = _update_groups(self.org_rows, self.org_codes, index.org_codes, index.organizations, diff)
+        index.field_rows = field_rows if field_rows is not None else _group_rows(index.field_codes, index.fields)
+        index.org_rows = org_rows if org_rows is not None else _group_rows(index.org_codes, index.organizations)
+        index._build_lookups(previous=self)
+        if diff.keys is not None and len(diff.keys) == index.size:
+            index._keys = diff.keys
+            index._keys.flags.writeable = False
+        return index
+
+    def _build_lookups(self, previous=None):
+        self._field_lookup = {value: code for code, value in enumerate(self.fields)}
+        self._org_lookup = {value: code for code, value in enumerate(self.organizations)}
+        # 只为名单中有专家的写法建立规范单位
+        present = [value for value in self.organizations if value in self.org_rows]
+        org_index = None
+        known = 0
+        if previous is not None and present[:len(previous.org_index.organizations)] \
+                == previous.org_index.organizations:
+            # 已有写法都还在且顺序不变时，只为新出现的写法增量更新
+            known = len(previous.org_index.organizations)
+            org_index = previous.org_index
+            if len(present) > known:
+                org_index = org_index.extended(present[known:])
+        if org_index is None:
+            known = 0
+            org_index = org_alias.OrgIndex(present, self.org_aliases)
+        self.org_index = org_index
+
+        # 单位代码 -> 规范单位下标，末尾一项对应缺失值 (-1)
+        self._org_group_of_code = np.full(len(self.organizations) + 1, -1, dtype=np.intp)
+        if known:
+            self._org_group_of_code[:len(previous.organizations)] = previous._org_group_of_code[:-1]
+        for value, group in zip(org_index.organizations[known:], org_index.group_of[known:]):
+            self._org_group_of_code[self._org_lookup[value]] = group
+        self._all_rows = np.arange(self.size, dtype=np.intp)
+        self._all_rows.flags.writeable = False
+        self._pool_cache = {}
+        self._keys = None
+
+    def expand_orgs(self, organizations):
+        """
+        把需要回避的单位展开为名单中属于同一规范单位的所有写法。
+
+        参数:
+            organizations (str | list): 单位写法、规范单位或别名；"不回避任何单位" 会被忽略。
+
+        返回:
+            list: 展开后的单位写法，可直接传给 pool 的 avoid_orgs 参数并保存到抽取记录。
+        """
+        if isinstance(organizations, str):
+            organizations = [organizations]
+        return self.org_index.expand(value for value in organizations or () if value != NO_AVOID)
+
+    def keys(self):
+        """返回每行的专家标识（lottery_engine.expert_keys），首次调用后缓存"""
+        if self._keys is None:
+            self._keys = expert_keys(self.experts_df)
+            self._keys.flags.writeable = False
+        return self._keys
+
+    def key_mask(self, keys):
+        """
+        返回专家标识属于 keys 的行掩码。
+
+        以哈希表查找，开销与名单行数和 keys 的数量成线性关系。
+
+        参数:
+            keys (iterable): 专家标识。
+
+        返回:
+            numpy.ndarray: 长度为名单行数的布尔数组。
+        """
+        keys = list(keys)
+        if not keys:
+            return np.zeros(self.size, dtype=bool)
+        return pd.Index(self.keys()).isin(keys)
+
+    @staticmethod
+    def _code_mask(codes, lookup, values):
+        """返回代码属于 values 的行掩码；查找表末尾一项对应缺失值 (-1)"""
+        table = np.zeros(len(lookup) + 1, dtype=bool)
+        table[[lookup[value] for value in values if value in lookup]] = True
+        return table[codes]
+
+    def pool(self, fields=None, avoid_orgs=None, exclude=None):
+        """
+        返回符合筛选条件的候选行位置。
+
+        结果按筛选条件缓存，返回的数组为只读；exclude 在缓存结果上再做一次掩码，不参与缓存。
+
+        参数:
+            fields (str | list): 需要的研究领域，可为多个（取并集）；
+                None、空列表或 "全部领域" 表示不限。
+            avoid_orgs (str | list): 需要回避的单位，可为多个；
+                None、空列表或 "不回避任何单位" 表示不回避。
+            exclude (numpy.ndarray): 需要排除的行，可以是长度为名单行数的布尔掩码或行位置。
+
+        返回:
+            numpy.ndarray: 候选专家行位置（升序）。
+        """
+        rows = self._filtered_pool(fields, avoid_orgs)
+        if exclude is None:
+            return rows
+        mask = self.row_mask(exclude)
+        return rows[~mask[rows]] if mask.any() else rows
+
+    def row_mask(self, rows):
+        """把布尔掩码或行位置统一为长度为名单行数的布尔掩码"""
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            if len(rows) != self.size:
+                raise ValueError("排除掩码的长度与名单行数不一致")
+            return rows
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows.astype(np.intp, copy=False)] = True
+        return mask
+
+    def _filtered_pool(self, fields, avoid_orgs):
+        fields = _as_value_set(fields, ALL_FIELDS) if self.field_codes is not None else frozenset()
+        avoid_orgs = _as_value_set(avoid_orgs, NO_AVOID) if self.org_codes is not None else frozenset()
+
+        key = (fields, avoid_orgs)
+        cached = self._pool_cache.get(key)
+        if cached is not None:
+            return cached
+
+        if not fields and not avoid_orgs:
+            rows = self._all_rows
+        elif len(fields) == 1 and not avoid_orgs:
+            (field,) = fields
+            rows = self.field_rows.get(field, self._all_rows[:0])
+        else:
+            mask = np.ones(self.size, dtype=bool)
+            if fields:
+                mask &= self._code_mask(self.field_codes, self._field_lookup, fields)
+            if avoid_orgs:
+                mask &= ~self._code_mask(self.org_codes, self._org_lookup, avoid_orgs)
+            rows = np.flatnonzero(mask)
+            rows.flags.writeable = False
+
+        if len(self._pool_cache) >= POOL_CACHE_LIMIT:
+            self._pool_cache.clear()
+        self._pool_cache[key] = rows
+        return rows
+
+    def count_by_field(self, rows):
+        """
+        统计给定行位置中每个研究领域的人数。
+
+        返回:
+            dict: 研究领域 -> 人数，只包含人数大于 0 的领域。
+        """
+        if self.field_codes is None:
+            return {}
+        codes = self.field_codes[np.asarray(rows, dtype=np.intp)]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.fields))
+        return {self.fields[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+    def count_by_org_group(self, rows):
+        """
+        统计给定行位置中每个规范单位（见 org_index）的人数，同一单位的各种写法合并计数。
+
+        返回:
+            dict: 规范单位 -> 人数，只包含人数大于 0 的单位。
+        """
+        if self.org_codes is None:
+            return {}
+        groups = self._org_group_of_code[self.org_codes[np.asarray(rows, dtype=np.intp)]]
+        counts = np.bincount(groups[groups >= 0], minlength=len(self.org_index.canonical))
+        return {self.org_index.canonical[group]: int(counts[group]) for group in np.flatnonzero(counts)}
+
+
+def filter_experts(experts_df, fields=None, avoid_orgs=None):
+    """
+    根据研究领域和回避单位筛选专家。
+
+    只筛选一次时使用；需要反复筛选同一份名单时请直接使用 RosterIndex。
+
+    参数:
+        experts_df (pandas.DataFrame): 专家名单。
+        fields (str | list): 需要的研究领域，可为多个。
+        avoid_orgs (str | list): 需要回避的单位，可为多个。
+
+    返回:
+        numpy.ndarray: 符合条件的专家行位置（升序）。
+    """
+    if experts_df is None or experts_df.empty:
+        return np.empty(0, dtype=np.intp)
+    return RosterIndex(experts_df).pool(fields=fields, avoid_orgs=avoid_orgs)
+
+
+def parse_quotas(text):
+    """
+    解析配额文本，例如 "材料:3, 化工:2, 机械:1"。
+
+    支持中英文冒号和逗号，也可用分号或换行分隔。
+
+    参数:
+        text (str): 配额文本。
+
+    返回:
+        dict: 研究领域 -> 人数，保持书写顺序。格式错误时抛出 ValueError。
+    """
+    quotas = {}
+    normalized = text.replace('：', ':').replace('，', ',').replace('；', ',').replace(';', ',')
+    for part in normalized.replace('\n', ',').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        field, sep, count = part.rpartition(':')
+        field = field.strip()
+        if not sep or not field:
+            raise ValueError(f"配额格式错误: '{part}'，应为 领域:人数")
+        try:
+            count = int(count)
+        except ValueError:
+            raise ValueError(f"配额人数必须是整数: '{part}'") from None
+        if count <= 0:
+            raise ValueError(f"配额人数必须大于 0: '{part}'")
+        quotas[field] = quotas.get(field, 0) + count
+    return quotas
+
+
+def evaluate_weights(experts_df, expression, variables=None):
+    """
+    计算每位专家的抽取权重。
+
+    参数:
+        experts_df (pandas.DataFrame): 专家名单。
+        expression (str): 列名（例如 "权重"），或引用列名的公式，例如
+            "1 / (1 + 抽中次数)"、"(职称 == '正高') * 2 + 1"。
+        variables (dict): 公式中可以使用的其他变量 -> 长度为名单行数的数组。
+
+    返回:
+        numpy.ndarray: 长度为名单行数的非负权重。公式无法计算、
+        结果含负数或缺失值时抛出 ValueError。
+    """
+    expression = expression.strip()
+    if not expression:
+        raise ValueError("权重公式不能为空")
+    variables = dict(variables or {})
+
+    if expression in experts_df.columns:
+        values = pd.to_numeric(experts_df[expression], errors='coerce')
+    elif expression in variables:
+        values = variables[expression]
+    else:
+        try:
+            values = experts_df.eval(expression, resolvers=(variables,))
+        except Exception as e:
+            raise ValueError(f"无法计算权重公式 '{expression}': {e}") from None
+
+    weights = np.broadcast_to(np.asarray(values, dtype=np.float64), (len(experts_df),)).copy()
+    invalid = ~np.isfinite(weights)
+    if invalid.any():
+        raise ValueError(f"权重中有 {int(invalid.sum())} 个缺失值或非数值，第一处在第 {int(np.argmax(invalid))} 行")
+    if (weights < 0).any():
+        raise ValueError("权重不能为负数")
+    return weights
+
+
+def _weighted_keys(rng, weights, shape=None):
+    """
+    Efraimidis–Spirakis 排序键：-log(u)/w，越小越优先（与 sample_batch 的随机键方向一致）。
+
+    权重为 0 的键为 +inf，永远不会被选中。
+    """
+    uniform = rng.random(shape if shape is not None else weights.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        keys = -np.log1p(-uniform) / weights
+    return np.where(weights > 0, keys, np.inf)
+
+
+def new_seed():
+    """生成一个 128 位的随机种子"""
+    return secrets.randbits(128)
+
+
+def _random_state(random_state):
+    """把种子转换为 PCG64 随机数生成器；已经是生成器时直接使用"""
+    if isinstance(random_state, (np.random.RandomState, np.random.Generator)):
+        return random_state
+    if random_state is None:
+        random_state = new_seed()
+    return np.random.Generator(np.random.PCG64(random_state))
+
+
+def sample_pool(pool, num_to_extract, random_state=None):
+    """
+    从候选行位置中不放回地随机抽取。
+
+    参数:
+        pool (numpy.ndarray): 候选专家行位置。
+        num_to_extract (int): 需要抽取的专家数量，超过候选人数时返回全部候选。
+        random_state (int | numpy.random.Generator): 随机种子或生成器，None 时使用 new_seed 生成。
+
+    返回:
+        numpy.ndarray: 被抽中的专家行位置。
+    """
+    if num_to_extract <= 0:
+        raise ValueError("抽取的专家数量必须大于 0")
+
+    pool = np.asarray(pool, dtype=np.intp)
+    if num_to_extract >= len(pool):
+        return pool.copy()
+
+    rng = _random_state(random_state)
+    return rng.choice(pool, size=num_to_extract, replace=False)
+
+
+def sample_weighted(pool, num_to_extract, weights, random_state=None):
+    """
+    按权重从候选行位置中不放回地随机抽取。
+
+    参数:
+        pool (numpy.ndarray): 候选专家行位置。
+        num_to_extract (int): 需要抽取的专家数量，超过权重为正的候选人数时返回这些候选。
+        weights (numpy.ndarray): 长度为名单行数的权重（evaluate_weights 的结果），
+            权重为 0 的专家不会被抽中。
+        random_state (int | numpy.random.Generator): 随机种子或生成器。
+
+    返回:
+        numpy.ndarray: 被抽中的专家行位置，按抽中顺序排列。
+    """
+    if num_to_extract <= 0:
+        raise ValueError("抽取的专家数量必须大于 0")
+
+    pool = np.asarray(pool, dtype=np.intp)
+    pool_weights = np.asarray(weights, dtype=np.float64)[pool]
+    size = min(num_to_extract, int(np.count_nonzero(pool_weights > 0)))
+    if size == 0:
+        return pool[:0].copy()
+
+    rng = _random_state(random_state)
+    keys = _weighted_keys(rng, pool_weights)
+    picked = np.argpartition(keys, size - 1)[:size] if size < len(pool) else np.arange(len(pool))
+    picked = picked[np.argsort(keys[picked], kind='stable')][:size]
+    return pool[picked]
+
+
+def count_weighted(pool, weights):
+    """返回候选中权重为正（可能被抽中）的人数"""
+    return int(np.count_nonzero(np.asarray(weights)[np.asarray(pool, dtype=np.intp)] > 0))
+
+
+def sample_quota(roster_index, quotas, avoid_orgs=None, random_state=None, exclude=None,
+                 weights=None):
+    """
+    按研究领域配额一次性抽取整个专家组。
+
+    某个领域的候选人数不足配额时返回该领域的全部候选，
+    调用方可用 RosterIndex.count_by_field 检查缺额。
+
+    参数:
+        roster_index (RosterIndex): 名单索引。
+        quotas (dict): 研究领域 -> 需要抽取的人数。
+        avoid_orgs (str | list): 需要回避的单位，可为多个。
+        random_state (int | numpy.random.Generator): 随机种子或生成器。
+        exclude (numpy.ndarray): 需要排除的行掩码或行位置，见 RosterIndex.pool。
+        weights (numpy.ndarray): 长度为名单行数的权重，None 表示等概率；
+            给出时组内按 Efraimidis–Spirakis 键排序，权重为 0 的专家不参与抽取。
+
+    返回:
+        numpy.ndarray: 被抽中的专家行位置，按配额中的领域顺序分组排列。
+    """
+    if not quotas:
+        raise ValueError("配额不能为空")
+    if any(count <= 0 for count in quotas.values()):
+        raise ValueError("配额人数必须大于 0")
+    if roster_index.field_codes is None:
+        raise ValueError(f"名单中没有 '{FIELD_COLUMN}' 列，无法按领域配额抽取")
+
+    pool = roster_index.pool(fields=list(quotas), avoid_orgs=avoid_orgs, exclude=exclude)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+        pool = pool[weights[pool] > 0]
+    if len(pool) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    # 领域代码 -> 在配额中的顺序和人数
+    num_codes = len(roster_index.fields)
+    group_of_code = np.full(num_codes, len(quotas), dtype=np.intp)
+    quota_of_group = np.zeros(len(quotas) + 1, dtype=np.intp)
+    for group, (field, count) in enumerate(quotas.items()):
+        code = roster_index._field_lookup.get(field)
+        if code is not None:
+            group_of_code[code] = group
+        quota_of_group[group] = count
+
+    groups = group_of_code[roster_index.field_codes[pool]]
+
+    # 组内按随机键排序，每组取前 quota 个
+    rng = _random_state(random_state)
+    keys = rng.random(len(pool)) if weights is None else _weighted_keys(rng, weights[pool])
+    order = np.lexsort((keys, groups))
+    sorted_groups = groups[order]
+    group_starts = np.searchsorted(sorted_groups, np.arange(len(quotas) + 1))
+    rank = np.arange(len(pool)) - group_starts[sorted_groups]
+    return pool[order[rank < quota_of_group[sorted_groups]]]
+
+
+def _sample_sparse_rows(rng, num_rows, size, population):
+    """
+    为 num_rows 组各抽取 size 个互不相同的位置 (0..population-1)。
+
+    先有放回地抽取，再只对出现重复的行重新抽取。size 远小于 population 时
+    重复很少，开销与 size 成正比而与 population 无关。
+    """
+    picked = (rng.random((num_rows, size)) * population).astype(np.intp)
+    pending = np.arange(num_rows)
+    while len(pending):
+        rows = np.sort(picked[pending], axis=1)
+        pending = pending[(rows[:, 1:] == rows[:, :-1]).any(axis=1)]
+        picked[pending] = (rng.random((len(pending), size)) * population).astype(np.intp)
+    return picked
+
+
+def sample_batch(pool, num_to_extract, num_panels, random_state=None):
+    """
+    在同一候选池上批量抽取多个相互独立的专家组。
+
+    每个专家组内不重复，不同专家组之间相互独立。每组人数远小于候选人数时
+    先有放回抽取再重抽出现重复的组；否则为每个候选分配随机键，用
+    argpartition 取键最小的 n 个。两种方式都按块处理以限制内存占用。
+
+    参数:
+        pool (numpy.ndarray): 候选专家行位置。
+        num_to_extract (int): 每组抽取的专家数量，超过候选人数时每组包含全部候选。
+        num_panels (int): 专家组数量。
+        random_state (int | numpy.random.Generator): 随机种子或生成器。
+
+    返回:
+        numpy.ndarray: 形状为 (num_panels, n) 的行位置矩阵。
+    """
+    if num_to_extract <= 0:
+        raise ValueError("抽取的专家数量必须大于 0")
+    if num_panels <= 0:
+        raise ValueError("专家组数量必须大于 0")
+
+    pool = np.asarray(pool, dtype=np.intp)
+    rng = _random_state(random_state)
+    size = min(num_to_extract, len(pool))
+    panels = np.empty((num_panels, size), dtype=np.intp)
+    if size == 0:
+        return panels
+
+    # 组内出现重复的概率约为 n²/2N，不超过一半时使用有放回抽取加重抽
+    if size * size <= len(pool):
+        chunk = max(1, BATCH_CHUNK_ELEMENTS // size)
+        for start in range(0, num_panels, chunk):
+            stop = min(start + chunk, num_panels)
+            panels[start:stop] = pool[_sample_sparse_rows(rng, stop - start, size, len(pool))]
+        return panels
+
+    chunk = max(1, BATCH_CHUNK_ELEMENTS // len(pool))
+    for start in range(0, num_panels, chunk):
+        stop = min(start + chunk, num_panels)
+        keys = rng.random((stop - start, len(pool)))
+        if size < len(pool):
+            picked = np.argpartition(keys, size - 1, axis=1)[:, :size]
+        else:
+            picked = np.broadcast_to(np.arange(len(pool)), keys.shape)
+        # 组内按随机键排序，使专家顺序同样随机
+        picked_keys = np.take_along_axis(keys, picked, axis=1)
+        picked = np.take_along_axis(picked, np.argsort(picked_keys, axis=1), axis=1)
+        panels[start:stop] = pool[picked]
+    return panels
+
+
+def sample_weighted_batch(pool, num_to_extract, num_panels, weights, random_state=None):
+    """
+    按权重在同一候选池上批量抽取多个相互独立的专家组。
+
+    每组为候选生成一行 Efraimidis–Spirakis 键，用 argpartition 取键最优的 n 个，
+    按块处理以限制内存占用。
+
+    参数:
+        pool (numpy.ndarray): 候选专家行位置。
+        num_to_extract (int): 每组抽取的专家数量，超过权重为正的候选人数时每组包含这些候选。
+        num_panels (int): 专家组数量。
+        weights (numpy.ndarray): 长度为名单行数的权重。
+        random_state (int | numpy.random.Generator): 随机种子或生成器。
+
+    返回:
+        numpy.ndarray: 形状为 (num_panels, n) 的行位置矩阵。
+    """
+    if num_to_extract <= 0:
+        raise ValueError("抽取的专家数量必须大于 0")
+    if num_panels <= 0:
+        raise ValueError("专家组数量必须大于 0")
+
+    pool = np.asarray(pool, dtype=np.intp)
+    pool_weights = np.asarray(weights, dtype=np.float64)[pool]
+    # 权重为 0 的候选不会被抽中，提前去掉以减少键的数量
+    positive = pool_weights > 0
+    pool = pool[positive]
+    pool_weights = pool_weights[positive]
+
+    rng = _random_state(random_state)
+    size = min(num_to_extract, len(pool))
+    panels = np.empty((num_panels, size), dtype=np.intp)
+    if size == 0:
+        return panels
+
+    chunk = max(1, WEIGHTED_CHUNK_ELEMENTS // len(pool))
+    for start in range(0, num_panels, chunk):
+        stop = min(start + chunk, num_panels)
+        keys = _weighted_keys(rng, pool_weights, (stop - start, len(pool)))
+        if size < len(pool):
+            picked = np.argpartition(keys, size - 1, axis=1)[:, :size]
+        else:
+            picked = np.broadcast_to(np.arange(len(pool)), keys.shape)
+        picked_keys = np.take_along_axis(keys, picked, axis=1)
+        picked = np.take_along_axis(picked, np.argsort(picked_keys, axis=1), axis=1)
+        panels[start:stop] = pool[picked]
+    return panels
+
+
+def panels_to_frame(experts_df, panels, panel_column=PANEL_COLUMN):
+    """
+    把批量抽取的结果合并为一张表。
+
+    参数:
+        experts_df (pandas.DataFrame): 专家名单。
+        panels (numpy.ndarray): sample_batch 返回的行位置矩阵。
+        panel_column (str): 专家组编号列名，编号从 1 开始。
+
+    返回:
+        pandas.DataFrame: 所有专家组的专家信息，第一列为专家组编号。
+    """
+    panels = np.asarray(panels, dtype=np.intp)
+    result = experts_df.iloc[panels.ravel()].reset_index(drop=True)
+    result.insert(0, panel_column, np.repeat(np.arange(1, len(panels) + 1), panels.shape[1]))
+    return result
+
+
+def draw_experts(experts_df, num_to_extract, fields=None, avoid_orgs=None, random_state=None):
+    """
+    按筛选条件从名单中随机抽取专家。
+
+    参数:
+        experts_df (pandas.DataFrame): 专家名单。
+        num_to_extract (int): 需要抽取的专家数量。
+        fields (str | list): 需要的研究领域，可为多个。
+        avoid_orgs (str | list): 需要回避的单位，可为多个。
+        random_state (int | numpy.random.Generator): 随机种子或生成器。
+
+    返回:
+        numpy.ndarray: 被抽中的专家行位置。
+    """
+    pool = filter_experts(experts_df, fields=fields, avoid_orgs=avoid_orgs)
+    return sample_pool(pool, num_to_extract, random_state=random_state)
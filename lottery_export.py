@@ -0,0 +1,143 @@
+"""
+抽取结果导出。
+
+按输出文件的扩展名选择格式：
+    .xlsx     openpyxl 只写模式逐行写入，内存占用与行数无关；
+    .csv      UTF-8（带 BOM，Excel 可直接打开）；
+    .parquet  需要安装 pyarrow；
+    .jsonl    JSON Lines，每行一位专家，便于其他系统导入。
+
+所有格式都分块写入并报告进度，可以中途取消。先写入同目录下的临时文件，
+完成后再替换目标文件，导出失败或取消时不会留下不完整的结果文件。
+"""
+import os
+
+# 每块写入的行数
+EXPORT_CHUNK_ROWS = 10000
+
+# 扩展名 -> 格式说明，用于文件对话框和错误提示
+EXPORT_FORMATS = {
+    '.xlsx': "Excel 文件",
+    '.csv': "CSV 文件",
+    '.parquet': "Parquet 文件",
+    '.jsonl': "JSON Lines 文件",
+}
+
+
+class ExportCancelled(Exception):
+    """导出操作被取消"""
+
+
+def file_dialog_filter():
+    """返回文件对话框使用的格式过滤器，例如 "Excel 文件 (*.xlsx);;CSV 文件 (*.csv)" """
+    return ";;".join(f"{name} (*{extension})" for extension, name in EXPORT_FORMATS.items())
+
+
+def _column_values(series):
+    """把一列转为可直接写入的 Python 值列表，缺失值为 None"""
+    values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def _iter_chunks(result_df, progress, should_cancel):
+    """按块产出 (起始行, 数据块)，并在块之间报告进度、检查是否取消"""
+    total = len(result_df)
+    for start in range(0, max(total, 1), EXPORT_CHUNK_ROWS):
+        if should_cancel is not None and should_cancel():
+            raise ExportCancelled()
+        yield start, result_df.iloc[start:start + EXPORT_CHUNK_ROWS]
+        if progress is not None:
+            progress(min(start + EXPORT_CHUNK_ROWS, total), total)
+
+
+def write_xlsx(result_df, output_path, progress=None, should_cancel=None):
+    """用 openpyxl 只写模式逐行写入 xlsx 文件，表头加粗"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    header_font = Font(bold=True)
+    header = []
+    for name in result_df.columns:
+        cell = WriteOnlyCell(worksheet, value=str(name))
+        cell.font = header_font
+        header.append(cell)
+    worksheet.append(header)
+
+    for _, chunk in _iter_chunks(result_df, progress, should_cancel):
+        columns = [_column_values(chunk[name]) for name in chunk.columns]
+        for row in zip(*columns):
+            worksheet.append(row)
+    workbook.save(output_path)
+
+
+def write_csv(result_df, output_path, progress=None, should_cancel=None):
+    """分块写入 UTF-8（带 BOM）CSV 文件"""
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        for start, chunk in _iter_chunks(result_df, progress, should_cancel):
+            chunk.to_csv(f, index=False, header=start == 0)
+
+
+def write_parquet(result_df, output_path, progress=None, should_cancel=None):
+    """分块写入 Parquet 文件（需要 pyarrow）"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("导出 Parquet 文件需要安装 pyarrow") from None
+
+    schema = pa.Schema.from_pandas(result_df, preserve_index=False)
+    with pq.ParquetWriter(output_path, schema) as writer:
+        for _, chunk in _iter_chunks(result_df, progress, should_cancel):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_jsonl(result_df, output_path, progress=None, should_cancel=None):
+    """分块写入 JSON Lines 文件，中文不转义"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for _, chunk in _iter_chunks(result_df, progress, should_cancel):
+            if len(chunk):
+                lines = chunk.to_json(orient='records', lines=True, force_ascii=False, date_format='iso')
+                # 不同版本的 pandas 末尾不一定带换行
+                f.write(lines if lines.endswith('\n') else lines + '\n')
+
+
+_WRITERS = {
+    '.xlsx': write_xlsx,
+    '.csv': write_csv,
+    '.parquet': write_parquet,
+    '.jsonl': write_jsonl,
+}
+
+
+def export_table(result_df, output_path, progress=None, should_cancel=None):
+    """
+    按扩展名把结果写入文件。
+
+    参数:
+        result_df (pandas.DataFrame): 需要导出的结果。
+        output_path (str): 输出文件路径，扩展名决定格式。
+        progress (callable): 进度回调，参数为 (已写入行数, 总行数)。
+        should_cancel (callable): 返回 True 时中止导出并抛出 ExportCancelled。
+
+    返回:
+        str: 输出文件路径。不支持的格式抛出 ValueError。
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    writer = _WRITERS.get(extension)
+    if writer is None:
+        supported = "、".join(EXPORT_FORMATS)
+        raise ValueError(f"不支持的输出格式: '{extension}'，请使用 {supported}")
+
+    # 保留扩展名，部分写入器按扩展名判断格式
+    tmp_path = f"{output_path}.{os.getpid()}.tmp{extension}"
+    try:
+        writer(result_df, tmp_path, progress=progress, should_cancel=should_cancel)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return output_path
@@ -0,0 +1,105 @@
+"""
+多进程抽样模拟。
+
+用于公平性检查：在当前筛选条件下模拟大量次抽取，统计每位专家被抽中的次数，
+以确认每位专家的抽中概率一致。
+
+抽取任务按固定大小分片，分配到进程池中执行。每个分片使用
+SeedSequence.spawn 派生的独立 PCG64 随机流，因此同一个种子的结果与
+进程数无关。候选池通过共享内存传给子进程，不需要序列化 DataFrame；
+各分片的抽中次数在主进程中合并。
+"""
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import lottery_engine
+
+# 每个分片模拟的抽取次数
+DEFAULT_SHARD_DRAWS = 20000
+
+
+def _attach_shared_pool(name, length):
+    """在子进程中连接共享内存中的候选池"""
+    if sys.version_info >= (3, 13):
+        # 共享内存由主进程负责释放，子进程不需要登记
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        shm = shared_memory.SharedMemory(name=name)
+    pool = np.ndarray((length,), dtype=np.intp, buffer=shm.buf)
+    return shm, pool
+
+
+def _simulate_shard(shm_name, pool_length, roster_size, num_to_extract, num_draws, seed_sequence):
+    """子进程任务：在共享候选池上模拟 num_draws 次抽取，返回每行被抽中的次数"""
+    shm, pool = _attach_shared_pool(shm_name, pool_length)
+    try:
+        rng = np.random.Generator(np.random.PCG64(seed_sequence))
+        panels = lottery_engine.sample_batch(pool, num_to_extract, num_draws, random_state=rng)
+        return np.bincount(panels.ravel(), minlength=roster_size)
+    finally:
+        del pool
+        shm.close()
+
+
+def simulate_selection_counts(pool, num_to_extract, num_draws, roster_size,
+                              seed=None, workers=None, shard_draws=DEFAULT_SHARD_DRAWS):
+    """
+    并行模拟多次抽取，统计每位专家被抽中的次数。
+
+    参数:
+        pool (numpy.ndarray): 候选专家行位置。
+        num_to_extract (int): 每次抽取的专家数量。
+        num_draws (int): 模拟抽取的总次数。
+        roster_size (int): 名单总人数，决定返回数组的长度。
+        seed (int): 随机种子，None 时使用系统熵。
+        workers (int): 进程数，None 时使用 CPU 核数，1 时在当前进程中执行。
+        shard_draws (int): 每个分片的抽取次数。
+
+    返回:
+        numpy.ndarray: 长度为 roster_size 的数组，每个元素为该行被抽中的次数。
+    """
+    if num_draws <= 0:
+        raise ValueError("模拟次数必须大于 0")
+    if shard_draws <= 0:
+        raise ValueError("分片大小必须大于 0")
+
+    pool = np.ascontiguousarray(pool, dtype=np.intp)
+    if len(pool) == 0:
+        raise ValueError("候选池为空，无法模拟抽取")
+
+    shard_sizes = [shard_draws] * (num_draws // shard_draws)
+    if num_draws % shard_draws:
+        shard_sizes.append(num_draws % shard_draws)
+    seeds = np.random.SeedSequence(seed).spawn(len(shard_sizes))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(shard_sizes)))
+
+    counts = np.zeros(roster_size, dtype=np.int64)
+    if workers == 1:
+        for size, seed_sequence in zip(shard_sizes, seeds):
+            rng = np.random.Generator(np.random.PCG64(seed_sequence))
+            panels = lottery_engine.sample_batch(pool, num_to_extract, size, random_state=rng)
+            counts += np.bincount(panels.ravel(), minlength=roster_size)
+        return counts
+
+    shm = shared_memory.SharedMemory(create=True, size=pool.nbytes)
+    try:
+        np.ndarray(pool.shape, dtype=pool.dtype, buffer=shm.buf)[:] = pool
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_simulate_shard, shm.name, len(pool), roster_size,
+                                num_to_extract, size, seed_sequence)
+                for size, seed_sequence in zip(shard_sizes, seeds)
+            ]
+            for future in futures:
+                counts += future.result()
+    finally:
+        shm.close()
+        shm.unlink()
+    return counts
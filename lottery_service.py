@@ -0,0 +1,503 @@
+"""
+专家抽取服务。
+
+多个部门从同一份总名单抽取时，不必各自在桌面上打开并解析 xlsx：
+服务启动时加载一次名单并建立索引，之后常驻内存，抽取请求只做采样，
+不再解析 Excel，通常几毫秒内返回。名单文件变化后在下一次请求时自动增量更新。
+
+只使用标准库（http.server），每个请求在单独的线程中处理，可以同时响应多个请求：
+
+    python lottery_service.py serve experts_list.xlsx --port 8765
+    python lottery_service.py call roster
+    python lottery_service.py call draw '{"count": 5, "fields": ["材料"], "avoid_orgs": ["甲大学"]}'
+    python lottery_service.py call batch '{"count": 5, "panels": 100}'
+    python lottery_service.py call replay - < 抽奖结果.manifest.json
+
+接口（请求和响应均为 JSON）:
+    GET  /roster   名单概况
+    POST /draw     抽取一个专家组，{"count": 5} 或 {"quotas": {"材料": 3, "化工": 2}}
+    POST /batch    批量抽取多个专家组，{"count": 5, "panels": 100}
+    POST /replay   按抽取记录重新抽取并核对，请求体为抽取记录
+    POST /reload   重新加载名单
+
+draw 和 batch 还可以指定 fields、avoid_orgs、seed、weight（权重列名或公式）、
+cooldown_days（冷却天数）、constraints（组队规则，格式同抽取记录）和 record
+（是否写入抽中记录）。响应中包含抽取结果和抽取记录（manifest），
+抽取记录可以保存下来，之后用 replay 或 lottery_cli.py replay 核对。
+
+服务没有身份验证，默认只监听本机地址。
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import draw_manifest
+import lottery_cli
+import lottery_engine
+import panel_solver
+import roster_cache
+import roster_reader
+import selection_history
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 请求体大小上限（字节）
+MAX_REQUEST_BYTES = 16 << 20
+
+# 重新抽取时抽取记录必须包含的字段
+MANIFEST_KEYS = ('roster', 'filters', 'seed', 'mode')
+
+
+class RosterService:
+    """
+    常驻内存的名单和抽取逻辑，与 HTTP 无关，可以直接调用。
+
+    参数:
+        file_paths (list): 名单文件路径，多个文件合并为一份名单。
+        all_sheets (bool): 是否读取每个文件的所有工作表。
+        history_path (str): 抽中记录数据库路径，None 时使用默认路径。
+        use_cache (bool): 是否读写名单缓存。
+    """
+
+    def __init__(self, file_paths, all_sheets=False, history_path=None, use_cache=True):
+        self.file_paths = list(file_paths)
+        self.all_sheets = all_sheets
+        self.history_path = history_path
+        self.use_cache = use_cache
+        self.roster_index = None
+        self._stamps = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _file_stamps(self):
+        stamps = []
+        for file_path in self.file_paths:
+            stat = os.stat(file_path)
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        return stamps
+
+    def _load(self):
+        # 服务保留全部列，返回抽取结果时不再读取 Excel 文件
+        if len(self.file_paths) == 1 and not self.all_sheets:
+            return roster_cache.load_roster(self.file_paths[0], use_cache=self.use_cache)
+        sources = roster_reader.expand_sources(self.file_paths, all_sheets=self.all_sheets)
+        return roster_cache.load_roster_set(sources, use_cache=self.use_cache)
+
+    def reload(self, force=True):
+        """
+        重新加载名单。force 为 False 时只在名单文件变化后加载，并与当前名单比较增量更新索引。
+
+        返回:
+            bool: 是否重新加载了名单。
+        """
+        with self._lock:
+            stamps = self._file_stamps()
+            if not force and stamps == self._stamps:
+                return False
+            experts_df = self._load()
+            if self.roster_index is None or force:
+                roster_index = lottery_engine.RosterIndex(experts_df)
+            else:
+                roster_index = self.roster_index.updated(experts_df)
+            # 正在处理的请求继续使用旧索引，新请求使用新索引
+            self.roster_index = roster_index
+            self._stamps = stamps
+            return True
+
+    def current(self):
+        """返回当前的名单索引，名单文件变化时先更新"""
+        try:
+            self.reload(force=False)
+        except OSError:
+            # 名单文件正在被替换或写入时继续使用当前名单
+            pass
+        return self.roster_index
+
+    def summary(self):
+        """名单概况"""
+        return lottery_cli.roster_summary(self.current())
+
+    def _draw_parameters(self, roster_index, request):
+        """整理 draw、batch 请求中共用的筛选、冷却、权重和组队参数"""
+        fields = _string_list(request.get('fields'), 'fields')
+        avoid_orgs = roster_index.expand_orgs(_string_list(request.get('avoid_orgs'), 'avoid_orgs'))
+
+        cooldown_days = _number(request.get('cooldown_days') or 0, 'cooldown_days', float)
+        weight = request.get('weight') or None
+        excluded = weights = weight_variables = None
+        if weight:
+            weight_variables = {}
+        # 只有冷却期和引用抽中次数的权重公式需要打开抽中记录数据库
+        uses_history = bool(weight) and selection_history.HISTORY_COUNT_VARIABLE in weight
+        if cooldown_days > 0 or uses_history:
+            with selection_history.SelectionHistory(self.history_path) as history:
+                if cooldown_days > 0:
+                    excluded = history.exclusion_mask(roster_index, cooldown_days)
+                if uses_history:
+                    weight_variables = history.weight_variables(roster_index, weight)
+        if weight:
+            weights = lottery_engine.evaluate_weights(roster_index.experts_df, weight, weight_variables)
+
+        # 同一单位的不同写法按名单的单位分组合并计数
+        constraints = panel_solver.PanelConstraints.from_dict(request.get('constraints') or {})
+        constraints = constraints.with_org_groups(roster_index)
+        seed = request.get('seed')
+        seed = lottery_engine.new_seed() if seed is None else _number(seed, 'seed')
+        return {
+            'fields': fields, 'avoid_orgs': avoid_orgs, 'cooldown_days': cooldown_days,
+            'excluded': excluded, 'weight': weight, 'weights': weights,
+            'weight_variables': weight_variables, 'constraints': constraints, 'seed': seed,
+        }
+
+    def _record(self, request, details_df, params, roster_index):
+        if request.get('record'):
+            with selection_history.SelectionHistory(self.history_path) as history:
+                history.record(
+                    details_df, seed=params['seed'],
+                    roster_sha256=roster_index.experts_df.attrs.get('roster_sha256'), source='service',
+                )
+
+    def draw(self, request):
+        """
+        抽取一个专家组。
+
+        参数:
+            request (dict): 抽取参数，count 或 quotas 必须给出一个。
+
+        返回:
+            dict: experts（抽中的专家）、manifest（抽取记录）和 warnings（提示）。
+        """
+        roster_index = self.current()
+        quotas = request.get('quotas')
+        if isinstance(quotas, str):
+            quotas = lottery_engine.parse_quotas(quotas)
+        count = request.get('count')
+        if not quotas and count is None:
+            raise ValueError("请指定抽取人数 count 或领域配额 quotas")
+        if not quotas:
+            count = _number(count, 'count')
+        params = self._draw_parameters(roster_index, request)
+        constraints = params['constraints']
+        fields = list(quotas) if quotas else params['fields']
+
+        pool = roster_index.pool(fields=fields, avoid_orgs=params['avoid_orgs'], exclude=params['excluded'])
+        if params['weights'] is not None:
+            pool = pool[params['weights'][pool] > 0]
+        if len(pool) == 0:
+            raise ValueError("根据当前筛选条件，没有找到符合条件的专家")
+
+        warnings = []
+        if quotas and not constraints:
+            available = roster_index.count_by_field(pool)
+            warnings = [
+                f"{field}: 需要 {needed}，可用 {available.get(field, 0)}，将返回该领域的所有可用专家"
+                for field, needed in quotas.items()
+                if available.get(field, 0) < needed
+            ]
+        elif not quotas and count > len(pool) and not constraints:
+            warnings.append(f"要抽取的专家数量 ({count}) 大于可用专家总数 ({len(pool)})，将返回所有可用专家")
+        if quotas and constraints:
+            constraints = constraints.with_required(quotas)
+
+        mode = draw_manifest.MODE_QUOTA if quotas else draw_manifest.MODE_DRAW
+        selected = draw_manifest.draw_selection(
+            roster_index, params['seed'], mode=mode, count=count, quotas=quotas,
+            fields=params['fields'], avoid_orgs=params['avoid_orgs'], exclude=params['excluded'],
+            weights=params['weights'], constraints=constraints,
+        )
+        result_df = lottery_cli.selection_frame(roster_index.experts_df, selected)
+        manifest = draw_manifest.build_manifest(
+            roster_index.experts_df, selected, params['seed'], mode=mode,
+            fields=None if quotas else params['fields'], avoid_orgs=params['avoid_orgs'],
+            count=count, quotas=quotas, roster_path=self.file_paths[0],
+            cooldown_days=params['cooldown_days'], excluded=params['excluded'],
+            weight_expression=params['weight'], weights=params['weights'],
+            weight_variables=params['weight_variables'], constraints=constraints,
+        )
+        self._record(request, result_df, params, roster_index)
+        return {'experts': lottery_cli.frame_records(result_df), 'manifest': manifest, 'warnings': warnings}
+
+    def batch(self, request):
+        """
+        批量抽取多个专家组。
+
+        参数:
+            request (dict): 抽取参数，必须给出 count 和 panels。
+
+        返回:
+            dict: experts（带专家组编号的结果）、manifest（抽取记录）和 warnings（提示）。
+        """
+        roster_index = self.current()
+        if request.get('count') is None or request.get('panels') is None:
+            raise ValueError("请指定每组人数 count 和专家组数量 panels")
+        count, num_panels = _number(request['count'], 'count'), _number(request['panels'], 'panels')
+        params = self._draw_parameters(roster_index, request)
+
+        pool = roster_index.pool(
+            fields=params['fields'], avoid_orgs=params['avoid_orgs'], exclude=params['excluded']
+        )
+        available = len(pool)
+        if params['weights'] is not None:
+            available = lottery_engine.count_weighted(pool, params['weights'])
+        if available == 0:
+            raise ValueError("根据当前筛选条件，没有找到符合条件的专家")
+        warnings = []
+        if count > available and not params['constraints']:
+            warnings.append(f"每组抽取数量 ({count}) 大于可用专家总数 ({available})，每组将包含所有可用专家")
+
+        panels = draw_manifest.draw_selection(
+            roster_index, params['seed'], mode=draw_manifest.MODE_BATCH, count=count, num_panels=num_panels,
+            fields=params['fields'], avoid_orgs=params['avoid_orgs'], exclude=params['excluded'],
+            weights=params['weights'], constraints=params['constraints'],
+        )
+        result_df = lottery_cli.selection_frame(roster_index.experts_df, panels)
+        manifest = draw_manifest.build_manifest(
+            roster_index.experts_df, panels, params['seed'], mode=draw_manifest.MODE_BATCH,
+            fields=params['fields'], avoid_orgs=params['avoid_orgs'], count=count, num_panels=num_panels,
+            roster_path=self.file_paths[0], cooldown_days=params['cooldown_days'],
+            excluded=params['excluded'], weight_expression=params['weight'], weights=params['weights'],
+            weight_variables=params['weight_variables'], constraints=params['constraints'],
+        )
+        if request.get('record'):
+            # 同一位专家出现在多个专家组中时只记录一次
+            self._record(request, roster_index.experts_df.iloc[sorted(set(panels.ravel().tolist()))],
+                         params, roster_index)
+        return {'experts': lottery_cli.frame_records(result_df), 'manifest': manifest, 'warnings': warnings}
+
+    def replay(self, request):
+        """
+        按抽取记录重新抽取并核对。
+
+        参数:
+            request (dict): 抽取记录，或 {"manifest": 抽取记录}。
+
+        返回:
+            dict: verified（是否一致）、seed 和 mode。
+        """
+        manifest = _manifest(request.get('manifest', request))
+        verified = draw_manifest.verify(manifest, self.current())
+        return {'verified': verified, 'seed': manifest['seed'], 'mode': manifest['mode']}
+
+
+def _manifest(manifest):
+    """检查请求中的抽取记录，格式错误时抛出 ValueError"""
+    if not isinstance(manifest, dict):
+        raise ValueError("manifest 必须是 JSON 对象")
+    if manifest.get('version') != draw_manifest.MANIFEST_VERSION:
+        raise ValueError(f"不支持的抽取记录版本: {manifest.get('version')}")
+    missing = [key for key in MANIFEST_KEYS if key not in manifest]
+    if missing:
+        raise ValueError(f"抽取记录缺少字段: {', '.join(missing)}")
+    for key in ('roster', 'filters'):
+        if not isinstance(manifest[key], dict):
+            raise ValueError(f"抽取记录的 {key} 必须是 JSON 对象")
+    return manifest
+
+
+def _number(value, name, kind=int):
+    """把请求中的数字参数转为 int 或 float，格式错误时抛出 ValueError"""
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} 必须是{'整数' if kind is int else '数字'}: {value!r}") from None
+
+
+def _string_list(value, name):
+    """把请求中的字符串或字符串列表统一为列表"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{name} 必须是字符串或字符串列表")
+    return value
+
+
+class LotteryRequestHandler(BaseHTTPRequestHandler):
+    """把 HTTP 请求分派给 RosterService，返回 JSON"""
+
+    server_version = 'ExpertLottery/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            raise ValueError("请求内容过大")
+        if length == 0:
+            return {}
+        request = json.loads(self.rfile.read(length).decode('utf-8'))
+        if not isinstance(request, dict):
+            raise ValueError("请求内容必须是 JSON 对象")
+        return request
+
+    def _dispatch(self, routes):
+        service = self.server.service
+        handler = routes.get(self.path.split('?', 1)[0].rstrip('/') or '/')
+        if handler is None:
+            self._send_json(404, {'error': f"未知的接口: {self.path}"})
+            return
+        started = time.perf_counter()
+        try:
+            result = handler(service, self._read_json() if self.command == 'POST' else {})
+        except json.JSONDecodeError as e:
+            self._send_json(400, {'error': f"请求内容不是有效的 JSON: {e}"})
+        except (ValueError, TypeError, KeyError) as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': f"处理请求时发生错误: {e}"})
+        else:
+            result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            self._send_json(200, result)
+
+    def do_GET(self):
+        self._dispatch({
+            '/roster': lambda service, request: service.summary(),
+        })
+
+    def do_POST(self):
+        self._dispatch({
+            '/draw': RosterService.draw,
+            '/batch': RosterService.batch,
+            '/replay': RosterService.replay,
+            '/reload': lambda service, request: {'reloaded': service.reload(), **service.summary()},
+        })
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=False):
+    """
+    创建抽取服务的 HTTP 服务器，调用 serve_forever() 开始处理请求。
+
+    参数:
+        service (RosterService): 已加载名单的抽取服务。
+        host (str): 监听地址。
+        port (int): 监听端口，0 表示由系统分配。
+        verbose (bool): 是否输出每个请求的访问日志。
+
+    返回:
+        http.server.ThreadingHTTPServer: HTTP 服务器。
+    """
+    server = ThreadingHTTPServer((host, port), LotteryRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def call(endpoint, payload=None, url=None, timeout=60):
+    """
+    调用抽取服务。
+
+    参数:
+        endpoint (str): 接口名称，例如 'draw'、'batch'、'replay'、'roster'。
+        payload (dict): 请求内容；None 时发送 GET 请求。
+        url (str): 服务地址，默认 http://127.0.0.1:8765。
+        timeout (float): 超时时间（秒）。
+
+    返回:
+        dict: 服务返回的 JSON。服务返回错误时抛出 ValueError。
+    """
+    url = (url or f"http://{DEFAULT_HOST}:{DEFAULT_PORT}").rstrip('/') + '/' + endpoint.strip('/')
+    data = None
+    headers = {}
+    if payload is not None:
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers['Content-Type'] = 'application/json; charset=utf-8'
+    request = urllib.request.Request(url, data=data, headers=headers, method='GET' if data is None else 'POST')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        try:
+            error = json.loads(e.read().decode('utf-8')).get('error')
+        except ValueError:
+            error = None
+        raise ValueError(error or f"服务返回错误: {e.code} {e.reason}") from None
+
+
+def command_serve(args):
+    started = time.perf_counter()
+    service = RosterService(
+        args.roster, all_sheets=args.all_sheets, history_path=args.history, use_cache=not args.no_cache,
+    )
+    server = make_server(service, args.host, args.port, verbose=args.verbose)
+    host, port = server.server_address[:2]
+    print(f"已加载 {service.roster_index.size} 位专家（{time.perf_counter() - started:.1f} 秒），"
+          f"抽取服务地址 http://{host}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def command_call(args):
+    payload = None
+    if args.payload == '-':
+        payload = json.load(sys.stdin)
+    elif args.payload is not None:
+        payload = json.loads(args.payload)
+    elif args.endpoint not in ('roster',):
+        payload = {}
+    lottery_cli.emit_json(call(args.endpoint, payload, url=args.url, timeout=args.timeout))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='lottery_service', description="专家抽取服务")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help="加载名单并启动抽取服务")
+    serve.add_argument('roster', nargs='+', help="专家名单 Excel 文件路径，可指定多个")
+    serve.add_argument('--all-sheets', action='store_true', help="读取每个文件的所有工作表")
+    serve.add_argument('--no-cache', action='store_true', help="不读写名单缓存")
+    serve.add_argument('--host', default=DEFAULT_HOST, help=f"监听地址，默认 {DEFAULT_HOST}")
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"监听端口，默认 {DEFAULT_PORT}")
+    serve.add_argument('--history', default=None, metavar='路径', help="抽中记录数据库路径")
+    serve.add_argument('--verbose', action='store_true', help="输出每个请求的访问日志")
+    serve.set_defaults(handler=command_serve)
+
+    client = subparsers.add_parser('call', help="调用抽取服务并输出返回的 JSON")
+    client.add_argument('endpoint', choices=('roster', 'draw', 'batch', 'replay', 'reload'), help="接口名称")
+    client.add_argument('payload', nargs='?', default=None, help="请求内容（JSON），\"-\" 表示从标准输入读取")
+    client.add_argument('--url', default=None, help=f"服务地址，默认 http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+    client.add_argument('--timeout', type=float, default=60, help="超时时间（秒）")
+    client.set_defaults(handler=command_call)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except FileNotFoundError as e:
+        print(f"错误：文件 '{e.filename or e}' 未找到。请检查文件路径是否正确。", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""
+单位名称归一化和别名索引。
+
+同一个单位在名单中常有多种写法："清华大学"、"清华大学 材料学院"、
+"清华大学（材料学院）"、"Tsinghua University"。回避单位时这些写法应视为同一单位。
+加载名单时为所有单位建立一次索引，把每种写法归入一个规范单位：
+
+    1. 归一化：全角转半角、英文转小写、去掉空白和标点；
+    2. 别名表：归一化后的写法在别名表中时，归入对应的规范名称；
+    3. 上级单位：写法以名单中另一个单位开头，且剩余部分用分隔符隔开或以
+       学院、研究所、实验室等下属机构名称结尾（"清华大学材料学院"），或者
+       括号中是名单中的另一个单位（"材料学院（清华大学）"），归入该单位。
+
+"中国科学院大学" 不会归入 "中国科学院"：剩余的 "大学" 不是下属机构。
+
+别名表是 UTF-8 CSV 文件，每行第一列为规范名称，其余各列为别名，# 开头的行为注释：
+
+    清华大学,Tsinghua University,THU
+    中国科学院,Chinese Academy of Sciences,CAS
+
+默认读取 ~/.expert_lottery/org_aliases.csv，可用环境变量 EXPERT_LOTTERY_ORG_ALIASES 修改，
+文件不存在时不使用别名。
+
+回避时按规范单位展开为名单中的所有写法（OrgIndex.expand），
+筛选仍然是一次分类代码查找，抽取记录中保存展开后的写法，重放结果与别名表无关。
+"""
+import csv
+import os
+import re
+import unicodedata
+
+ORG_ALIASES_ENV = 'EXPERT_LOTTERY_ORG_ALIASES'
+DEFAULT_ORG_ALIASES = os.path.join(os.path.expanduser('~'), '.expert_lottery', 'org_aliases.csv')
+
+# 单位名称中的分隔符和标点（归一化后）
+_SEPARATORS = re.compile(r"[\s,.;:!?'\"`~@#$%^&*+=|\\/<>()\[\]{}\-_·、，。；：！？‘’“”（）【】《》〈〉「」『』—…]+")
+
+# 下属机构名称的结尾，用于判断 "上级单位 + 下属机构" 的写法
+SUBUNIT_SUFFIXES = (
+    '学院', '书院', '学部', '系', '研究院', '研究所', '研究中心', '所', '实验室', '重点实验室',
+    '中心', '课题组', '研究室', '教研室', '室', '部', '处', '科', '分院', '分所', '分公司',
+    '附属医院', '医院', '校区',
+    'school', 'college', 'department', 'dept', 'faculty', 'institute', 'laboratory', 'lab',
+    'center', 'centre', 'division', 'branch', 'campus', 'hospital',
+)
+
+# 作为上级单位的最短归一化长度，避免单个字符误匹配
+MIN_PARENT_LENGTH = 2
+
+_alias_cache = {}
+
+
+def normalize_org(name):
+    """把单位名称归一化为比较用的键：全角转半角、英文转小写、去掉空白和标点"""
+    return ''.join(_org_parts(name))
+
+
+def _org_parts(name):
+    """按分隔符和括号把单位名称拆成归一化后的几段"""
+    text = unicodedata.normalize('NFKC', str(name)).casefold()
+    return [part for part in _SEPARATORS.split(text) if part]
+
+
+def org_aliases_path():
+    """别名表路径，可用环境变量 EXPERT_LOTTERY_ORG_ALIASES 修改"""
+    return os.environ.get(ORG_ALIASES_ENV) or DEFAULT_ORG_ALIASES
+
+
+def read_aliases(path):
+    """
+    读取别名表。
+
+    参数:
+        path (str): CSV 文件路径。
+
+    返回:
+        dict: 归一化后的写法 -> 规范名称，规范名称本身也在其中。
+    """
+    aliases = {}
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.reader(f))
+    except UnicodeDecodeError:
+        raise ValueError(f"单位别名表 '{path}' 不是 UTF-8 编码") from None
+    for line_number, row in enumerate(rows, 1):
+        names = [name.strip() for name in row if name.strip()]
+        if not names or names[0].startswith('#'):
+            continue
+        canonical = names[0]
+        for name in names:
+            key = normalize_org(name)
+            if not key:
+                continue
+            if aliases.get(key, canonical) != canonical:
+                raise ValueError(
+                    f"单位别名表第 {line_number} 行: '{name}' 已经是 '{aliases[key]}' 的别名"
+                )
+            aliases[key] = canonical
+    return aliases
+
+
+def load_aliases(path=None):
+    """
+    读取默认位置（或 path）的别名表，文件不存在时返回空表。
+
+    按文件修改时间缓存，名单重新加载时不会重复读取没有变化的别名表。
+    """
+    path = path or org_aliases_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    cached = _alias_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, read_aliases(path))
+        _alias_cache[path] = cached
+    return cached[1]
+
+
+def _is_subunit(remainder):
+    return remainder.endswith(SUBUNIT_SUFFIXES)
+
+
+class OrgIndex:
+    """
+    单位写法 -> 规范单位的索引。
+
+    参数:
+        organizations (list): 名单中的单位写法，通常为 RosterIndex.organizations。
+        aliases (dict): 别名表（read_aliases 的返回值），None 表示不使用别名。
+
+    属性:
+        canonical (list): 规范单位名称，按第一次出现的顺序排列。
+        group_of (list): 每种写法对应的规范单位在 canonical 中的下标。
+        members (dict): 规范单位 -> 名单中属于它的写法。
+    """
+
+    def __init__(self, organizations, aliases=None):
+        self.organizations = list(organizations)
+        self.aliases = aliases or {}
+        self._keys = [normalize_org(name) for name in self.organizations]
+        self._key_lookup = {}
+        for name, key in zip(self.organizations, self._keys):
+            self._key_lookup.setdefault(key, name)
+
+        self.canonical = []
+        self.group_of = []
+        self.members = {}
+        self._group_lookup = {}
+        self._canonical_lookup = {}
+        self._root_cache = {}
+        for name, key in zip(self.organizations, self._keys):
+            self._assign(name, key)
+        self._raw_lookup = {name: code for code, name in enumerate(self.organizations)}
+
+    def _assign(self, name, key):
+        """把一种写法归入规范单位，需要时新建规范单位"""
+        root = self._root(key, _org_parts(name)) or (key, name)
+        group = self._group_lookup.get(root[0])
+        if group is None:
+            group = self._group_lookup[root[0]] = len(self.canonical)
+            self.canonical.append(root[1])
+            self.members[root[1]] = []
+            self._canonical_lookup[root[1]] = group
+        self.group_of.append(group)
+        self.members[self.canonical[group]].append(name)
+
+    def extended(self, organizations):
+        """
+        返回在末尾追加了新写法的索引，结果与用全部写法新建的索引相同。
+
+        只处理新写法，已有写法的归属直接复用。新写法可能是已有写法的上级单位
+        （例如已有 "清华大学材料学院" 时新增 "清华大学"）时返回 None，由调用方重新建立索引。
+
+        参数:
+            organizations (iterable): 新写法，已在索引中的写法会被忽略。
+
+        返回:
+            OrgIndex: 新索引；无法增量更新时返回 None。
+        """
+        names = [name for name in dict.fromkeys(organizations) if name not in self._raw_lookup]
+        keys = [normalize_org(name) for name in names]
+        for key in keys:
+            # 新出现的键可能成为包含它的已有写法的上级单位
+            if len(key) >= MIN_PARENT_LENGTH and not self._known(key) \
+                    and any(key in existing for existing in self._keys):
+                return None
+
+        index = OrgIndex.__new__(OrgIndex)
+        index.aliases = self.aliases
+        index.organizations = self.organizations + names
+        index._keys = self._keys + keys
+        index._key_lookup = dict(self._key_lookup)
+        for name, key in zip(names, keys):
+            index._key_lookup.setdefault(key, name)
+        index.canonical = list(self.canonical)
+        index.group_of = list(self.group_of)
+        index.members = {canonical: list(members) for canonical, members in self.members.items()}
+        index._group_lookup = dict(self._group_lookup)
+        index._canonical_lookup = dict(self._canonical_lookup)
+        # resolve 缓存的名单以外写法可能受新写法影响，只保留名单中已有写法的结果
+        index._root_cache = {key: root for key, root in self._root_cache.items() if key in self._key_lookup}
+        for name, key in zip(names, keys):
+            index._assign(name, key)
+        index._raw_lookup = dict(self._raw_lookup)
+        for code, name in enumerate(names, len(self.organizations)):
+            index._raw_lookup[name] = code
+        return index
+
+    def _known(self, key):
+        return len(key) >= MIN_PARENT_LENGTH and (key in self.aliases or key in self._key_lookup)
+
+    def _parent(self, key, parts):
+        """返回上级单位的归一化键，没有时返回 None"""
+        # 分隔符之前的部分：清华大学 材料学院、清华大学-材料学院
+        prefix = ''
+        for part in parts[:-1]:
+            prefix += part
+            if self._known(prefix):
+                return prefix
+        # 括号或分隔符隔开的某一段：材料学院（清华大学）
+        if len(parts) > 1:
+            for part in parts:
+                if part != key and self._known(part):
+                    return part
+        # 直接相连的下属机构：清华大学材料学院
+        for end in range(MIN_PARENT_LENGTH, len(key)):
+            if _is_subunit(key[end:]) and self._known(key[:end]):
+                return key[:end]
+        return None
+
+    def _root(self, key, parts):
+        """
+        返回写法所属规范单位的 (归一化键, 名称)；不属于别名表或其他单位时返回 None。
+        """
+        if key in self._root_cache:
+            return self._root_cache[key]
+        root = None
+        if key in self.aliases:
+            canonical = self.aliases[key]
+            root = (normalize_org(canonical), canonical)
+        else:
+            parent = self._parent(key, parts)
+            if parent is not None:
+                name = self._key_lookup.get(parent, parent)
+                root = self._root(parent, _org_parts(name)) or (parent, name)
+        self._root_cache[key] = root
+        return root
+
+    def resolve(self, name):
+        """
+        返回任意写法（名单中的写法、规范名称、别名或它们的其他写法）对应的规范单位。
+
+        返回:
+            str: 规范单位名称；不属于名单中任何单位时返回 None。
+        """
+        code = self._raw_lookup.get(name)
+        if code is not None:
+            return self.canonical[self.group_of[code]]
+        if name in self._canonical_lookup:
+            return name
+        key = normalize_org(name)
+        root = self._root(key, _org_parts(name)) or (key, name)
+        group = self._group_lookup.get(root[0])
+        return None if group is None else self.canonical[group]
+
+    def expand(self, names):
+        """
+        把单位列表展开为名单中属于同一规范单位的所有写法。
+
+        不属于名单中任何单位的名称原样保留。
+
+        参数:
+            names (iterable): 单位写法、规范名称或别名。
+
+        返回:
+            list: 展开后的写法，按规范单位分组，名单中没有的名称排在最后。
+        """
+        groups = set()
+        unknown = []
+        for name in names:
+            canonical = self.resolve(name)
+            if canonical is None:
+                unknown.append(name)
+            else:
+                groups.add(self._canonical_lookup[canonical])
+        expanded = []
+        for group in sorted(groups):
+            expanded.extend(self.members[self.canonical[group]])
+        return expanded + list(dict.fromkeys(unknown))
@@ -0,0 +1,476 @@
+"""
+按组队规则直接抽出合格的专家组。
+
+支持的规则（PanelConstraints）：
+    - 每个单位最多若干人，同一单位的不同写法（见 org_alias）合并计数；
+    - 必须覆盖的研究领域，每个领域至少若干人；
+    - 高级职称（职称列）至少若干人。
+
+抽取时按随机顺序（加权抽取时为 Efraimidis–Spirakis 键的顺序）逐个考察候选，
+只有加入后剩余名额仍能满足全部规则的候选才会被选中，因此一次就能得到
+合格的专家组，不需要反复重抽。规则无法同时满足时立即抛出
+InfeasibleConstraints 并说明原因。
+
+"剩余名额能否满足规则"是一个精确判断：把候选按 单位 × 领域 × 是否高级职称
+汇总后建成最小费用流网络（单位容量为每单位人数上限，领域边带有最少人数的需求），
+以流量为剩余名额求最小费用流，看能否同时满足领域需求和高级职称人数。
+容量相同、各类人数也相同的单位合并为一个节点，网络规模通常只有几百个节点，
+与名单行数无关。
+
+注意：逐个接受的构造方式保证结果合格且同一种子可以复现，但在规则很紧时
+各个合格专家组被抽中的概率并不完全相同。
+"""
+from collections import deque
+
+import numpy as np
+
+import lottery_engine
+from lottery_engine import TITLE_COLUMN
+
+# 视为高级职称的取值
+SENIOR_TITLES = (
+    '正高', '正高级', '教授', '研究员', '主任医师', '主任药师', '主任护师', '主任技师',
+    '正高级工程师', '教授级高级工程师', '正高级经济师', '正高级会计师',
+)
+
+
+class InfeasibleConstraints(ValueError):
+    """组队规则无法同时满足"""
+
+
+class PanelConstraints:
+    """
+    专家组的组队规则。
+
+    参数:
+        max_per_org (int): 每个单位最多抽取的人数，None 或 0 表示不限。
+        required_fields (dict | list): 必须覆盖的研究领域 -> 最少人数；
+            给出列表时每个领域至少 1 人。
+        min_senior (int): 高级职称最少人数。
+        senior_titles (list): 视为高级职称的职称取值。
+        org_groups (dict): 计算单位人数上限时合并计数的单位写法，规范单位 -> 名单中的写法；
+            未列出的写法各自单独计数。None 表示使用名单索引当前的单位分组。
+            抽取前用 with_org_groups 固定下来，随抽取记录保存，重新抽取时不受别名表变化影响。
+    """
+
+    def __init__(self, max_per_org=None, required_fields=None, min_senior=0, senior_titles=SENIOR_TITLES,
+                 org_groups=None):
+        self.max_per_org = max_per_org or None
+        if isinstance(required_fields, dict):
+            self.required_fields = {field: int(count) for field, count in required_fields.items()}
+        else:
+            self.required_fields = {field: 1 for field in (required_fields or [])}
+        self.min_senior = int(min_senior or 0)
+        self.senior_titles = tuple(senior_titles)
+        self.org_groups = None if org_groups is None else {
+            canonical: list(members) for canonical, members in org_groups.items()
+        }
+        if self.max_per_org is not None and self.max_per_org < 0:
+            raise ValueError("每个单位的人数上限不能为负数")
+        if any(count <= 0 for count in self.required_fields.values()):
+            raise ValueError("必须覆盖的领域人数必须大于 0")
+        if self.min_senior < 0:
+            raise ValueError("高级职称人数不能为负数")
+
+    def __bool__(self):
+        return bool(self.max_per_org or self.required_fields or self.min_senior)
+
+    def with_required(self, quotas):
+        """返回加入领域配额（作为最少人数）后的规则"""
+        required = dict(self.required_fields)
+        for field, count in quotas.items():
+            required[field] = max(required.get(field, 0), count)
+        return PanelConstraints(self.max_per_org, required, self.min_senior, self.senior_titles, self.org_groups)
+
+    def with_org_groups(self, roster_index):
+        """
+        返回按名单索引的单位分组（RosterIndex.org_index）固定单位人数上限计数方式的规则。
+
+        只保存有多种写法的单位；不限单位人数时不需要分组。
+        """
+        org_groups = {}
+        if self.max_per_org and roster_index.org_codes is not None:
+            org_groups = {
+                canonical: list(members)
+                for canonical, members in roster_index.org_index.members.items() if len(members) > 1
+            }
+        return PanelConstraints(
+            self.max_per_org, self.required_fields, self.min_senior, self.senior_titles, org_groups,
+        )
+
+    def describe(self):
+        """返回规则的简短说明"""
+        parts = []
+        if self.max_per_org:
+            parts.append(f"每单位≤{self.max_per_org}")
+        if self.required_fields:
+            parts.append("覆盖" + ",".join(
+                field if count == 1 else f"{field}{count}" for field, count in self.required_fields.items()
+            ))
+        if self.min_senior:
+            parts.append(f"高级职称≥{self.min_senior}")
+        return ";".join(parts)
+
+    def to_dict(self):
+        data = {
+            'max_per_org': self.max_per_org,
+            'required_fields': dict(self.required_fields),
+            'min_senior': self.min_senior,
+            'senior_titles': list(self.senior_titles),
+        }
+        if self.max_per_org and self.org_groups is not None:
+            data['org_groups'] = {canonical: list(members) for canonical, members in self.org_groups.items()}
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        从 to_dict 的结果还原规则。
+
+        限制了单位人数但没有 org_groups 的记录来自合并单位写法之前的版本，
+        当时按单位的原始写法计数，还原为不合并任何写法，保证重新抽取的结果不变。
+        """
+        org_groups = data.get('org_groups')
+        if org_groups is None and data.get('max_per_org'):
+            org_groups = {}
+        return cls(
+            data.get('max_per_org'), data.get('required_fields'), data.get('min_senior', 0),
+            data.get('senior_titles', SENIOR_TITLES), org_groups,
+        )
+
+
+def parse_required_fields(text):
+    """
+    解析必须覆盖的领域，例如 "材料, 化工:2"；不写人数时为 1 人。
+
+    返回:
+        dict: 研究领域 -> 最少人数。格式错误时抛出 ValueError。
+    """
+    normalized = text.replace('：', ':').replace('，', ',').replace('；', ',').replace(';', ',')
+    parts = [part.strip() for part in normalized.replace('\n', ',').split(',') if part.strip()]
+    return lottery_engine.parse_quotas(",".join(part if ':' in part else f"{part}:1" for part in parts))
+
+
+def senior_mask(experts_df, senior_titles=SENIOR_TITLES):
+    """返回职称属于高级职称的行掩码；名单中没有职称列时抛出 ValueError"""
+    if TITLE_COLUMN not in experts_df.columns:
+        raise ValueError(f"名单中没有 '{TITLE_COLUMN}' 列，无法按高级职称组队")
+    return experts_df[TITLE_COLUMN].isin(senior_titles).to_numpy()
+
+
+def _min_cost_flow(num_nodes, edges, source, sink, max_flow):
+    """
+    逐次最短路（SPFA）求最小费用流。
+
+    参数:
+        edges (list): (起点, 终点, 容量, 费用) 列表。
+
+    返回:
+        tuple: (流量, 每条边的流量列表)。
+    """
+    graph = [[] for _ in range(num_nodes)]
+    targets = []
+    capacities = []
+    costs = []
+    for start, end, capacity, cost in edges:
+        graph[start].append(len(targets))
+        targets.append(end)
+        capacities.append(capacity)
+        costs.append(cost)
+        graph[end].append(len(targets))
+        targets.append(start)
+        capacities.append(0)
+        costs.append(-cost)
+
+    flow = 0
+    while flow < max_flow:
+        distance = [float('inf')] * num_nodes
+        previous_edge = [-1] * num_nodes
+        in_queue = [False] * num_nodes
+        distance[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            in_queue[node] = False
+            for edge in graph[node]:
+                if capacities[edge] <= 0:
+                    continue
+                target = targets[edge]
+                candidate = distance[node] + costs[edge]
+                if candidate < distance[target]:
+                    distance[target] = candidate
+                    previous_edge[target] = edge
+                    if not in_queue[target]:
+                        in_queue[target] = True
+                        queue.append(target)
+        if distance[sink] == float('inf'):
+            break
+
+        push = max_flow - flow
+        node = sink
+        while node != source:
+            edge = previous_edge[node]
+            push = min(push, capacities[edge])
+            node = targets[edge ^ 1]
+        node = sink
+        while node != source:
+            edge = previous_edge[node]
+            capacities[edge] -= push
+            capacities[edge ^ 1] += push
+            node = targets[edge ^ 1]
+        flow += push
+
+    return flow, [capacities[2 * position + 1] for position in range(len(edges))]
+
+
+def org_group_codes(roster_index, constraints):
+    """
+    返回计算单位人数上限时每种单位写法所属的单位组。
+
+    返回:
+        tuple: (group_of_code, num_groups)。group_of_code 按 roster_index.org_codes 取值，
+        末尾一项对应单位缺失 (-1)，值为 -1 表示不受单位人数上限限制。
+    """
+    if constraints.org_groups is None:
+        return roster_index._org_group_of_code, len(roster_index.org_index.canonical)
+    num_orgs = len(roster_index.organizations)
+    group_of_code = np.arange(num_orgs + 1, dtype=np.intp)
+    group_of_code[-1] = -1
+    for members in constraints.org_groups.values():
+        codes = [roster_index._org_lookup[member] for member in members if member in roster_index._org_lookup]
+        group_of_code[codes] = min(codes, default=-1)
+    return group_of_code, num_orgs
+
+
+class _PanelState:
+    """
+    构造专家组时的剩余状态：各单位 × 类别的可选人数、各单位剩余名额、
+    尚未满足的领域人数和高级职称人数。
+
+    类别 = 领域组 * 2 + 是否高级职称；必须覆盖的领域各占一个领域组，其余领域合为最后一组。
+    """
+
+    def __init__(self, org_codes, classes, num_orgs, num_groups, max_per_org, size, demands, min_senior):
+        self.num_classes = num_groups * 2
+        self.num_groups = num_groups
+        self.counts = np.bincount(
+            org_codes * self.num_classes + classes, minlength=(num_orgs + 1) * self.num_classes
+        ).reshape(num_orgs + 1, self.num_classes)
+        # 最后一行是单位缺失的专家，不受单位人数上限限制
+        self.remaining = np.full(num_orgs + 1, max_per_org, dtype=np.int64)
+        self.remaining[-1] = size
+        self.demands = np.asarray(demands, dtype=np.int64)
+        self.senior_needed = min_senior
+        self.slots = size
+
+    def take(self, org, cls, sign=1):
+        """选中（sign=1）或撤销选中（sign=-1）一位专家"""
+        self.counts[org, cls] -= sign
+        if org != len(self.remaining) - 1:
+            self.remaining[org] -= sign
+        group, senior = divmod(cls, 2)
+        if group < len(self.demands):
+            self.demands[group] -= sign
+        self.senior_needed -= sign * senior
+        self.slots -= sign
+
+    def quick_check(self):
+        """只看人数的必要条件，不满足时一定无解"""
+        unmet = np.maximum(self.demands, 0).sum()
+        return unmet <= self.slots and max(self.senior_needed, 0) <= self.slots
+
+    def feasible(self):
+        """精确判断剩余名额能否满足全部规则"""
+        if self.slots == 0:
+            return (self.demands <= 0).all() and self.senior_needed <= 0
+        if not self.quick_check():
+            return False
+
+        capped = np.minimum(self.counts, np.maximum(self.remaining, 0)[:, None])
+        active = capped.any(axis=1)
+        profiles = np.column_stack([capped[active], self.remaining[active]])
+        if len(profiles) == 0:
+            return False
+        # 人数上限和各类人数都相同的单位可以合并为一个节点
+        profiles, multiplicity = np.unique(profiles, axis=0, return_counts=True)
+
+        num_profiles = len(profiles)
+        source, sink = 0, 1
+        first_profile = 2
+        first_group = first_profile + num_profiles
+        num_nodes = first_group + self.num_groups
+        big = self.slots + 1
+
+        edges = []
+        senior_edges = []
+        demand_edges = []
+        for position, (profile, count) in enumerate(zip(profiles.tolist(), multiplicity.tolist())):
+            node = first_profile + position
+            edges.append((source, node, profile[-1] * count, 0))
+            for cls in range(self.num_classes):
+                if profile[cls]:
+                    group, senior = divmod(cls, 2)
+                    if senior:
+                        senior_edges.append(len(edges))
+                    edges.append((node, first_group + group, profile[cls] * count, -senior))
+        for group in range(self.num_groups):
+            node = first_group + group
+            if group < len(self.demands) and self.demands[group] > 0:
+                demand_edges.append(len(edges))
+                edges.append((node, sink, int(self.demands[group]), -big))
+            edges.append((node, sink, self.slots, 0))
+
+        flow, edge_flows = _min_cost_flow(num_nodes, edges, source, sink, self.slots)
+        if flow < self.slots:
+            return False
+        met = sum(edge_flows[edge] for edge in demand_edges)
+        seniors = sum(edge_flows[edge] for edge in senior_edges)
+        return met == int(np.maximum(self.demands, 0).sum()) and seniors >= self.senior_needed
+
+
+def _diagnose(roster_index, pool, size, constraints, seniors, max_per_org):
+    """找出规则无法满足的具体原因"""
+    if roster_index.org_codes is not None:
+        group_of_code, _ = org_group_codes(roster_index, constraints)
+        org_codes = group_of_code[roster_index.org_codes[pool]]
+    else:
+        org_codes = np.full(len(pool), -1)
+
+    def capacity(rows_mask):
+        """在每单位人数上限下，满足条件的候选最多能选出多少人"""
+        codes = org_codes[rows_mask]
+        missing = int(np.count_nonzero(codes < 0))
+        per_org = np.bincount(codes[codes >= 0]) if np.any(codes >= 0) else np.zeros(0, dtype=np.int64)
+        return int(np.minimum(per_org, max_per_org).sum()) + missing
+
+    everyone = np.ones(len(pool), dtype=bool)
+    if len(pool) < size:
+        return f"候选专家只有 {len(pool)} 位，不足 {size} 位"
+    if capacity(everyone) < size:
+        return (f"候选专家来自的单位太少：每个单位最多 {max_per_org} 位时，"
+                f"最多只能组成 {capacity(everyone)} 人的专家组")
+
+    required_total = sum(constraints.required_fields.values())
+    if required_total > size:
+        return f"必须覆盖的领域合计至少 {required_total} 人，超过专家组人数 {size}"
+    for field, count in constraints.required_fields.items():
+        in_field = roster_index.field_codes[pool] == roster_index._field_lookup.get(field, -2) \
+            if roster_index.field_codes is not None else np.zeros(len(pool), dtype=bool)
+        available = int(in_field.sum())
+        if available < count:
+            return f"领域 '{field}' 需要至少 {count} 位，候选中只有 {available} 位"
+        if capacity(in_field) < count:
+            return f"领域 '{field}' 的候选集中在少数单位，每个单位最多 {max_per_org} 位时无法凑足 {count} 位"
+
+    if constraints.min_senior:
+        if constraints.min_senior > size:
+            return f"高级职称至少 {constraints.min_senior} 位，超过专家组人数 {size}"
+        available = int(seniors.sum())
+        if available < constraints.min_senior:
+            return f"高级职称需要至少 {constraints.min_senior} 位，候选中只有 {available} 位"
+        if capacity(seniors) < constraints.min_senior:
+            return (f"高级职称的候选集中在少数单位，每个单位最多 {max_per_org} 位时"
+                    f"无法凑足 {constraints.min_senior} 位")
+
+    return "各项规则单独都能满足，但无法同时满足（例如高级职称都不在必须覆盖的领域中，且名额不够）"
+
+
+def solve_panel(roster_index, pool, size, constraints, random_state=None, weights=None):
+    """
+    随机抽取一个满足组队规则的专家组。
+
+    参数:
+        roster_index (lottery_engine.RosterIndex): 名单索引。
+        pool (numpy.ndarray): 候选专家行位置（已按研究领域、回避单位、冷却期筛选）。
+        size (int): 专家组人数。
+        constraints (PanelConstraints): 组队规则。
+        random_state (int | numpy.random.Generator): 随机种子或生成器。
+        weights (numpy.ndarray): 长度为名单行数的权重，None 表示等概率。
+
+    返回:
+        numpy.ndarray: 被抽中的专家行位置，按抽中顺序排列。
+        规则无法满足时抛出 InfeasibleConstraints。
+    """
+    if size <= 0:
+        raise ValueError("抽取的专家数量必须大于 0")
+
+    pool = np.asarray(pool, dtype=np.intp)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+        pool = pool[weights[pool] > 0]
+
+    seniors = senior_mask(roster_index.experts_df, constraints.senior_titles)[pool] \
+        if constraints.min_senior else np.zeros(len(pool), dtype=bool)
+    max_per_org = constraints.max_per_org or size
+
+    if constraints.max_per_org and roster_index.org_codes is not None:
+        # 同一单位的不同写法合并为一个单位组
+        group_of_code, num_orgs = org_group_codes(roster_index, constraints)
+        org_codes = group_of_code[roster_index.org_codes[pool]].astype(np.int64)
+    else:
+        org_codes = np.zeros(len(pool), dtype=np.int64)
+        num_orgs = 1
+    # 单位缺失的专家放在最后一行
+    org_codes = np.where(org_codes < 0, num_orgs, org_codes)
+
+    required = list(constraints.required_fields)
+    group_of_code = np.full(len(roster_index.fields) + 1, len(required), dtype=np.int64)
+    for group, field in enumerate(required):
+        code = roster_index._field_lookup.get(field)
+        if code is not None:
+            group_of_code[code] = group
+    if required and roster_index.field_codes is None:
+        raise ValueError(f"名单中没有 '{lottery_engine.FIELD_COLUMN}' 列，无法按领域组队")
+    field_codes = roster_index.field_codes[pool] if roster_index.field_codes is not None \
+        else np.full(len(pool), -1)
+    classes = group_of_code[field_codes] * 2 + seniors.astype(np.int64)
+
+    state = _PanelState(
+        org_codes, classes, num_orgs, len(required) + 1, max_per_org, size,
+        [constraints.required_fields[field] for field in required], constraints.min_senior,
+    )
+    if not state.feasible():
+        raise InfeasibleConstraints(
+            "无法组成满足规则的专家组：" + _diagnose(roster_index, pool, size, constraints, seniors, max_per_org)
+        )
+
+    rng = lottery_engine._random_state(random_state)
+    if weights is None:
+        order = rng.permutation(len(pool))
+    else:
+        order = np.argsort(lottery_engine._weighted_keys(rng, weights[pool]), kind='stable')
+
+    chosen = []
+    rejected = set()
+    for position in order.tolist():
+        org, cls = int(org_codes[position]), int(classes[position])
+        if state.remaining[org] <= 0 or (org, cls) in rejected:
+            continue
+        state.take(org, cls)
+        if state.feasible():
+            chosen.append(position)
+            rejected.clear()
+            if state.slots == 0:
+                break
+        else:
+            state.take(org, cls, sign=-1)
+            # 同一单位、同一类别的其他候选在当前状态下同样无法加入
+            rejected.add((org, cls))
+
+    return pool[np.asarray(chosen, dtype=np.intp)]
+
+
+def solve_panels(roster_index, pool, size, num_panels, constraints, random_state=None, weights=None):
+    """
+    批量抽取多个满足组队规则的专家组，各组相互独立。
+
+    返回:
+        numpy.ndarray: 形状为 (num_panels, size) 的行位置矩阵。
+    """
+    if num_panels <= 0:
+        raise ValueError("专家组数量必须大于 0")
+    rng = lottery_engine._random_state(random_state)
+    panels = np.empty((num_panels, size), dtype=np.intp)
+    for panel in range(num_panels):
+        panels[panel] = solve_panel(roster_index, pool, size, constraints, random_state=rng, weights=weights)
+    return panels
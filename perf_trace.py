@@ -0,0 +1,231 @@
+"""
+各处理阶段的耗时和内存记录。
+
+记录加载名单、筛选、抽样、显示结果和保存结果等阶段的耗时（墙上时间）和
+内存峰值，用于排查"抽奖很慢"之类的问题：界面的性能面板显示最近的记录，
+同时以 JSON Lines 格式追加到日志文件，每行一条记录，例如
+
+    {"time": "2024-05-01T10:00:00.123", "stage": "sample", "elapsed_ms": 1.52,
+     "peak_memory_bytes": 40960, "thread": "MainThread", "pid": 1234, "status": "ok",
+     "details": {"mode": "count", "candidates": 8000, "count": 5}}
+
+内存峰值由 tracemalloc 统计，只包含 Python 和 numpy 分配的内存，开启后处理会变慢，
+因此默认关闭，需要时在界面勾选"性能记录"或设置环境变量 EXPERT_LOTTERY_PERF=1。
+多个阶段同时进行时（例如后台加载期间抽奖），各自的内存峰值包含对方的分配。
+
+只依赖标准库，界面启动时即可导入。
+"""
+import collections
+import datetime
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+PERF_ENV = 'EXPERT_LOTTERY_PERF'
+PERF_LOG_ENV = 'EXPERT_LOTTERY_PERF_LOG'
+DEFAULT_PERF_LOG = os.path.join(os.path.expanduser('~'), '.expert_lottery', 'perf.jsonl')
+
+# 界面中保留的最近记录数
+RECENT_LIMIT = 200
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_CANCELLED = 'cancelled'
+
+# 阶段名 -> 界面显示的说明
+STAGE_LABELS = {
+    'load': "加载名单",
+    'load.read': "读取名单文件",
+    'load.index': "建立筛选索引",
+    'load.options': "更新筛选选项",
+    'filter': "筛选候选专家",
+    'sample': "随机抽样",
+    'display': "显示结果",
+    'save': "保存结果",
+    'save.write': "写入结果文件",
+}
+
+
+def perf_log_path():
+    """性能日志文件路径，可用环境变量 EXPERT_LOTTERY_PERF_LOG 修改"""
+    return os.environ.get(PERF_LOG_ENV) or DEFAULT_PERF_LOG
+
+
+def stage_label(stage):
+    return STAGE_LABELS.get(stage, stage)
+
+
+class Span:
+    """一个正在进行的阶段，由 PerfRecorder.begin 返回"""
+
+    def __init__(self, stage, details):
+        self.stage = stage
+        self.details = details
+        self.thread = threading.current_thread().name
+        self.started = time.perf_counter()
+        self.base_memory = 0
+        self.peak_memory = 0
+
+
+class _NullSpan:
+    """未开启记录时 stage 返回的阶段，写入的附加信息直接丢弃"""
+
+    @property
+    def details(self):
+        return {}
+
+
+class _NullStage:
+    """未开启记录时使用的空上下文"""
+
+    def __enter__(self):
+        return _NULL_SPAN
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, recorder, stage, details):
+        self.recorder = recorder
+        self.stage = stage
+        self.details = details
+        self.span = None
+
+    def __enter__(self):
+        self.span = self.recorder.begin(self.stage, **self.details)
+        # 进入前刚关闭记录时 begin 返回 None
+        return self.span or _NULL_SPAN
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.recorder.end(self.span)
+        else:
+            self.recorder.end(self.span, status=STATUS_ERROR, error=str(exc_value))
+        return False
+
+
+class PerfRecorder:
+    """
+    记录各阶段的耗时和内存峰值。
+
+    同步的阶段用 stage 上下文；跨越线程或信号的阶段（例如后台加载）
+    用 begin 开始、end 结束。未开启时两者都几乎没有开销。
+
+    参数:
+        enabled (bool): 是否记录，默认取环境变量 EXPERT_LOTTERY_PERF。
+        log_path (str): JSON Lines 日志文件，默认见 perf_log_path；为空字符串时不写文件。
+    """
+
+    def __init__(self, enabled=None, log_path=None):
+        self.log_path = perf_log_path() if log_path is None else log_path
+        self.records = collections.deque(maxlen=RECENT_LIMIT)
+        self.listeners = []
+        self._open = []
+        self._lock = threading.Lock()
+        self._started_tracing = False
+        self.enabled = False
+        if enabled is None:
+            enabled = os.environ.get(PERF_ENV, '') not in ('', '0')
+        self.set_enabled(enabled)
+
+    def set_enabled(self, enabled):
+        """开启或关闭记录，开启时同时开始统计内存"""
+        with self._lock:
+            self.enabled = bool(enabled)
+            if self.enabled and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            elif not self.enabled and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+                self._open.clear()
+
+    def _fold_peak(self):
+        """把目前的内存峰值计入所有进行中的阶段，再重新统计峰值"""
+        current, peak = tracemalloc.get_traced_memory()
+        for span in self._open:
+            span.peak_memory = max(span.peak_memory, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def stage(self, stage, **details):
+        """
+        记录一个同步阶段的上下文，阶段内抛出异常时记为失败。
+
+        上下文的值是阶段对象，阶段内可以向其 details 补充附加信息。
+
+        参数:
+            stage (str): 阶段名，见 STAGE_LABELS。
+            details: 随记录保存的附加信息，例如行数，需可以转为 JSON。
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, stage, details)
+
+    def begin(self, stage, **details):
+        """开始一个阶段，返回的 Span 交给 end 结束；未开启时返回 None"""
+        if not self.enabled:
+            return None
+        span = Span(stage, details)
+        with self._lock:
+            if tracemalloc.is_tracing():
+                span.base_memory = self._fold_peak()
+                span.peak_memory = span.base_memory
+                self._open.append(span)
+        return span
+
+    def end(self, span, status=STATUS_OK, **details):
+        """
+        结束阶段并保存记录。
+
+        参数:
+            span (Span): begin 的返回值，为 None 时忽略。
+            status (str): ok、error 或 cancelled。
+            details: 补充的附加信息，例如加载完成后的行数。
+
+        返回:
+            dict: 保存的记录，span 为 None 时返回 None。
+        """
+        if span is None:
+            return None
+        elapsed = time.perf_counter() - span.started
+        peak_memory = None
+        with self._lock:
+            if span in self._open:
+                self._fold_peak()
+                self._open.remove(span)
+                peak_memory = max(span.peak_memory - span.base_memory, 0)
+        span.details.update(details)
+        record = {
+            'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+            'stage': span.stage,
+            'elapsed_ms': round(elapsed * 1000, 3),
+            'peak_memory_bytes': peak_memory,
+            'thread': span.thread,
+            'pid': os.getpid(),
+            'status': status,
+            'details': span.details,
+        }
+        self._save(record)
+        return record
+
+    def _save(self, record):
+        with self._lock:
+            self.records.append(record)
+            if self.log_path:
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+                    with open(self.log_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+                except OSError:
+                    # 日志写不进去不影响抽奖
+                    pass
+        for listener in list(self.listeners):
+            listener(record)
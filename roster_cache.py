@@ -0,0 +1,258 @@
+"""
+专家名单缓存。
+
+解析 xlsx 是加载名单时最慢的一步。本模块把解析后的名单以二进制形式
+（研究领域、单位列转为 category 的 pickle 文件）保存在本地缓存目录中，
+以文件路径、修改时间和内容哈希作为键；名单文件未变化时直接读取缓存，
+无需再次解析 Excel 文件。缓存未命中时用 roster_reader 流式读取。
+
+load_roster_set 可以把多个文件、多个工作表合并为一份名单：
+各工作表分别缓存，未命中缓存的工作表在进程池中并行解析，
+合并后按专家标识去重并保留来源信息。
+"""
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from roster_reader import LoadCancelled, merge_rosters, read_roster
+
+# 缓存格式版本，修改缓存内容结构时递增
+CACHE_VERSION = 2
+
+# 缓存目录可通过环境变量覆盖
+CACHE_DIR_ENV = 'EXPERT_LOTTERY_CACHE_DIR'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.expert_lottery', 'cache')
+
+
+def cache_dir():
+    """返回缓存目录路径"""
+    return os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    """计算文件内容的 SHA-256 哈希"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path_for(file_path, columns=None, sheet_name=None):
+    """返回某个名单文件（及工作表、列投影）对应的缓存文件路径"""
+    key_source = os.path.abspath(file_path)
+    if sheet_name is not None:
+        key_source += '\0sheet:' + sheet_name
+    if columns is not None:
+        key_source += '\0' + '\0'.join(sorted(columns))
+    key = hashlib.sha1(key_source.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir(), f"{key}.pkl")
+
+
+def _read_entry(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            entry = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(entry, dict) or entry.get('version') != CACHE_VERSION:
+        return None
+    return entry
+
+
+def _write_entry(cache_path, entry):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def read_cached_roster(file_path, columns=None, sheet_name=None):
+    """
+    读取名单缓存。
+
+    修改时间和大小与缓存记录一致时直接命中；否则重新计算文件哈希，
+    内容未变化时同样命中并刷新缓存记录。
+
+    参数:
+        file_path (str): 名单文件路径。
+        columns (list): 列投影，与写入缓存时一致。
+        sheet_name (str): 工作表名称，None 表示第一个工作表。
+
+    返回:
+        pandas.DataFrame: 缓存的名单，缓存不存在或已失效时返回 None。
+    """
+    cache_path = cache_path_for(file_path, columns, sheet_name)
+    entry = _read_entry(cache_path)
+    if entry is None or entry.get('path') != os.path.abspath(file_path):
+        return None
+
+    stat = os.stat(file_path)
+    if entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+        if file_hash(file_path) != entry['sha256']:
+            return None
+        entry['mtime_ns'] = stat.st_mtime_ns
+        entry['size'] = stat.st_size
+        try:
+            _write_entry(cache_path, entry)
+        except OSError:
+            pass
+
+    experts_df = entry['frame']
+    experts_df.attrs['roster_sha256'] = entry['sha256']
+    return experts_df
+
+
+def write_cached_roster(file_path, experts_df, columns=None, sheet_name=None):
+    """把解析后的名单写入缓存，写入失败时静默忽略"""
+    stat = os.stat(file_path)
+    experts_df.attrs['roster_sha256'] = file_hash(file_path)
+    entry = {
+        'version': CACHE_VERSION,
+        'path': os.path.abspath(file_path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': experts_df.attrs['roster_sha256'],
+        'frame': experts_df,
+    }
+    try:
+        _write_entry(cache_path_for(file_path, columns, sheet_name), entry)
+    except OSError:
+        pass
+
+
+def load_roster(file_path, use_cache=True, progress=None, should_cancel=None, columns=None,
+                sheet_name=None):
+    """
+    加载专家名单，优先读取缓存，缓存失效时再流式解析 Excel 文件。
+
+    参数:
+        file_path (str): 名单文件路径。
+        use_cache (bool): 是否读写缓存。
+        progress (callable): 进度回调，参数为 (百分比, 说明文字)。
+        should_cancel (callable): 返回 True 时中止加载并抛出 LoadCancelled。
+        columns (list): 只加载这些列，例如 roster_reader.DRAW_COLUMNS；None 表示全部列。
+            只加载部分列时 attrs['projected'] 为 True，其他列可用
+            roster_reader.fetch_rows 按行读取。
+        sheet_name (str): 工作表名称，None 表示第一个工作表。
+
+    返回:
+        pandas.DataFrame: 专家名单，attrs['roster_sha256'] 为文件内容哈希。
+        文件不存在时抛出 FileNotFoundError。
+    """
+    def report(percent, message):
+        if should_cancel is not None and should_cancel():
+            raise LoadCancelled()
+        if progress is not None:
+            progress(percent, message)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(file_path)
+
+    if use_cache:
+        report(0, "正在检查名单缓存...")
+        experts_df = read_cached_roster(file_path, columns, sheet_name)
+        if experts_df is not None:
+            report(100, "已从缓存加载名单")
+            return experts_df
+
+    report(5, "正在解析 Excel 文件...")
+    experts_df = read_roster(
+        file_path,
+        columns=columns,
+        sheet_name=sheet_name,
+        progress=lambda count, total: report(
+            5 + 75 * min(count, total) // max(total, 1), f"正在解析 Excel 文件... 已读取 {count} 行"
+        ),
+        should_cancel=should_cancel,
+    )
+    experts_df.attrs['source_path'] = os.path.abspath(file_path)
+    experts_df.attrs['source_sheet'] = sheet_name
+    experts_df.attrs['projected'] = columns is not None
+
+    report(80, "正在写入名单缓存...")
+    if use_cache:
+        write_cached_roster(file_path, experts_df, columns, sheet_name)
+    else:
+        experts_df.attrs['roster_sha256'] = file_hash(file_path)
+    report(100, "名单加载完成")
+    return experts_df
+
+
+def _load_source(file_path, sheet_name, use_cache, columns):
+    """进程池任务：加载单个工作表"""
+    return load_roster(file_path, use_cache=use_cache, columns=columns, sheet_name=sheet_name)
+
+
+def load_roster_set(sources, use_cache=True, progress=None, should_cancel=None, columns=None,
+                    workers=None, dedupe=True):
+    """
+    把多个文件、多个工作表加载为一份名单。
+
+    已缓存的工作表直接读取，其余工作表在进程池中并行解析。
+
+    参数:
+        sources (list): (文件路径, 工作表名称) 列表，工作表为 None 表示第一个工作表；
+            可用 roster_reader.expand_sources 生成。
+        use_cache (bool): 是否读写缓存。
+        progress (callable): 进度回调，参数为 (百分比, 说明文字)。
+        should_cancel (callable): 返回 True 时中止加载并抛出 LoadCancelled。
+        columns (list): 只加载这些列，None 表示全部列。
+        workers (int): 解析进程数，None 时使用 CPU 核数。
+        dedupe (bool): 是否按专家标识去重。
+
+    返回:
+        pandas.DataFrame: 合并后的名单，包含来源文件、来源工作表和来源行号列。
+    """
+    def report(percent, message):
+        if should_cancel is not None and should_cancel():
+            raise LoadCancelled()
+        if progress is not None:
+            progress(percent, message)
+
+    sources = [(file_path, sheet_name) for file_path, sheet_name in sources]
+    if not sources:
+        raise ValueError("没有指定要加载的名单")
+    for file_path, _ in sources:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(file_path)
+
+    frames = [None] * len(sources)
+    if use_cache:
+        report(0, "正在检查名单缓存...")
+        for position, (file_path, sheet_name) in enumerate(sources):
+            frames[position] = read_cached_roster(file_path, columns, sheet_name)
+
+    pending = [position for position, frame in enumerate(frames) if frame is None]
+    if len(pending) == 1:
+        file_path, sheet_name = sources[pending[0]]
+        report(5, f"正在解析 '{os.path.basename(file_path)}'...")
+        frames[pending[0]] = _load_source(file_path, sheet_name, use_cache, columns)
+    elif pending:
+        workers = min(len(pending), workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_load_source, *sources[position], use_cache, columns): position
+                for position in pending
+            }
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    frames[futures[future]] = future.result()
+                    report(5 + 80 * done // len(pending), f"已解析 {done}/{len(pending)} 个工作表")
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    report(90, "正在合并名单...")
+    experts_df = merge_rosters(frames, sources, dedupe=dedupe)
+    experts_df.attrs['projected'] = columns is not None
+
+    digest = hashlib.sha256()
+    for frame, (_, sheet_name) in zip(frames, sources):
+        digest.update(f"{frame.attrs['roster_sha256']}|{sheet_name or ''}\n".encode('utf-8'))
+    experts_df.attrs['roster_sha256'] = digest.hexdigest()
+    report(100, "名单加载完成")
+    return experts_df
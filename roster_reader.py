@@ -0,0 +1,360 @@
+"""
+流式读取 xlsx 名单。
+
+以 openpyxl 只读模式逐行读取工作表，只保留需要的列（列投影），
+研究领域、单位和职称直接存为 category 类型。抽取只需要 姓名、研究领域、单位、
+职称和专家编号几列；其他列（例如个人简介等长文本）可以在抽取之后用 fetch_rows
+只为被抽中的专家读取，从而降低宽表名单的内存占用。
+
+列投影不会缩短读取时间：xlsx 按行存储，openpyxl 无论是否限定列范围
+（iter_rows 的 min_col/max_col）都要解析整行的所有单元格，实测两者耗时相同；
+.xls 文件由 pd.read_excel 读取整个工作表后再丢弃不需要的列。
+加载时间主要靠 roster_cache 的缓存缩短。
+
+行位置的含义与 pd.read_excel 一致：表头之后的第一行数据为 0，
+中间的空行保留为空值行，末尾的空行被忽略。
+
+多个工作表或文件可用 merge_rosters 合并为一份名单，合并时按专家标识
+（专家编号，或 姓名+单位）去重，并增加来源文件、来源工作表、来源行号三列。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from lottery_engine import FIELD_COLUMN, ID_COLUMNS, NAME_COLUMN, ORG_COLUMN, TITLE_COLUMN, expert_keys
+
+# 抽取所需的列；专家编号列用于合并多份名单时去重，职称列用于组队规则
+DRAW_COLUMNS = (NAME_COLUMN, FIELD_COLUMN, ORG_COLUMN, TITLE_COLUMN) + ID_COLUMNS
+
+# 合并名单时增加的来源列
+SOURCE_FILE_COLUMN = '来源文件'
+SOURCE_SHEET_COLUMN = '来源工作表'
+SOURCE_ROW_COLUMN = '来源行号'
+SOURCE_COLUMNS = (SOURCE_FILE_COLUMN, SOURCE_SHEET_COLUMN, SOURCE_ROW_COLUMN)
+
+# 以 category 类型保存的列
+CATEGORY_COLUMNS = (FIELD_COLUMN, ORG_COLUMN, TITLE_COLUMN)
+
+# 每读取多少行报告一次进度
+PROGRESS_INTERVAL = 5000
+
+
+class LoadCancelled(Exception):
+    """加载名单的操作被取消"""
+
+
+def to_categorical(experts_df):
+    """把研究领域、单位列转为 category 类型以便缓存和建立索引"""
+    for column in CATEGORY_COLUMNS:
+        if column in experts_df.columns:
+            experts_df[column] = experts_df[column].astype('category')
+    return experts_df
+
+
+def _header_names(header_row):
+    """整理表头：空表头命名为 Unnamed: i，重复表头依次加 .1、.2 后缀（与 pandas 一致）"""
+    names = []
+    seen = {}
+    for position, value in enumerate(header_row):
+        name = f"Unnamed: {position}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def list_sheets(file_path):
+    """返回工作簿中所有工作表的名称"""
+    if os.path.splitext(file_path)[1].lower() == '.xls':
+        with pd.ExcelFile(file_path) as workbook:
+            return list(workbook.sheet_names)
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def expand_sources(file_paths, all_sheets=False):
+    """
+    把名单文件列表展开为 (文件路径, 工作表名称) 列表。
+
+    参数:
+        file_paths (list): 名单文件路径；也可以写成 "文件路径#工作表名称" 只读取指定工作表。
+        all_sheets (bool): 是否读取每个文件的所有工作表，False 时只读取第一个工作表。
+
+    返回:
+        list: (文件路径, 工作表名称) 列表，工作表名称为 None 表示第一个工作表。
+    """
+    sources = []
+    for file_path in file_paths:
+        if '#' in file_path and not os.path.exists(file_path):
+            file_path, sheet_name = file_path.rsplit('#', 1)
+            sources.append((file_path, sheet_name))
+        elif all_sheets:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(file_path)
+            sources.extend((file_path, sheet_name) for sheet_name in list_sheets(file_path))
+        else:
+            sources.append((file_path, None))
+    return sources
+
+
+def _iter_data_rows(file_path, sheet_name=None):
+    """
+    逐行读取工作表，先产出表头，再依次产出数据行（忽略末尾的空行）。
+
+    返回:
+        generator: 第一项为 (表头列表, 估计的总行数)，之后每项为一行的值元组。
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        # 与 pandas 一致，忽略表头末尾的空单元格
+        while header and header[-1] is None:
+            header.pop()
+        yield _header_names(header), (worksheet.max_row or 0)
+        blank_rows = 0
+        for row in rows:
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+            for _ in range(blank_rows):
+                yield ()
+            blank_rows = 0
+            yield row
+    finally:
+        workbook.close()
+
+
+def read_roster(file_path, columns=None, sheet_name=None, progress=None, should_cancel=None):
+    """
+    流式读取名单，只保留指定的列。
+
+    只保留指定的列可以减少内存占用，但每行仍要完整解析，读取时间与读取全部列相同。
+    .xls 文件不支持流式读取，会退回 pd.read_excel。
+
+    参数:
+        file_path (str): 名单文件路径。
+        columns (list): 需要读取的列，None 表示全部列；名单中不存在的列会被忽略。
+        sheet_name (str): 工作表名称，None 表示第一个工作表。
+        progress (callable): 进度回调，参数为 (已读取行数, 估计总行数)。
+        should_cancel (callable): 返回 True 时停止读取并抛出 LoadCancelled。
+
+    返回:
+        pandas.DataFrame: 名单，研究领域和单位为 category 类型。
+    """
+    if os.path.splitext(file_path)[1].lower() == '.xls':
+        usecols = (lambda name: name in columns) if columns is not None else None
+        return to_categorical(pd.read_excel(file_path, sheet_name=sheet_name or 0, usecols=usecols))
+
+    rows = _iter_data_rows(file_path, sheet_name)
+    header, total_rows = next(rows)
+    if columns is None:
+        selected = list(range(len(header)))
+    else:
+        wanted = set(columns)
+        selected = [position for position, name in enumerate(header) if name in wanted]
+
+    data = {header[position]: [] for position in selected}
+    targets = [(data[header[position]], position) for position in selected]
+    count = 0
+    for row in rows:
+        width = len(row)
+        for values, position in targets:
+            values.append(row[position] if position < width else None)
+        count += 1
+        if count % PROGRESS_INTERVAL == 0:
+            if should_cancel is not None and should_cancel():
+                rows.close()
+                raise LoadCancelled()
+            if progress is not None:
+                progress(count, total_rows)
+
+    if progress is not None:
+        progress(count, count)
+    return to_categorical(pd.DataFrame(data))
+
+
+def fetch_rows(file_path, positions, columns=None, sheet_name=None):
+    """
+    只读取指定行位置的完整信息，用于补全抽中专家的其他列。
+
+    读到最后一个需要的行后立即停止。
+
+    参数:
+        file_path (str): 名单文件路径。
+        positions (list): 行位置，可以重复，结果按给定顺序排列。
+        columns (list): 需要读取的列，None 表示全部列。
+        sheet_name (str): 工作表名称，None 表示第一个工作表。
+
+    返回:
+        pandas.DataFrame: 指定行的信息，索引为行位置。
+    """
+    positions = [int(position) for position in positions]
+    if os.path.splitext(file_path)[1].lower() == '.xls':
+        usecols = (lambda name: name in columns) if columns is not None else None
+        experts_df = pd.read_excel(file_path, sheet_name=sheet_name or 0, usecols=usecols)
+        return to_categorical(experts_df.iloc[positions])
+
+    wanted = set(positions)
+    last = max(wanted, default=-1)
+    rows = _iter_data_rows(file_path, sheet_name)
+    header, _ = next(rows)
+    if columns is None:
+        selected = list(range(len(header)))
+    else:
+        wanted_columns = set(columns)
+        selected = [position for position, name in enumerate(header) if name in wanted_columns]
+
+    found = {}
+    for row_position, row in enumerate(rows):
+        if row_position > last:
+            rows.close()
+            break
+        if row_position in wanted:
+            width = len(row)
+            found[row_position] = [row[position] if position < width else None for position in selected]
+
+    missing = wanted.difference(found)
+    if missing:
+        raise IndexError(f"名单中不存在第 {min(missing)} 行")
+
+    return to_categorical(pd.DataFrame(
+        [found[position] for position in positions],
+        columns=[header[position] for position in selected],
+        index=positions,
+    ))
+
+
+def _source_labels(sources):
+    """来源文件列显示文件名；不同目录下有同名文件时显示完整路径"""
+    names = [os.path.basename(file_path) for file_path, _ in sources]
+    if len(set(names)) < len(set(os.path.abspath(file_path) for file_path, _ in sources)):
+        return [os.path.abspath(file_path) for file_path, _ in sources]
+    return names
+
+
+def merge_rosters(frames, sources, dedupe=True):
+    """
+    把多个工作表的名单合并为一份名单。
+
+    去重以专家标识（lottery_engine.expert_keys）的哈希值为键，保留最先出现的记录；
+    标识缺失的行（例如空行）不参与去重。
+
+    参数:
+        frames (list): 各工作表的名单。
+        sources (list): 与 frames 对应的 (文件路径, 工作表名称) 列表。
+        dedupe (bool): 是否去重。
+
+    返回:
+        pandas.DataFrame: 合并后的名单，attrs['sources'] 为来源列表，
+        attrs['duplicates'] 为去掉的重复记录数。
+    """
+    labels = _source_labels(sources)
+    sheet_cache = {}
+    sheet_labels = []
+    for file_path, sheet_name in sources:
+        if sheet_name is None:
+            if file_path not in sheet_cache:
+                sheet_cache[file_path] = list_sheets(file_path)[0]
+            sheet_name = sheet_cache[file_path]
+        sheet_labels.append(sheet_name)
+
+    file_categories = list(dict.fromkeys(labels))
+    sheet_categories = list(dict.fromkeys(sheet_labels))
+    file_codes = []
+    sheet_codes = []
+    row_numbers = []
+    for frame, label, sheet_label in zip(frames, labels, sheet_labels):
+        size = len(frame)
+        file_codes.append(np.full(size, file_categories.index(label), dtype=np.int32))
+        sheet_codes.append(np.full(size, sheet_categories.index(sheet_label), dtype=np.int32))
+        # 表头在第 1 行，数据从第 2 行开始
+        row_numbers.append(np.arange(2, size + 2, dtype=np.int64))
+
+    experts_df = pd.concat(frames, ignore_index=True, sort=False)
+    experts_df.attrs = {}
+    experts_df[SOURCE_FILE_COLUMN] = pd.Categorical.from_codes(
+        np.concatenate(file_codes), categories=file_categories
+    )
+    experts_df[SOURCE_SHEET_COLUMN] = pd.Categorical.from_codes(
+        np.concatenate(sheet_codes), categories=sheet_categories
+    )
+    experts_df[SOURCE_ROW_COLUMN] = np.concatenate(row_numbers)
+
+    duplicates = 0
+    if dedupe and len(experts_df):
+        key_columns = [column for column in ID_COLUMNS if column in experts_df.columns][:1]
+        if not key_columns:
+            key_columns = [column for column in (NAME_COLUMN, ORG_COLUMN) if column in experts_df.columns]
+        has_key = experts_df[key_columns].notna().any(axis=1).to_numpy()
+        hashes = pd.util.hash_array(expert_keys(experts_df))
+        repeated = pd.Series(hashes).duplicated().to_numpy() & has_key
+        duplicates = int(repeated.sum())
+        if duplicates:
+            experts_df = experts_df[~repeated].reset_index(drop=True)
+
+    experts_df = to_categorical(experts_df)
+    experts_df.attrs['sources'] = [
+        {'path': os.path.abspath(file_path), 'sheet': sheet_name, 'label': label, 'sheet_label': sheet_label}
+        for (file_path, sheet_name), label, sheet_label in zip(sources, labels, sheet_labels)
+    ]
+    experts_df.attrs['duplicates'] = duplicates
+    return experts_df
+
+
+def expand_rows(experts_df, positions):
+    """
+    返回指定行的完整信息。
+
+    名单只加载了部分列时 (attrs['projected'])，从源文件补读这些行的全部列；
+    否则直接从名单中取出。合并的名单按来源列回到各自的文件和工作表中读取。
+
+    参数:
+        experts_df (pandas.DataFrame): roster_cache.load_roster 返回的名单。
+        positions (list): 行位置。
+
+    返回:
+        pandas.DataFrame: 指定行的信息，按给定顺序排列。
+    """
+    if not experts_df.attrs.get('projected'):
+        return experts_df.iloc[list(positions)]
+    sources = experts_df.attrs.get('sources')
+    if not sources:
+        return fetch_rows(experts_df.attrs['source_path'], positions)
+
+    positions = np.asarray(positions, dtype=np.intp)
+    selected_df = experts_df.iloc[positions]
+    file_labels = selected_df[SOURCE_FILE_COLUMN].astype(str).to_numpy()
+    sheet_labels = selected_df[SOURCE_SHEET_COLUMN].astype(str).to_numpy()
+    source_rows = selected_df[SOURCE_ROW_COLUMN].to_numpy() - 2
+
+    parts = []
+    order = []
+    for source in sources:
+        matched = np.flatnonzero((file_labels == source['label']) & (sheet_labels == source['sheet_label']))
+        if len(matched) == 0:
+            continue
+        part = fetch_rows(source['path'], source_rows[matched], sheet_name=source['sheet_label'])
+        part[SOURCE_FILE_COLUMN] = source['label']
+        part[SOURCE_SHEET_COLUMN] = source['sheet_label']
+        part[SOURCE_ROW_COLUMN] = source_rows[matched] + 2
+        parts.append(part.reset_index(drop=True))
+        order.append(matched)
+    details_df = pd.concat(parts, ignore_index=True, sort=False)
+    # 恢复给定的行顺序
+    details_df = details_df.iloc[np.argsort(np.concatenate(order), kind='stable')]
+    details_df.index = positions
+    return to_categorical(details_df)
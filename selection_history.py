@@ -0,0 +1,203 @@
+"""
+专家抽中记录。
+
+每次保存抽取结果时，把抽中的专家写入本地 SQLite 数据库。下次抽取前可以
+按天数查出近期已被抽中的专家，生成行掩码后从候选池中排除（冷却期），
+不再需要对照以往的 抽奖结果.xlsx 手工检查。
+
+记录以专家标识（lottery_engine.expert_keys：专家编号，或 姓名+单位）为键，
+并在 (抽中时间, 专家标识) 上建立索引，冷却期查询只扫描时间范围内的索引项，
+与历史记录的总量无关。
+
+加权抽取时，权重公式可以引用 抽中次数（HISTORY_COUNT_VARIABLE），
+例如 "1 / (1 + 抽中次数)"，让很少被抽中的专家更容易被抽中。
+"""
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import lottery_engine
+
+# 记录格式版本，修改表结构时递增
+SCHEMA_VERSION = 1
+
+# 数据库路径可通过环境变量覆盖
+HISTORY_PATH_ENV = 'EXPERT_LOTTERY_HISTORY'
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser('~'), '.expert_lottery', 'history.sqlite3')
+
+# 权重公式中表示历史抽中次数的变量名
+HISTORY_COUNT_VARIABLE = '抽中次数'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS selections (
+    id INTEGER PRIMARY KEY,
+    expert_key TEXT NOT NULL,
+    drawn_at TEXT NOT NULL,
+    name TEXT,
+    field TEXT,
+    organization TEXT,
+    seed TEXT,
+    roster_sha256 TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_selections_key_date ON selections (expert_key, drawn_at);
+CREATE INDEX IF NOT EXISTS idx_selections_date_key ON selections (drawn_at, expert_key);
+"""
+
+
+def history_path():
+    """返回抽中记录数据库的路径"""
+    return os.environ.get(HISTORY_PATH_ENV) or DEFAULT_HISTORY_PATH
+
+
+def _timestamp(moment):
+    """统一为本地时间的 ISO 字符串（精确到秒），字符串顺序即时间顺序"""
+    return moment.replace(microsecond=0).isoformat(sep=' ')
+
+
+def _column_values(experts_df, column):
+    if column not in experts_df.columns:
+        return [None] * len(experts_df)
+    return [None if value != value else str(value) for value in experts_df[column].tolist()]
+
+
+class SelectionHistory:
+    """
+    抽中记录数据库。
+
+    参数:
+        path (str): 数据库文件路径，None 时使用 history_path()；":memory:" 表示内存数据库。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or history_path()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._connection = sqlite3.connect(self.path)
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            self._connection.close()
+            raise ValueError(f"不支持的抽中记录版本: {version}")
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, experts_df, drawn_at=None, seed=None, roster_sha256=None, source=None):
+        """
+        记录一次抽取中被抽中的专家。
+
+        参数:
+            experts_df (pandas.DataFrame): 被抽中的专家。
+            drawn_at (datetime): 抽中时间，None 表示当前时间。
+            seed (int): 抽取所用的种子。
+            roster_sha256 (str): 名单哈希。
+            source (str): 记录来源，例如结果文件路径。
+
+        返回:
+            int: 写入的记录数。
+        """
+        drawn_at = _timestamp(drawn_at or datetime.now())
+        rows = list(zip(
+            lottery_engine.expert_keys(experts_df).tolist(),
+            _column_values(experts_df, lottery_engine.NAME_COLUMN),
+            _column_values(experts_df, lottery_engine.FIELD_COLUMN),
+            _column_values(experts_df, lottery_engine.ORG_COLUMN),
+        ))
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO selections (expert_key, drawn_at, name, field, organization, seed, "
+                "roster_sha256, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (key, drawn_at, name, field, organization,
+                     None if seed is None else str(seed), roster_sha256, source)
+                    for key, name, field, organization in rows
+                ],
+            )
+        return len(rows)
+
+    def recent_keys(self, days, now=None):
+        """
+        返回最近 days 天内被抽中过的专家标识。
+
+        参数:
+            days (float): 冷却天数，小于等于 0 时返回空集合。
+            now (datetime): 计算冷却期的当前时间，None 表示当前时间。
+
+        返回:
+            set: 专家标识。
+        """
+        if days <= 0:
+            return set()
+        since = _timestamp((now or datetime.now()) - timedelta(days=days))
+        # 不用 DISTINCT：否则 SQLite 会改为扫描整个 (专家标识, 时间) 索引
+        cursor = self._connection.execute(
+            "SELECT expert_key FROM selections WHERE drawn_at >= ?", (since,)
+        )
+        return {key for (key,) in cursor}
+
+    def exclusion_mask(self, roster_index, days, now=None):
+        """
+        返回名单中处于冷却期的专家行掩码，可直接传给 RosterIndex.pool 的 exclude 参数。
+
+        参数:
+            roster_index (lottery_engine.RosterIndex): 名单索引。
+            days (float): 冷却天数。
+            now (datetime): 计算冷却期的当前时间，None 表示当前时间。
+
+        返回:
+            numpy.ndarray: 长度为名单行数的布尔数组。
+        """
+        return roster_index.key_mask(self.recent_keys(days, now))
+
+    def selection_counts(self, roster_index, days=None, now=None):
+        """
+        返回名单中每位专家的历史抽中次数。
+
+        参数:
+            roster_index (lottery_engine.RosterIndex): 名单索引。
+            days (float): 只统计最近若干天，None 表示全部记录。
+            now (datetime): 计算时间范围的当前时间，None 表示当前时间。
+
+        返回:
+            numpy.ndarray: 长度为名单行数的整数数组。
+        """
+        if days is None:
+            cursor = self._connection.execute(
+                "SELECT expert_key, COUNT(*) FROM selections GROUP BY expert_key"
+            )
+        else:
+            since = _timestamp((now or datetime.now()) - timedelta(days=days))
+            cursor = self._connection.execute(
+                "SELECT expert_key, COUNT(*) FROM selections WHERE drawn_at >= ? GROUP BY expert_key",
+                (since,),
+            )
+        counts = dict(cursor.fetchall())
+        if not counts:
+            return np.zeros(roster_index.size, dtype=np.int64)
+        return pd.Series(roster_index.keys()).map(counts).fillna(0).to_numpy(dtype=np.int64)
+
+    def weight_variables(self, roster_index, expression):
+        """
+        返回权重公式需要的历史变量。
+
+        公式引用 抽中次数 时查询每位专家的抽中次数，否则返回空字典，不访问数据库。
+        """
+        if HISTORY_COUNT_VARIABLE not in expression:
+            return {}
+        return {HISTORY_COUNT_VARIABLE: self.selection_counts(roster_index)}
+
+    def count(self):
+        """返回记录总数"""
+        return self._connection.execute("SELECT COUNT(*) FROM selections").fetchone()[0]
@@ -1,5 +1,18 @@
-import pandas as pd
-import random
+"""
+专家抽取系统命令行入口。
+
+子命令和参数见 lottery_cli，例如:
+
+    python test.py inspect experts_list.xlsx
+    python test.py draw experts_list.xlsx -n 5 -o 抽奖结果.xlsx
+    python test.py draw experts_list.xlsx -n 5 --seed 42 --json
+
+不再逐项询问输入，可以在脚本和定时任务中直接运行。
+"""
+import sys
+
+import lottery_cli
+
 
 def load_experts_from_xlsx(file_path):
     """
@@ -11,9 +24,10 @@ def load_experts_from_xlsx(file_path):
     返回:
         pandas.DataFrame: 包含专家信息的 DataFrame，如果文件读取失败则返回 None。
     """
+    import roster_cache
     try:
-        # 读取 Excel 文件
-        df = pd.read_excel(file_path)
+        # 读取 Excel 文件（名单未变化时直接读取缓存）
+        df = roster_cache.load_roster(file_path)
         print(f"成功从 '{file_path}' 文件中加载了 {len(df)} 位专家信息。")
         # 打印列名，方便用户了解文件包含哪些信息
         print(f"文件包含的列名: {df.columns.tolist()}")
@@ -36,6 +50,7 @@ def extract_random_experts(experts_df, num_to_extract):
     返回:
         pandas.DataFrame: 包含被抽取专家信息的 DataFrame。如果无法抽取，则返回 None 或空 DataFrame。
     """
+    import lottery_engine
     if experts_df is None or experts_df.empty:
         print("错误：专家名单为空，无法进行抽取。")
         return None
@@ -50,9 +65,9 @@ def extract_random_experts(experts_df, num_to_extract):
         print("将返回所有专家。")
         return experts_df.copy() # 返回所有专家的副本
     else:
-        # 使用 pandas 的 sample 方法进行随机抽样
-        extracted_experts = experts_df.sample(n=num_to_extract, random_state=random.randint(1, 1000)) # random_state 用于可复现性，可选
-        return extracted_experts
+        # 使用抽取引擎进行随机抽样
+        selected = lottery_engine.draw_experts(experts_df, num_to_extract)
+        return experts_df.iloc[selected]
 
 def display_experts(experts_df, title="抽取的专家名单"):
     """
@@ -71,48 +86,17 @@ def display_experts(experts_df, title="抽取的专家名单"):
         print("没有抽取到任何专家。")
 
 
-def main():
+def main(argv=None):
     """
-    主函数，执行专家抽取流程。
+    主函数，按命令行参数执行专家抽取流程。
+
+    参数:
+        argv (list): 命令行参数，None 表示使用 sys.argv。
+
+    返回:
+        int: 退出码，0 表示成功。
     """
-    print("--- 欢迎使用专家抽取系统 ---")
-
-    # 获取 XLSX 文件路径
-    file_path = input("请输入专家名单 XLSX 文件的完整路径 (例如: D:\\data\\experts.xlsx 或 /path/to/experts.xlsx): ")
-    experts_data = load_experts_from_xlsx(file_path)
-
-    if experts_data is not None:
-        while True:
-            try:
-                num_str = input(f"当前共有 {len(experts_data)} 位专家。请输入需要抽取的专家数量: ")
-                num_to_extract = int(num_str)
-                if num_to_extract > 0:
-                    break
-                else:
-                    print("抽取的专家数量必须是正整数。")
-            except ValueError:
-                print("输入无效，请输入一个数字。")
-
-        # 进行专家抽取
-        extracted_experts_df = extract_random_experts(experts_data, num_to_extract)
-
-        # 显示抽取结果
-        if extracted_experts_df is not None:
-            display_experts(extracted_experts_df)
-
-            # 可选：保存抽取结果到新的 Excel 文件
-            save_results = input("\n是否将抽取的专家名单保存到新的 Excel 文件? (输入 'y' 表示是，其他任意键表示否): ").strip().lower()
-            if save_results == 'y':
-                output_file_path = input("请输入输出文件的名称 (例如: extracted_experts_list.xlsx): ")
-                try:
-                    extracted_experts_df.to_excel(output_file_path, index=False)
-                    print(f"抽取的专家名单已成功保存到 '{output_file_path}'")
-                except Exception as e:
-                    print(f"保存文件时发生错误: {e}")
-        else:
-            print("未能完成专家抽取。")
-
-    print("\n--- 感谢使用专家抽取系统 ---")
+    return lottery_cli.main(argv)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""界面导出：导出进行中关闭窗口"""
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import draw_manifest
+
+pytest.importorskip('PyQt6')
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中运行，关闭窗口卡住时由超时结束，不会拖住整个测试
+CLOSE_DURING_EXPORT = textwrap.dedent("""
+    import sys
+    import pandas as pd
+    from PyQt6.QtWidgets import QApplication
+    import expert_lottery_gui
+
+    app = QApplication([])
+    window = expert_lottery_gui.ExpertLotteryApp()
+    window.extracted_experts = pd.DataFrame({
+        '姓名': [f"专家{row}" for row in range(200000)],
+        '研究领域': '材料',
+        '单位': '单位A',
+    })
+    window.extraction_manifest = {'seed': '1', 'roster': {'sha256': None}}
+    window.extraction_recorded = True
+    window.start_export(sys.argv[1])
+    window.close()
+    assert not window.active_exports or all(thread.isFinished() for thread, _ in window.active_exports)
+""")
+
+
+def test_close_window_during_export(tmp_path):
+    output_path = tmp_path / "抽奖结果.csv"
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+    completed = subprocess.run(
+        [sys.executable, '-c', CLOSE_DURING_EXPORT, str(output_path)],
+        cwd=REPO_DIR, env=env, timeout=60, capture_output=True, text=True,
+    )
+    assert completed.returncode == 0, completed.stderr
+    # 关闭窗口前结果文件已经写完，抽取记录也已保存
+    assert output_path.exists()
+    assert len(output_path.read_text(encoding='utf-8-sig').splitlines()) == 200001
+    assert os.path.exists(draw_manifest.manifest_path_for(str(output_path)))
@@ -0,0 +1,59 @@
+"""组队规则：同一单位的不同写法合并计数"""
+import pandas as pd
+import pytest
+
+import lottery_engine
+import panel_solver
+
+# 每个单位有两种写法，各 3 位专家
+ORGANIZATIONS = ["清华大学", "北京大学", "浙江大学", "南京大学"]
+
+
+@pytest.fixture
+def spelled_index():
+    names = []
+    for organization in ORGANIZATIONS:
+        names += [organization] * 3 + [f"{organization}（材料学院）"] * 3
+    experts_df = pd.DataFrame({
+        lottery_engine.NAME_COLUMN: [f"专家{row}" for row in range(len(names))],
+        lottery_engine.FIELD_COLUMN: "材料",
+        lottery_engine.ORG_COLUMN: names,
+    })
+    return lottery_engine.RosterIndex(experts_df, org_aliases={})
+
+
+def test_two_spellings_share_one_cap(spelled_index):
+    assert len(spelled_index.org_index.canonical) == len(ORGANIZATIONS)
+    constraints = panel_solver.PanelConstraints(max_per_org=1).with_org_groups(spelled_index)
+    for seed in range(20):
+        selected = panel_solver.solve_panel(
+            spelled_index, spelled_index.pool(), len(ORGANIZATIONS), constraints, random_state=seed,
+        )
+        assert spelled_index.count_by_org_group(selected) == {organization: 1 for organization in ORGANIZATIONS}
+
+
+def test_two_spellings_exceed_cap(spelled_index):
+    constraints = panel_solver.PanelConstraints(max_per_org=1).with_org_groups(spelled_index)
+    with pytest.raises(panel_solver.InfeasibleConstraints, match="最多只能组成 4 人"):
+        panel_solver.solve_panel(spelled_index, spelled_index.pool(), 5, constraints, random_state=1)
+
+
+def test_org_groups_round_trip(spelled_index):
+    constraints = panel_solver.PanelConstraints(max_per_org=1).with_org_groups(spelled_index)
+    data = constraints.to_dict()
+    assert data['org_groups'] == {
+        organization: [organization, f"{organization}（材料学院）"] for organization in ORGANIZATIONS
+    }
+    restored = panel_solver.PanelConstraints.from_dict(data)
+    pool = spelled_index.pool()
+    selected = panel_solver.solve_panel(spelled_index, pool, 4, constraints, random_state=7)
+    replayed = panel_solver.solve_panel(spelled_index, pool, 4, restored, random_state=7)
+    assert replayed.tolist() == selected.tolist()
+
+
+def test_legacy_constraints_count_raw_spellings(spelled_index):
+    # 没有 org_groups 的旧抽取记录按原始写法计数，同一单位可以抽中两位
+    constraints = panel_solver.PanelConstraints.from_dict({'max_per_org': 1})
+    assert constraints.org_groups == {}
+    selected = panel_solver.solve_panel(spelled_index, spelled_index.pool(), 8, constraints, random_state=1)
+    assert spelled_index.count_by_org_group(selected) == {organization: 2 for organization in ORGANIZATIONS}
@@ -0,0 +1,89 @@
+"""名单变化后增量更新的索引与重新建立的索引一致"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import lottery_engine
+import roster_reader
+from lottery_engine import FIELD_COLUMN, NAME_COLUMN, ORG_COLUMN
+
+ROWS = 300
+
+
+def make_roster(rows, start=0, organizations=("清华大学", "北京大学", "浙江大学", "南京大学", "复旦大学")):
+    return roster_reader.to_categorical(pd.DataFrame({
+        '专家编号': [f"E{row:05d}" for row in range(start, start + rows)],
+        NAME_COLUMN: [f"专家{row}" for row in range(start, start + rows)],
+        FIELD_COLUMN: [f"领域{row % 7}" for row in range(start, start + rows)],
+        ORG_COLUMN: [organizations[row % len(organizations)] for row in range(start, start + rows)],
+    }))
+
+
+def with_org(experts_df, row, organization):
+    experts_df = experts_df.copy()
+    organizations = experts_df[ORG_COLUMN].astype(object)
+    organizations.iloc[row] = organization
+    experts_df[ORG_COLUMN] = organizations.astype('category')
+    return experts_df
+
+
+def concat(*frames):
+    return roster_reader.to_categorical(pd.concat(frames, ignore_index=True))
+
+
+OLD_DF = make_roster(ROWS)
+
+CHANGES = {
+    'append': concat(OLD_DF, make_roster(20, start=ROWS, organizations=("清华大学", "中山大学"))),
+    'edit': with_org(OLD_DF, 7, "中山大学"),
+    'delete-middle': OLD_DF.drop(index=range(100, 130)).reset_index(drop=True),
+    'delete-head': OLD_DF.iloc[5:].reset_index(drop=True),
+    'insert-middle': concat(OLD_DF.iloc[:150], make_roster(10, start=ROWS), OLD_DF.iloc[150:]),
+    'shuffle': OLD_DF.sample(frac=1, random_state=1).reset_index(drop=True),
+    'org-vanishes': OLD_DF[OLD_DF[ORG_COLUMN] != "复旦大学"].reset_index(drop=True),
+    # 新写法是已有写法的上级单位或下属机构
+    'new-subunit': with_org(OLD_DF, 3, "清华大学（材料学院）"),
+    'new-parent': concat(with_org(OLD_DF, 3, "清华大学材料学院"), make_roster(1, start=ROWS, organizations=("清华",))),
+    'drop-column': OLD_DF.drop(columns=[ORG_COLUMN]),
+}
+
+
+def assert_same_index(updated, rebuilt):
+    for attribute in ('field_rows', 'org_rows'):
+        rows, expected = getattr(updated, attribute), getattr(rebuilt, attribute)
+        assert rows.keys() == expected.keys()
+        for value in expected:
+            assert np.array_equal(rows[value], expected[value]), (attribute, value)
+    assert {
+        name: sorted(members) for name, members in updated.org_index.members.items()
+    } == {name: sorted(members) for name, members in rebuilt.org_index.members.items()}
+    for organization in rebuilt.org_rows:
+        assert updated.expand_orgs(organization) == rebuilt.expand_orgs(organization)
+    assert np.array_equal(updated.keys(), rebuilt.keys())
+
+
+@pytest.mark.parametrize('change', list(CHANGES))
+def test_updated_matches_rebuilt(change):
+    new_df = CHANGES[change]
+    old_index = lottery_engine.RosterIndex(OLD_DF, org_aliases={})
+    diff = lottery_engine.diff_rosters(OLD_DF, new_df, old_keys=old_index.keys())
+    assert_same_index(old_index.updated(new_df, diff), lottery_engine.RosterIndex(new_df, org_aliases={}))
+    # 再改回旧名单
+    assert_same_index(
+        old_index.updated(new_df).updated(OLD_DF), lottery_engine.RosterIndex(OLD_DF, org_aliases={})
+    )
+
+
+def test_diff_reports_index_changes():
+    new_df = concat(with_org(OLD_DF, 7, "中山大学").drop(index=[20]), make_roster(2, start=ROWS))
+    diff = lottery_engine.diff_rosters(OLD_DF, new_df)
+    assert diff.added == ["E00300", "E00301"]
+    assert diff.removed == ["E00020"]
+    assert diff.changed == ["E00007"]
+    assert not diff.same_layout and diff.same_columns
+
+
+def test_diff_column_change_marks_everyone():
+    diff = lottery_engine.diff_rosters(OLD_DF, OLD_DF.drop(columns=[ORG_COLUMN]))
+    assert not diff.same_columns
+    assert len(diff.changed) == ROWS